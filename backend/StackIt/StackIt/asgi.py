@@ -9,8 +9,14 @@ https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 
 import os
 
+from django.conf import settings
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'StackIt.settings')
 
 application = get_asgi_application()
+
+if settings.AI_PREWARM:
+    # Load the embedding model and FAISS index before the first request.
+    from ai.utils.embeddings import warm_up
+    warm_up()
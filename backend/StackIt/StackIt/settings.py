@@ -1,6 +1,7 @@
 from dotenv import load_dotenv
 load_dotenv()
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -42,6 +43,73 @@ REST_FRAMEWORK = {
     ),
 }
 
+# Cursor-paginated lists (questions, answers, comments): default page size
+# and the upper bound for ?page_size=
+API_PAGE_SIZE = 20
+API_MAX_PAGE_SIZE = 100
+
+# Anonymous GETs of the question, answer and tag lists are cached (see
+# main/response_cache.py) in the API_CACHE_ALIAS cache for up to
+# API_CACHE_TIMEOUT seconds and invalidated by writes. Local memory is per
+# process; set STACKIT_API_CACHE_BACKEND/LOCATION to a shared cache, e.g.
+# django.core.cache.backends.redis.RedisCache and redis://127.0.0.1:6379,
+# when running several workers.
+LOCMEM_CACHE = 'django.core.cache.backends.locmem.LocMemCache'
+CACHES = {
+    'default': {
+        'BACKEND': LOCMEM_CACHE,
+    },
+    'api': {
+        'BACKEND': os.getenv("STACKIT_API_CACHE_BACKEND", LOCMEM_CACHE),
+        'LOCATION': os.getenv("STACKIT_API_CACHE_LOCATION", 'stackit-api'),
+    },
+}
+if CACHES['api']['BACKEND'] == LOCMEM_CACHE:
+    CACHES['api']['OPTIONS'] = {'MAX_ENTRIES': 10000}
+API_CACHE_ALIAS = 'api'
+API_CACHE_TIMEOUT = 300
+
+# Votes normally update the target's vote_score in the same transaction. With
+# STACKIT_VOTE_WRITE_BEHIND=1 score changes are buffered per process and
+# applied in batches every VOTE_FLUSH_INTERVAL seconds (see main/vote_buffer.py).
+VOTE_WRITE_BEHIND = os.getenv("STACKIT_VOTE_WRITE_BEHIND") == "1"
+VOTE_FLUSH_INTERVAL = 0.5
+
+# Question list ?sort=hot: a question FEED_HOT_TIMESCALE seconds newer than
+# another ranks level with it at 10x the engagement (votes + answers).
+# Run `manage.py refresh_feeds` after changing it.
+FEED_HOT_TIMESCALE = 45000
+
+# Answers and comments are turned into notifications in the background
+# (main/notifications.py), NOTIFICATION_FANOUT_DELAY seconds after the first
+# event of a batch, NOTIFICATION_BULK_SIZE rows per INSERT. A user with an
+# unread notification of the same kind about a question from the last
+# NOTIFICATION_DEDUP_WINDOW seconds isn't notified again. Unread counts are
+# cached for NOTIFICATION_UNREAD_TTL seconds. Long-polls and streams re-check
+# the database every NOTIFICATION_POLL_INTERVAL seconds (sooner when this
+# process notifies the user); a long-poll waits at most
+# NOTIFICATION_LONG_POLL_TIMEOUT seconds, a stream sends a keepalive every
+# NOTIFICATION_KEEPALIVE seconds and ends after NOTIFICATION_STREAM_SECONDS.
+NOTIFICATION_FANOUT_DELAY = 0.2
+NOTIFICATION_BULK_SIZE = 500
+NOTIFICATION_DEDUP_WINDOW = 3600
+NOTIFICATION_UNREAD_TTL = 300
+NOTIFICATION_POLL_INTERVAL = 2
+NOTIFICATION_LONG_POLL_TIMEOUT = 25
+NOTIFICATION_KEEPALIVE = 15
+NOTIFICATION_STREAM_SECONDS = 300
+
+# /api/search/?mode=hybrid fuses the top SEARCH_HYBRID_DEPTH keyword (FTS5)
+# and vector (FAISS) hits with reciprocal-rank fusion, score = sum of
+# 1 / (SEARCH_RRF_K + rank). Vector hits below SEARCH_MIN_SIMILARITY (same
+# scale as the chatbot's relevance threshold) are ignored. Only the newest
+# SEARCH_MAX_CANDIDATES keyword matches are BM25-ranked, which bounds the
+# cost of queries for very common words.
+SEARCH_HYBRID_DEPTH = 50
+SEARCH_MAX_CANDIDATES = 2000
+SEARCH_RRF_K = 60
+SEARCH_MIN_SIMILARITY = 0.3
+
 
 
 from datetime import timedelta
@@ -54,6 +122,7 @@ SIMPLE_JWT = {
 
 
 MIDDLEWARE = [
+    'main.instrumentation.InstrumentationMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -66,6 +135,61 @@ MIDDLEWARE = [
 ]
 
 
+# Per-request timings (see main/instrumentation.py): every response gets a
+# Server-Timing header, /metrics serves Prometheus histograms to requests with
+# "Authorization: Bearer <STACKIT_METRICS_TOKEN>" (403 for every request while
+# that is unset), and a METRICS_SLOW_SAMPLE_RATE share of the requests slower
+# than METRICS_SLOW_REQUEST_SECONDS are logged to "stackit.slow_requests".
+METRICS_TOKEN = os.getenv("STACKIT_METRICS_TOKEN")
+METRICS_SLOW_REQUEST_SECONDS = 1.0
+METRICS_SLOW_SAMPLE_RATE = 1.0
+
+
+# AI / RAG
+# OpenAI-compatible chat-completion endpoint used by the chatbot and drafts.
+AI_LLM_BASE_URL = os.getenv("STACKIT_LLM_BASE_URL", "https://openrouter.ai/api/v1/")
+AI_LLM_API_KEY = os.getenv("OPENROUTER_API_KEY")
+AI_LLM_MODEL = os.getenv("STACKIT_LLM_MODEL", "mistralai/mistral-7b-instruct:free")
+
+# Limits for the async (ASGI) AI endpoints, per process: at most
+# AI_LLM_MAX_CONCURRENCY upstream calls in flight (more are rejected with
+# 503), over a pool of AI_LLM_MAX_CONNECTIONS HTTP connections, each call
+# failing with 504 after AI_LLM_TIMEOUT seconds.
+AI_LLM_MAX_CONCURRENCY = int(os.getenv("STACKIT_LLM_MAX_CONCURRENCY", "200"))
+AI_LLM_MAX_CONNECTIONS = 100
+AI_LLM_TIMEOUT = 60
+
+# Answer embeddings are computed in the background in batches of up to
+# AI_EMBED_BATCH_SIZE, waiting at most AI_EMBED_MAX_WAIT seconds to fill one.
+AI_EMBED_BATCH_SIZE = 64
+AI_EMBED_MAX_WAIT = 0.5
+
+# FAISS index type used by build_faiss: "flat" (exact), "ivf_flat", "ivf_pq"
+# or "hnsw". Compare them on your data with `manage.py bench_faiss`.
+# NPROBE (IVF cells scanned) and EF_SEARCH (HNSW beam width) trade recall
+# for query latency.
+AI_INDEX_TYPE = "flat"
+AI_INDEX_NPROBE = 16
+AI_INDEX_EF_SEARCH = 64
+
+# Chatbot queries are cached by normalized question text (query vector and
+# retrieved context), up to AI_QUERY_CACHE_SIZE entries for AI_QUERY_CACHE_TTL
+# seconds. Cached context is dropped as soon as the answer index changes.
+AI_QUERY_CACHE_SIZE = 2048
+AI_QUERY_CACHE_TTL = 3600
+
+# Chatbot answers are reused for a new question whose embedding has cosine
+# similarity >= AI_RESPONSE_CACHE_THRESHOLD with a cached one and that
+# retrieved the same context answers. Changing any of those answers evicts it.
+AI_RESPONSE_CACHE_THRESHOLD = 0.92
+AI_RESPONSE_CACHE_SIZE = 1024
+AI_RESPONSE_CACHE_TTL = 3600
+
+# The embedding model and FAISS index load lazily on first use. Set
+# STACKIT_AI_PREWARM=1 to load them when a WSGI/ASGI worker boots instead.
+AI_PREWARM = os.getenv("STACKIT_AI_PREWARM") == "1"
+
+
 CORS_ALLOWED_ORIGINS = [
     "http://localhost:5173",  # Your React dev server
     "http://127.0.0.1:5173",
@@ -112,6 +236,15 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # WAL (switched on by migration main/0007_sqlite_wal) lets readers run
+        # alongside the writer; IMMEDIATE transactions take the write lock up
+        # front instead of failing to upgrade to it ("database is locked")
+        # halfway through.
+        'OPTIONS': {
+            'init_command': 'PRAGMA synchronous=NORMAL;',
+            'transaction_mode': 'IMMEDIATE',
+            'timeout': 20,
+        },
     }
 }
 
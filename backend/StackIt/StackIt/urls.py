@@ -16,10 +16,12 @@ Including another URLconf
 """
 from django.contrib import admin
 from django.urls import path, include
+from main.instrumentation import metrics
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/auth/', include('accounts.urls')),
     path('api/', include('main.urls')),
     path("api/ai/", include("ai.urls")),
+    path('metrics', metrics, name='metrics'),
 ]
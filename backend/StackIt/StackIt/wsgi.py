@@ -9,8 +9,14 @@ https://docs.djangoproject.com/en/5.2/howto/deployment/wsgi/
 
 import os
 
+from django.conf import settings
 from django.core.wsgi import get_wsgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'StackIt.settings')
 
 application = get_wsgi_application()
+
+if settings.AI_PREWARM:
+    # Load the embedding model and FAISS index before the first request.
+    from ai.utils.embeddings import warm_up
+    warm_up()
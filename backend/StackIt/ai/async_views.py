@@ -0,0 +1,184 @@
+# ai/async_views.py
+"""
+Async versions of the chatbot and draft endpoints, meant to be served by
+StackIt/asgi.py (e.g. `uvicorn StackIt.asgi:application`).
+
+While a request waits on the LLM it only holds a coroutine, not a worker
+thread, so one process can keep hundreds of conversations open. Upstream
+calls go through one pooled client per event loop and are capped at
+AI_LLM_MAX_CONCURRENCY per process: beyond that, requests are rejected
+immediately with 503 instead of queueing, and calls slower than
+AI_LLM_TIMEOUT fail with 504.
+
+Send `Accept: text/event-stream` to get the answer streamed as SSE. The
+/stream/ endpoints always stream: under ASGI they take the same path, under
+WSGI (where Django would buffer an async body whole) they hand the request
+to the sync views in ai/views.py.
+"""
+import asyncio
+import json
+import threading
+import weakref
+
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpResponse, JsonResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST
+from openai import APITimeoutError
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+
+from ai import views
+from ai.streaming import asse_events, sse_event, sse_response
+from ai.utils import llm
+from ai.utils.rag import aanswer_with_rag, astream_answer_with_rag, build_draft_prompt
+from main.models import Question
+
+
+def _json_body(request):
+    try:
+        body = json.loads(request.body or b"{}")
+    except ValueError:
+        return {}
+    return body if isinstance(body, dict) else {}
+
+
+def _wants_stream(request):
+    return "text/event-stream" in request.headers.get("Accept", "")
+
+
+def _error(request, data, status):
+    """Error response, as a single SSE `error` event if the client asked for a stream."""
+    if _wants_stream(request):
+        return HttpResponse(sse_event("error", data), status=status, content_type="text/event-stream")
+    return JsonResponse(data, status=status)
+
+
+def _saturated():
+    response = JsonResponse({"error": "AI service is busy, please retry shortly"}, status=503)
+    response["Retry-After"] = "1"
+    return response
+
+
+def _timed_out():
+    return JsonResponse({"error": "AI service timed out"}, status=504)
+
+
+async def _authenticate(request):
+    try:
+        result = await sync_to_async(JWTAuthentication().authenticate)(request)
+    except AuthenticationFailed:
+        return None
+    return result[0] if result else None
+
+
+def _once(func):
+    lock = threading.Lock()
+    called = []
+
+    def call():
+        with lock:
+            if called:
+                return
+            called.append(True)
+        func()
+    return call
+
+
+async def _stream(make_stream):
+    """SSE response that holds an upstream slot until the server is done with it."""
+    try:
+        llm.slots.acquire()
+    except llm.UpstreamSaturated:
+        return _saturated()
+    release = _once(llm.slots.release)
+    try:
+        tokens, summary = await make_stream()
+    except BaseException:
+        release()
+        raise
+    # close() runs once the response has been sent, also after the client
+    # disconnected; the finalizer covers a response that is dropped unsent
+    # (request cancelled before the body started).
+    response = sse_response(asse_events(tokens, summary), on_close=release)
+    weakref.finalize(response, release)
+    return response
+
+
+async def _respond(request, make_answer, make_stream, stream=False):
+    """Run one upstream call under a concurrency slot, as JSON or SSE."""
+    if stream or _wants_stream(request):
+        return await _stream(make_stream)
+
+    try:
+        with llm.upstream_slot():
+            answer = await make_answer()
+    except llm.UpstreamSaturated:
+        return _saturated()
+    except (asyncio.TimeoutError, APITimeoutError):
+        return _timed_out()
+    except Exception as e:
+        return JsonResponse({"error": str(e)}, status=500)
+    return JsonResponse({"answer": answer})
+
+
+async def _chat(request, stream=False):
+    question = _json_body(request).get("question")
+    if not question:
+        return _error(request, {"error": "No question provided"}, 400)
+
+    async def make_stream():
+        context, tokens = await astream_answer_with_rag(question)
+        return tokens, {"sources": [c["id"] for c in context]}
+
+    return await _respond(request, lambda: aanswer_with_rag(question), make_stream, stream)
+
+
+async def _draft(request, stream=False):
+    if await _authenticate(request) is None:
+        return _error(request, {"detail": "Authentication credentials were not provided."}, 401)
+
+    question_id = _json_body(request).get("question_id")
+    if not question_id:
+        return _error(request, {"error": "question_id is required"}, 400)
+
+    try:
+        question = await Question.objects.aget(pk=question_id, is_active=True)
+    except (Question.DoesNotExist, ValueError):
+        return _error(request, {"error": "Question not found"}, 404)
+
+    prompt = build_draft_prompt(question)
+
+    async def make_stream():
+        return llm.astream(prompt), {"question_id": question.id}
+
+    return await _respond(request, lambda: llm.acomplete(prompt), make_stream, stream)
+
+
+@csrf_exempt
+@require_POST
+async def rag_chatbot_async(request):
+    return await _chat(request)
+
+
+@csrf_exempt
+@require_POST
+async def ai_draft_answer_async(request):
+    return await _draft(request)
+
+
+@csrf_exempt
+@require_POST
+async def rag_chatbot_stream(request):
+    if not isinstance(request, ASGIRequest):
+        return await sync_to_async(views.rag_chatbot_stream)(request)
+    return await _chat(request, stream=True)
+
+
+@csrf_exempt
+@require_POST
+async def ai_draft_answer_stream(request):
+    if not isinstance(request, ASGIRequest):
+        return await sync_to_async(views.ai_draft_answer_stream)(request)
+    return await _draft(request, stream=True)
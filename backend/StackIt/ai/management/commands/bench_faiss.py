@@ -0,0 +1,116 @@
+# ai/management/commands/bench_faiss.py
+import statistics, time
+
+from django.core.management.base import BaseCommand, CommandError
+from ai.utils.index_factory import INDEX_TYPES, index_type_of, make_index, train
+from ai.utils.index_manager import get_index_manager
+import faiss
+import numpy as np
+
+
+def _synthetic_corpus(n, dim, rng, n_topics=200):
+    """Unit vectors clustered around topics, shaped like sentence embeddings."""
+    centers = rng.standard_normal((n_topics, dim)).astype("float32")
+    vectors = centers[rng.integers(0, n_topics, n)] + 0.6 * rng.standard_normal((n, dim)).astype("float32")
+    faiss.normalize_L2(vectors)
+    return vectors
+
+
+def _percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))]
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare FAISS index types for the answer index: recall@k against "
+        "exact (flat) search, plus p50/p99 single-query latency, at several "
+        "corpus sizes."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sizes", default="10000,100000",
+                            help="Comma-separated corpus sizes (default: 10000,100000)")
+        parser.add_argument("--types", default=",".join(INDEX_TYPES),
+                            help=f"Comma-separated index types (default: {','.join(INDEX_TYPES)})")
+        parser.add_argument("--k", type=int, default=4, help="Neighbours per query (default: 4, as in RAG)")
+        parser.add_argument("--queries", type=int, default=500, help="Queries per measurement (default: 500)")
+        parser.add_argument("--dim", type=int, default=384, help="Vector dimension for synthetic data")
+        parser.add_argument("--from-index", action="store_true",
+                            help="Sample vectors from the live answer index instead of synthetic data "
+                                 "(sizes larger than the index are capped)")
+        parser.add_argument("--seed", type=int, default=0)
+
+    def handle(self, *args, **options):
+        rng = np.random.default_rng(options["seed"])
+        sizes = [int(s) for s in options["sizes"].split(",")]
+        types = options["types"].split(",")
+        for index_type in types:
+            if index_type not in INDEX_TYPES:
+                raise CommandError(f"Unknown index type {index_type!r}")
+        k = options["k"]
+
+        if options["from_index"]:
+            corpus = self._live_vectors()
+            dim = corpus.shape[1]
+        else:
+            dim = options["dim"]
+            corpus = _synthetic_corpus(max(sizes) + options["queries"], dim, rng)
+
+        fell_back = False
+        self.stdout.write(
+            f"{'size':>9}  {'type':<9}{'build s':>9}{f'recall@{k}':>11}{'p50 ms':>9}{'p99 ms':>9}"
+        )
+        for size in sizes:
+            # Queries are held out of the corpus; with live data, perturb
+            # stored vectors so they are near but not identical to a hit.
+            if options["from_index"]:
+                size = min(size, len(corpus))
+                base = corpus[rng.permutation(len(corpus))[:size]]
+                queries = base[rng.integers(0, size, options["queries"])] \
+                    + 0.05 * rng.standard_normal((options["queries"], dim)).astype("float32")
+            else:
+                base = corpus[:size]
+                queries = corpus[-options["queries"]:]
+            queries = np.ascontiguousarray(queries, dtype="float32")
+
+            exact = faiss.IndexFlatL2(dim)
+            exact.add(base)
+            _, truth = exact.search(queries, k)
+
+            for index_type in types:
+                started = time.perf_counter()
+                index = make_index(index_type, dim, size)
+                if not index.is_trained:
+                    train(index, base[rng.permutation(size)[:100_000]])
+                index.add_with_ids(base, np.arange(size, dtype="int64"))
+                build = time.perf_counter() - started
+
+                latencies, hits = [], 0
+                for i in range(len(queries)):
+                    t = time.perf_counter()
+                    _, found = index.search(queries[i:i + 1], k)
+                    latencies.append((time.perf_counter() - t) * 1000)
+                    hits += len(set(found[0].tolist()) & set(truth[i].tolist()))
+
+                label = index_type
+                if index_type_of(index) != index_type:
+                    label, fell_back = f"{index_type}*", True
+                self.stdout.write(
+                    f"{size:>9}  {label:<9}{build:>9.2f}{hits / truth.size:>11.3f}"
+                    f"{statistics.median(latencies):>9.3f}{_percentile(latencies, 99):>9.3f}"
+                )
+        if fell_back:
+            self.stdout.write("* too few vectors to train, measured as flat")
+
+    def _live_vectors(self):
+        manager = get_index_manager()
+        if manager.index is None or not manager.index.ntotal:
+            raise CommandError("The answer index is empty; run build_faiss first")
+        index = manager.index
+        inner = faiss.downcast_index(index.index)
+        try:
+            return inner.reconstruct_n(0, inner.ntotal)
+        except RuntimeError:
+            raise CommandError(f"Cannot read vectors back from a {index_type_of(index)} index; "
+                               "benchmark on a flat build or use synthetic data")
@@ -0,0 +1,91 @@
+# ai/management/commands/bench_startup.py
+import os, shutil, statistics, subprocess, sys, tempfile, time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+
+def _run_check(cwd):
+    """Time one `manage.py check` in a fresh interpreter; returns (seconds, peak RSS in MB)."""
+    env = dict(os.environ, STACKIT_AI_PREWARM="0")
+    with tempfile.TemporaryFile(mode="w+") as stderr:
+        started = time.perf_counter()
+        proc = subprocess.Popen(
+            [sys.executable, "manage.py", "check"],
+            cwd=cwd, env=env, stdout=subprocess.DEVNULL, stderr=stderr,
+        )
+        _, status, usage = os.wait4(proc.pid, 0)
+        elapsed = time.perf_counter() - started
+        proc.returncode = os.waitstatus_to_exitcode(status)
+        if proc.returncode != 0:
+            stderr.seek(0)
+            raise CommandError(f"manage.py check failed in {cwd}:\n{stderr.read()}")
+    return elapsed, usage.ru_maxrss / 1024      # ru_maxrss is in KB on Linux
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark process startup by timing `manage.py check` in fresh "
+        "interpreters. With --compare-rev, the same is measured on a git "
+        "worktree of that revision to show the before/after difference."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--runs", type=int, default=5, help="Timed runs per tree (default: 5)")
+        parser.add_argument("--compare-rev", help="Git revision to compare against, e.g. HEAD~1")
+
+    def handle(self, *args, **options):
+        runs = options["runs"]
+        results = {}
+
+        rev = options["compare_rev"]
+        if rev:
+            with self._worktree(rev) as cwd:
+                results[rev] = self._measure(cwd, runs)
+        results["current"] = self._measure(settings.BASE_DIR, runs)
+
+        self.stdout.write(f"{'tree':<20}{'min s':>9}{'median s':>10}{'max s':>9}{'peak RSS MB':>13}")
+        for name, (timings, rss) in results.items():
+            self.stdout.write(
+                f"{name:<20}{min(timings):>9.2f}{statistics.median(timings):>10.2f}"
+                f"{max(timings):>9.2f}{rss:>13.0f}"
+            )
+        if rev:
+            before = statistics.median(results[rev][0])
+            after = statistics.median(results["current"][0])
+            self.stdout.write(self.style.SUCCESS(
+                f"Median startup {before:.2f}s → {after:.2f}s ({before / after:.1f}x)"
+            ))
+
+    def _measure(self, cwd, runs):
+        _run_check(cwd)     # warm the OS page cache so the first run isn't an outlier
+        timings, rss = [], 0.0
+        for _ in range(runs):
+            elapsed, peak = _run_check(cwd)
+            timings.append(elapsed)
+            rss = max(rss, peak)
+        return timings, rss
+
+    @contextmanager
+    def _worktree(self, rev):
+        top = subprocess.run(
+            ["git", "rev-parse", "--show-toplevel"],
+            cwd=settings.BASE_DIR, capture_output=True, text=True, check=True,
+        ).stdout.strip()
+        path = tempfile.mkdtemp(prefix="stackit-bench-")
+        subprocess.run(["git", "worktree", "add", "--detach", path, rev],
+                       cwd=top, capture_output=True, check=True)
+        try:
+            project = os.path.join(path, os.path.relpath(settings.BASE_DIR, top))
+            # Untracked runtime files the old tree expects to find.
+            for name in ("db.sqlite3", ".env"):
+                src = os.path.join(settings.BASE_DIR, name)
+                if os.path.exists(src) and not os.path.exists(os.path.join(project, name)):
+                    shutil.copy(src, project)
+            self.stdout.write(f"Measuring {rev} in {project}")
+            yield project
+        finally:
+            subprocess.run(["git", "worktree", "remove", "--force", path],
+                           cwd=top, capture_output=True)
+            shutil.rmtree(path, ignore_errors=True)
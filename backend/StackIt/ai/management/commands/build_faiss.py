@@ -1,26 +1,244 @@
 # ai/management/commands/build_faiss.py
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import json, os, pickle, shutil
+
 from django.core.management.base import BaseCommand
+from django.db import connections
+from django.utils import timezone
 from main.models import Answer
-from sentence_transformers import SentenceTransformer
-import faiss, pickle, os
+from ai.utils.embeddings import EMB_MODEL_ID, get_embedding_model
+from ai.utils.index_factory import INDEX_TYPES, default_index_type, index_type_of, make_index, train
+from ai.utils.index_manager import file_lock, get_index_manager, write_snapshot
+import numpy as np
+
+BUILD_DIR = "ai/faiss_data/build"
+CHECKPOINT_NAME = "checkpoint.json"
+
+def _init_worker():
+    get_embedding_model()
+
+
+def _encode_chunk(texts):
+    return np.asarray(get_embedding_model().encode(texts), dtype="float32")
+
+
+def _write_atomic(path, data, mode="wb"):
+    with open(path + ".tmp", mode) as f:
+        f.write(data)
+    os.replace(path + ".tmp", path)
+
 
 class Command(BaseCommand):
-    help = "Build FAISS index from answers"
+    help = (
+        "Build FAISS index from answers. Answers are streamed in id order, "
+        "encoded chunk by chunk across a process pool and checkpointed, so an "
+        "interrupted build resumes where it stopped. IVF index types are "
+        "trained on a sample of the encoded vectors. The finished index "
+        "replaces the live one atomically."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chunk-size", type=int, default=1000,
+                            help="Answers per encoded chunk (default: 1000)")
+        parser.add_argument("--workers", type=int, default=max(1, (os.cpu_count() or 2) // 2),
+                            help="Encoding processes; 1 encodes in-process")
+        parser.add_argument("--restart", action="store_true",
+                            help="Ignore any checkpoint and build from scratch")
+        parser.add_argument("--index-type", choices=INDEX_TYPES, default=None,
+                            help="FAISS index type (default: settings.AI_INDEX_TYPE)")
+        parser.add_argument("--train-size", type=int, default=100_000,
+                            help="Max vectors sampled to train IVF index types (default: 100000)")
+        parser.add_argument("--build-dir", default=BUILD_DIR,
+                            help=f"Directory for chunks and the checkpoint (default: {BUILD_DIR})")
+
+    def handle(self, *args, **options):
+        chunk_size = options["chunk_size"]
+        workers = options["workers"]
+        self.build_dir = options["build_dir"]
+        self.checkpoint_path = os.path.join(self.build_dir, CHECKPOINT_NAME)
+
+        checkpoint = self._load_checkpoint(options["restart"])
+        if checkpoint["chunks"]:
+            self.stdout.write(
+                f"↪️  Resuming after answer {checkpoint['last_id']} "
+                f"({checkpoint['chunks']} chunks, {checkpoint['count']} answers done)"
+            )
+
+        self._encode_all(checkpoint, chunk_size, workers)
+        count = self._swap_in(checkpoint, options["index_type"] or default_index_type(), options["train_size"])
+        shutil.rmtree(self.build_dir, ignore_errors=True)
+
+        self.stdout.write(self.style.SUCCESS(f"Built FAISS index with {count} answers"))
+
+    # ------------------------------------------------------------------ #
+    # Checkpointing
+    # ------------------------------------------------------------------ #
+    def _load_checkpoint(self, restart):
+        if not restart and os.path.exists(self.checkpoint_path):
+            with open(self.checkpoint_path) as f:
+                checkpoint = json.load(f)
+            if checkpoint.get("model") == EMB_MODEL_ID:
+                return checkpoint
+            self.stdout.write("⚠️  Checkpoint was made with another model, starting over")
+
+        shutil.rmtree(self.build_dir, ignore_errors=True)
+        os.makedirs(self.build_dir)
+        checkpoint = {
+            "model": EMB_MODEL_ID,
+            "started_at": timezone.now().isoformat(),
+            "last_id": 0,
+            "chunks": 0,
+            "count": 0,
+        }
+        self._save_checkpoint(checkpoint)
+        return checkpoint
+
+    def _save_checkpoint(self, checkpoint):
+        _write_atomic(self.checkpoint_path, json.dumps(checkpoint), mode="w")
+
+    def _chunk_path(self, n):
+        return os.path.join(self.build_dir, f"chunk_{n:06d}.pkl")
+
+    # ------------------------------------------------------------------ #
+    # Streaming + encoding
+    # ------------------------------------------------------------------ #
+    def _iter_chunks(self, last_id, chunk_size):
+        """Yield lists of (id, content, question title), keyset-paginated on id."""
+        while True:
+            rows = list(
+                Answer.objects
+                .filter(is_active=True, id__gt=last_id)
+                .order_by("id")
+                .values_list("id", "content", "question__title")[:chunk_size]
+            )
+            if not rows:
+                return
+            yield rows
+            last_id = rows[-1][0]
+
+    def _encode_all(self, checkpoint, chunk_size, workers):
+        chunks = self._iter_chunks(checkpoint["last_id"], chunk_size)
+
+        if workers <= 1:
+            for rows in chunks:
+                vectors = _encode_chunk([content for _, content, _ in rows])
+                self._commit_chunk(checkpoint, rows, vectors)
+            return
+
+        # Forked workers must not share the parent's DB connection; they only
+        # encode, the parent does all the querying.
+        connections.close_all()
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+            in_flight = deque()
+            for rows in chunks:
+                in_flight.append((rows, pool.submit(_encode_chunk, [content for _, content, _ in rows])))
+                # Keep a bounded number of chunks in memory and commit them
+                # in order, so the checkpoint always covers a contiguous prefix.
+                while len(in_flight) >= workers * 2:
+                    done_rows, future = in_flight.popleft()
+                    self._commit_chunk(checkpoint, done_rows, future.result())
+            while in_flight:
+                done_rows, future = in_flight.popleft()
+                self._commit_chunk(checkpoint, done_rows, future.result())
+
+    def _commit_chunk(self, checkpoint, rows, vectors):
+        data = {
+            "ids": np.array([answer_id for answer_id, _, _ in rows], dtype="int64"),
+            "vectors": vectors,
+            "content": [content for _, content, _ in rows],
+            "question": [title for _, _, title in rows],
+        }
+        _write_atomic(self._chunk_path(checkpoint["chunks"]), pickle.dumps(data, protocol=pickle.HIGHEST_PROTOCOL))
+
+        checkpoint["chunks"] += 1
+        checkpoint["count"] += len(rows)
+        checkpoint["last_id"] = rows[-1][0]
+        self._save_checkpoint(checkpoint)
+        self.stdout.write(f"🧩 Encoded {checkpoint['count']} answers (up to id {checkpoint['last_id']})")
+
+    # ------------------------------------------------------------------ #
+    # Assembly + swap
+    # ------------------------------------------------------------------ #
+    def _load_chunk(self, n):
+        with open(self._chunk_path(n), "rb") as f:
+            return pickle.load(f)
+
+    def _training_sample(self, checkpoint, train_size):
+        """Uniform random sample of at most train_size encoded vectors."""
+        rate = min(1.0, train_size / max(1, checkpoint["count"]))
+        rng = np.random.default_rng(0)
+        sample = []
+        for n in range(checkpoint["chunks"]):
+            vectors = self._load_chunk(n)["vectors"]
+            sample.append(vectors[rng.random(len(vectors)) < rate])
+        return np.concatenate(sample)[:train_size]
+
+    def _swap_in(self, checkpoint, index_type, train_size):
+        if not checkpoint["count"]:
+            self.stdout.write(self.style.WARNING("No active answers, leaving the current index in place"))
+            return 0
 
-    def handle(self, *args, **kwargs):
-        model = SentenceTransformer("all-MiniLM-L6-v2")
-        answers = Answer.objects.filter(is_active=True)
+        dim = self._load_chunk(0)["vectors"].shape[1]
+        index = make_index(index_type, dim, checkpoint["count"])
+        if not index.is_trained:
+            sample = self._training_sample(checkpoint, train_size)
+            self.stdout.write(f"🎯 Training {index_type} on {len(sample)} vectors")
+            train(index, sample)
+        elif index_type_of(index) != index_type:
+            self.stdout.write(self.style.WARNING(f"Too few answers to train {index_type}, using flat"))
 
-        texts = [a.content for a in answers]
-        metadata = [{"id": a.id, "content": a.content, "question": a.question.title} for a in answers]
-        vectors = model.encode(texts)
+        vid_answers = []
+        vid = 0
+        for n in range(checkpoint["chunks"]):
+            data = self._load_chunk(n)
+            index.add_with_ids(data["vectors"], np.arange(vid, vid + len(data["ids"]), dtype="int64"))
+            vid_answers.append(data["ids"])
+            vid += len(data["ids"])
 
-        index = faiss.IndexFlatL2(vectors[0].shape[0])
-        index.add(vectors)
+        # Replaces the snapshot and starts an empty journal, so the resident
+        # index in running processes reloads from this build. Answer text goes
+        # to the content store straight from the chunk files.
+        manager = get_index_manager()
+        built = np.concatenate(vid_answers)
+        with file_lock(manager.lock_path):
+            write_snapshot(
+                index, built,
+                index_path=manager.index_path, meta_path=manager.meta_path,
+                journal_path=manager.journal_path, store_path=manager.store_path,
+                contents=self._iter_contents(checkpoint),
+            )
 
-        os.makedirs("ai/faiss_data", exist_ok=True)
-        faiss.write_index(index, "ai/faiss_data/answers.index")
-        with open("ai/faiss_data/answers_meta.pkl", "wb") as f:
-            pickle.dump(metadata, f)
+        # Answers written while the build was running may have been streamed
+        # before their last change; replay those through the live index.
+        # Streamed answers that were since deactivated or hard-deleted leave
+        # no row to replay, so drop every built id that is no longer active.
+        changed = list(
+            Answer.objects
+            .filter(is_active=True, updated_at__gte=checkpoint["started_at"])
+            .values_list("id", "content", "question__title")
+        )
+        active = np.fromiter(
+            Answer.objects
+            .filter(is_active=True, id__lte=checkpoint["last_id"])
+            .values_list("id", flat=True)
+            .iterator(),
+            dtype="int64",
+        )
+        gone = np.setdiff1d(built, active).tolist()
+        if changed or gone:
+            vectors = _encode_chunk([content for _, content, _ in changed]) if changed else []
+            manager.apply(
+                upserts=[(answer_id, vec, content, title) for (answer_id, content, title), vec in zip(changed, vectors)],
+                removes=gone,
+            )
+            self.stdout.write(
+                f"🔁 Re-applied {len(changed)} answers changed and removed {len(gone)} "
+                f"answers deleted during the build"
+            )
+        return vid - len(gone)
 
-        self.stdout.write(self.style.SUCCESS(f"Built FAISS index with {len(texts)} answers"))
+    def _iter_contents(self, checkpoint):
+        for n in range(checkpoint["chunks"]):
+            data = self._load_chunk(n)
+            yield from zip(data["ids"].tolist(), data["question"], data["content"])
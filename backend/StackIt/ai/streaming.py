@@ -0,0 +1,81 @@
+# ai/streaming.py
+"""
+Server-Sent Events helpers for the streaming AI endpoints.
+
+A stream is a series of `token` events carrying text deltas, followed by
+exactly one `done` event with the full answer (or an `error` event if the
+upstream model fails midway).
+"""
+import json
+
+from django.http import StreamingHttpResponse
+from rest_framework.renderers import BaseRenderer
+
+
+def sse_event(event, data, event_id=None):
+    prefix = "" if event_id is None else f"id: {event_id}\n"
+    return f"{prefix}event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+class EventStreamRenderer(BaseRenderer):
+    """
+    Lets DRF negotiate `Accept: text/event-stream`. Only non-streaming
+    responses (validation errors, 404s…) go through it; they are sent as a
+    single `error` event.
+    """
+    media_type = "text/event-stream"
+    format = "event-stream"
+    charset = "utf-8"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return sse_event("error", data).encode(self.charset)
+
+
+def sse_events(tokens, summary=None):
+    """Yield SSE events for `tokens`, then a `done` event with the joined answer."""
+    parts = []
+    try:
+        for token in tokens:
+            parts.append(token)
+            yield sse_event("token", {"text": token})
+    except Exception as e:
+        yield sse_event("error", {"error": str(e)})
+        return
+    yield sse_event("done", {"answer": "".join(parts).strip(), **(summary or {})})
+
+
+async def asse_events(tokens, summary=None):
+    """Async `sse_events` for async token iterators."""
+    parts = []
+    try:
+        async for token in tokens:
+            parts.append(token)
+            yield sse_event("token", {"text": token})
+    except Exception as e:
+        yield sse_event("error", {"error": str(e) or type(e).__name__})
+        return
+    yield sse_event("done", {"answer": "".join(parts).strip(), **(summary or {})})
+
+
+class _EventStreamResponse(StreamingHttpResponse):
+    on_close = None
+
+    def close(self):
+        try:
+            if self.on_close is not None:
+                self.on_close()
+        finally:
+            super().close()
+
+
+def sse_response(events, on_close=None):
+    """
+    Stream `events` as text/event-stream. `on_close` is called when the
+    server is done with the response, whether the stream finished or the
+    client went away.
+    """
+    response = _EventStreamResponse(events, content_type="text/event-stream")
+    response.on_close = on_close
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"        # don't let nginx buffer the stream
+    return response
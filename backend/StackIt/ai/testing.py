@@ -0,0 +1,192 @@
+# ai/testing.py
+"""
+Test doubles for the AI stack: a deterministic embedding model, a local
+OpenAI-compatible completion server, and a context manager and a test-case
+mixin wiring both (plus an empty answer index in a temp dir) in.
+"""
+import hashlib
+import json
+import shutil
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+from django.test import override_settings
+
+from ai.utils import embedding_queue, embeddings, index_manager
+from ai.utils.rag import query_cache, response_cache
+
+
+class StubEmbeddingModel:
+    """Hash-seeded unit vectors: equal texts embed equally, nothing is loaded."""
+
+    def __init__(self, dim=384):
+        self.dim = dim
+
+    def get_sentence_embedding_dimension(self):
+        return self.dim
+
+    def encode(self, texts, **kwargs):
+        vectors = np.empty((len(texts), self.dim), dtype="float32")
+        for i, text in enumerate(texts):
+            seed = int(hashlib.md5(text.encode()).hexdigest()[:8], 16)
+            vec = np.random.default_rng(seed).standard_normal(self.dim)
+            vectors[i] = vec / np.linalg.norm(vec)
+        return vectors
+
+
+class _CompletionHandler(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        try:
+            self._reply()
+        except (BrokenPipeError, ConnectionResetError):
+            pass                        # client gave up (e.g. timeout tests)
+
+    def _reply(self):
+        server = self.server
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        server.requests.append(body)
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self.send_error(404)
+            return
+
+        created = int(time.time())
+        if body.get("stream"):
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.end_headers()
+            for token in server.tokens:
+                if server.delay:
+                    time.sleep(server.delay)
+                chunk = {
+                    "id": "chatcmpl-fake", "object": "chat.completion.chunk",
+                    "created": created, "model": body["model"],
+                    "choices": [{"index": 0, "delta": {"content": token}, "finish_reason": None}],
+                }
+                self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+                self.wfile.flush()
+            self.wfile.write(b"data: [DONE]\n\n")
+            return
+
+        if server.delay:
+            time.sleep(server.delay * len(server.tokens))
+        payload = json.dumps({
+            "id": "chatcmpl-fake", "object": "chat.completion",
+            "created": created, "model": body["model"],
+            "choices": [{
+                "index": 0, "finish_reason": "stop",
+                "message": {"role": "assistant", "content": "".join(server.tokens)},
+            }],
+        }).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+
+class FakeCompletionServer:
+    """
+    Minimal OpenAI-compatible /chat/completions server on a local port.
+
+    Replies with `tokens` (one SSE chunk each when streaming), optionally
+    sleeping `delay` seconds per token. Request bodies are kept in `requests`.
+    """
+
+    def __init__(self, tokens=("Hello", ", ", "world"), delay=0.0):
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", 0), _CompletionHandler)
+        self._httpd.daemon_threads = True
+        self._httpd.tokens = list(tokens)
+        self._httpd.delay = delay
+        self._httpd.requests = []
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self._httpd.server_address
+        return f"http://{host}:{port}/v1/"
+
+    @property
+    def requests(self):
+        return self._httpd.requests
+
+    def set_tokens(self, tokens, delay=None):
+        self._httpd.tokens = list(tokens)
+        if delay is not None:
+            self._httpd.delay = delay
+
+    def start(self):
+        self._thread = threading.Thread(target=self._httpd.serve_forever, args=(0.05,), daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+
+@contextmanager
+def stub_ai(llm_tokens=("Hello", ", ", "world"), llm_delay=0.0):
+    """
+    Point the AI stack at test doubles until the block exits: a
+    StubEmbeddingModel, an empty answer index in a temp dir, an embedding
+    pipeline without a worker thread, empty RAG caches and a
+    FakeCompletionServer as the LLM endpoint (the value of the block).
+    """
+    tmp = tempfile.mkdtemp(prefix="stackit-ai-")
+    prev_model = embeddings.set_embedding_model(StubEmbeddingModel())
+    prev_manager = index_manager.set_index_manager(index_manager.AnswerIndexManager(
+        index_path=f"{tmp}/answers.index",
+        meta_path=f"{tmp}/answers_meta.npz",
+        store_path=f"{tmp}/answers.sqlite3",
+        journal_path=f"{tmp}/answers.journal",
+        lock_path=f"{tmp}/answers.lock",
+    ))
+    pipeline = embedding_queue.EmbeddingPipeline(background=False)
+    prev_pipeline = embedding_queue.set_embedding_pipeline(pipeline)
+    query_cache.clear()
+    response_cache.clear()
+    server = FakeCompletionServer(llm_tokens, llm_delay).start()
+    try:
+        with override_settings(AI_LLM_BASE_URL=server.base_url, AI_LLM_API_KEY="test"):
+            try:
+                yield server
+            finally:
+                # Embed answers committed meanwhile while the temp index is
+                # still in place.
+                pipeline.flush()
+    finally:
+        server.stop()
+        embedding_queue.set_embedding_pipeline(prev_pipeline)
+        index_manager.set_index_manager(prev_manager)
+        embeddings.set_embedding_model(prev_model)
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+class AITestMixin:
+    """
+    Runs each test under `stub_ai`, with the FakeCompletionServer as
+    `self.llm_server`. Also keeps tests that commit answers from embedding
+    them into the real index, or from a background thread.
+    """
+    llm_tokens = ("Hello", ", ", "world")
+
+    def setUp(self):
+        super().setUp()
+        self._stub_ai = stub_ai(self.llm_tokens)
+        self.llm_server = self._stub_ai.__enter__()
+
+    def tearDown(self):
+        self._stub_ai.__exit__(None, None, None)
+        super().tearDown()
+
+    def index_answer(self, answer):
+        """Embed `answer` and add it to the test index right away."""
+        vector = embeddings.encode([answer.content])[0]
+        index_manager.get_index_manager().upsert(answer.id, vector, answer.content, answer.question.title)
@@ -1,3 +1,583 @@
-from django.test import TestCase
+import json
+import os
+import pickle
+import shutil
+import tempfile
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+import faiss
+import numpy as np
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import AsyncClient, SimpleTestCase, TestCase, override_settings
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from ai.management.commands import build_faiss
+from ai.testing import AITestMixin, StubEmbeddingModel
+from ai.utils import embeddings, index_factory, llm, rag
+from ai.utils.cache import LRUCache, SemanticCache
+from ai.utils.embedding_queue import EmbeddingPipeline, get_embedding_pipeline, set_embedding_pipeline
+from ai.utils.index_manager import AnswerIndexManager, get_index_manager
+from main import notifications
+from main.models import Question, Answer
+
+
+def parse_sse(response):
+    return parse_sse_text(b"".join(response.streaming_content).decode())
+
+
+def parse_sse_text(text):
+    events = []
+    for block in text.split("\n\n"):
+        if not block.strip():
+            continue
+        fields = dict(line.split(": ", 1) for line in block.splitlines())
+        events.append((fields["event"], json.loads(fields["data"])))
+    return events
+
+
+class AnswerIndexManagerTests(SimpleTestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp(prefix="stackit-index-")
+        self.addCleanup(shutil.rmtree, self.tmp, ignore_errors=True)
+        self.model = StubEmbeddingModel(dim=8)
+
+    def manager(self):
+        return AnswerIndexManager(
+            index_path=f"{self.tmp}/answers.index",
+            meta_path=f"{self.tmp}/answers_meta.npz",
+            store_path=f"{self.tmp}/answers.sqlite3",
+            journal_path=f"{self.tmp}/answers.journal",
+            lock_path=f"{self.tmp}/answers.lock",
+        )
+
+    def vec(self, text):
+        return self.model.encode([text])[0]
+
+    def search(self, manager, text, k=3):
+        return [(meta["id"], meta["content"], meta["question"]) for _, meta in manager.search(self.vec(text), k)]
+
+    def test_upsert_update_remove(self):
+        manager = self.manager()
+        manager.apply(upserts=[(1, self.vec("one"), "one", "Q1"), (2, self.vec("two"), "two", "Q2")])
+        manager.upsert(1, self.vec("uno"), "uno", "Q1")
+        manager.remove(2)
+
+        self.assertEqual(len(manager), 1)
+        self.assertIn(1, manager)
+        self.assertNotIn(2, manager)
+        self.assertEqual(self.search(manager, "uno"), [(1, "uno", "Q1")])
+
+    def test_other_processes_and_snapshots_see_changes(self):
+        writer = self.manager()
+        reader = self.manager()
+        writer.upsert(5, self.vec("five"), "five", "Q5")
+        self.assertEqual(self.search(reader, "five", k=1), [(5, "five", "Q5")])
+
+        writer.snapshot()
+        writer.upsert(6, self.vec("six"), "six", "Q6")
+        self.assertEqual(len(self.manager()), 2)
+        self.assertEqual(self.search(reader, "six", k=1), [(6, "six", "Q6")])
+
+    def test_upgrades_legacy_pickle(self):
+        index = faiss.IndexFlatL2(8)
+        index.add(self.model.encode(["a", "b"]))
+        faiss.write_index(index, f"{self.tmp}/answers.index")
+        with open(f"{self.tmp}/answers_meta.pkl", "wb") as f:
+            pickle.dump([{"id": 10, "content": "a", "question": "Qa"},
+                         {"id": 11, "content": "b", "question": "Qb"}], f)
+
+        manager = self.manager()
+
+        self.assertEqual(self.search(manager, "b", k=1), [(11, "b", "Qb")])
+        self.assertTrue(os.path.exists(f"{self.tmp}/answers_meta.npz"))
+        self.assertEqual(self.search(self.manager(), "a", k=1), [(10, "a", "Qa")])
+
+
+class IndexFactoryTests(SimpleTestCase):
+    dim = 32
+
+    def vectors(self, n, seed=0):
+        return np.random.default_rng(seed).standard_normal((n, self.dim)).astype("float32")
+
+    def build(self, index_type, n):
+        data = self.vectors(n)
+        index = index_factory.make_index(index_type, self.dim, n)
+        index_factory.train(index, data)
+        ids = np.arange(n, dtype="int64") * 10 + 7
+        index.add_with_ids(data, ids)
+        return index, data, ids
+
+    def test_each_type_builds_and_searches(self):
+        # ivf_pq needs 39 points for each of its 256 codes to train.
+        sizes = {"flat": 500, "ivf_flat": 2000, "ivf_pq": 10_000, "hnsw": 500}
+        for index_type, n in sizes.items():
+            with self.subTest(index_type=index_type):
+                index, data, ids = self.build(index_type, n)
+                self.assertEqual(index_factory.index_type_of(index), index_type)
+                self.assertEqual(index.ntotal, n)
+
+                distances, found = index.search(data[:5], 3)
+                self.assertEqual(distances.shape, (5, 3))
+                self.assertEqual(found.shape, (5, 3))
+                self.assertTrue(np.isin(found, ids).all())
+                if index_type != "ivf_pq":      # PQ codes are lossy
+                    self.assertEqual(found[:, 0].tolist(), ids[:5].tolist())
+
+    def test_ivf_types_fall_back_to_flat_without_enough_training_data(self):
+        for index_type in ("ivf_flat", "ivf_pq"):
+            with self.subTest(index_type=index_type):
+                n = index_factory.min_training_size(index_type) - 1
+                index, data, ids = self.build(index_type, n)
+                self.assertEqual(index_factory.index_type_of(index), "flat")
+                self.assertTrue(index.is_trained)
+                _, found = index.search(data[:1], 1)
+                self.assertEqual(found[0, 0], ids[0])
+        with self.assertRaises(ValueError):
+            index_factory.make_index("lsh", self.dim, 100)
+
+    @override_settings(AI_INDEX_NPROBE=4, AI_INDEX_EF_SEARCH=128)
+    def test_search_knobs_come_from_settings(self):
+        # Keep the IndexIDMap referenced: it owns the inner index.
+        ivf = index_factory.make_index("ivf_flat", self.dim, 2000)
+        self.assertEqual(faiss.downcast_index(ivf.index).nprobe, 4)
+        hnsw = index_factory.make_index("hnsw", self.dim, 100)
+        self.assertEqual(faiss.downcast_index(hnsw.index).hnsw.efSearch, 128)
+
+    def test_configure_search_overrides_and_caps_nprobe(self):
+        index = index_factory.make_index("ivf_flat", self.dim, 2000)
+        ivf = faiss.downcast_index(index.index)
+        index_factory.configure_search(index, nprobe=3)
+        self.assertEqual(ivf.nprobe, 3)
+        index_factory.configure_search(index, nprobe=10_000)
+        self.assertEqual(ivf.nprobe, ivf.nlist)
+
+        index = index_factory.make_index("hnsw", self.dim, 100)
+        index_factory.configure_search(index, ef_search=200)
+        self.assertEqual(faiss.downcast_index(index.index).hnsw.efSearch, 200)
+        self.assertFalse(index_factory.supports_remove(index))
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class CacheTests(SimpleTestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        patcher = mock.patch("ai.utils.cache.time.monotonic", self.clock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    @staticmethod
+    def vec(*components):
+        return np.array(components, dtype="float32")
+
+    def test_lru_entries_expire_after_ttl(self):
+        cache = LRUCache(max_size=10, ttl=60)
+        cache.set("q", "value")
+
+        self.clock.now += 59.9
+        self.assertEqual(cache.get("q"), "value")
+        self.clock.now += 0.1
+        self.assertIsNone(cache.get("q"))
+
+        self.assertEqual(len(cache), 0)
+        self.assertEqual({k: cache.stats()[k] for k in ("hits", "misses", "expirations")},
+                         {"hits": 1, "misses": 1, "expirations": 1})
+
+    def test_lru_evicts_least_recently_used_at_capacity(self):
+        cache = LRUCache(max_size=3, ttl=60)
+        for key in "abc":
+            cache.set(key, key.upper())
+        cache.get("a")                      # "b" is now the least recently used
+        cache.set("d", "D")                 # evicts "b"
+        cache.set("c", "C2")                # updating an entry refreshes it too
+        cache.set("e", "E")                 # evicts "a"
+
+        self.assertEqual([cache.get(key) for key in "abcde"], [None, None, "C2", "D", "E"])
+        self.assertEqual(cache.stats()["evictions"], 2)
+
+    def test_semantic_hit_needs_similarity_at_threshold(self):
+        cache = SemanticCache(threshold=0.9, max_size=10, ttl=60)
+        cache.set(self.vec(1, 0), (1, 2), "cached")
+
+        self.assertEqual(cache.get(self.vec(0.95, np.sqrt(1 - 0.95 ** 2)), (1, 2)), "cached")
+        self.assertEqual(cache.get(self.vec(0.9, np.sqrt(1 - 0.9 ** 2)) * 3, (1, 2)), "cached")
+        self.assertIsNone(cache.get(self.vec(0.85, np.sqrt(1 - 0.85 ** 2)), (1, 2)))
+        self.assertIsNone(cache.get(self.vec(1, 0), (1, 3)))      # same question, other context
+        self.assertEqual((cache.hits, cache.misses), (2, 2))
+
+    def test_semantic_ttl_eviction_and_invalidation(self):
+        cache = SemanticCache(threshold=0.9, max_size=2, ttl=60)
+        cache.set(self.vec(1, 0), (1,), "first")
+        cache.set(self.vec(0, 1), (2,), "second")
+        cache.set(self.vec(1, 1), (3,), "third")                  # evicts the oldest entry
+
+        self.assertIsNone(cache.get(self.vec(1, 0), (1,)))
+        self.assertEqual(cache.stats()["evictions"], 1)
+        cache.evict_answers([2])
+        self.assertIsNone(cache.get(self.vec(0, 1), (2,)))
+        self.assertEqual(cache.get(self.vec(1, 1), (3,)), "third")
+
+        self.clock.now += 60
+        self.assertIsNone(cache.get(self.vec(1, 1), (3,)))
+        self.assertEqual(len(cache), 0)
+
+
+class StreamingEndpointTests(AITestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        self.user = User.objects.create_user(username="alice", password="pw")
+        self.question = Question.objects.create(
+            title="How do I stream responses?", description="With Django", user=self.user,
+        )
+
+    def test_chat_stream_sends_tokens_then_summary(self):
+        answer = Answer.objects.create(question=self.question, user=self.user, content="Use SSE")
+        self.index_answer(answer)
+
+        response = self.client.post("/api/ai/chat/stream/", {"question": "Use SSE"}, format="json",
+                                    HTTP_ACCEPT="text/event-stream")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+        self.assertFalse(response.is_async)         # WSGI streams from the sync view
+        events = parse_sse(response)
+        self.assertEqual([e for e, _ in events], ["token", "token", "token", "done"])
+        self.assertEqual("".join(d["text"] for e, d in events if e == "token"), "Hello, world")
+        self.assertEqual(events[-1][1], {"answer": "Hello, world", "sources": [answer.id]})
+        self.assertTrue(self.llm_server.requests[0]["stream"])
+
+    def test_chat_stream_reuses_cached_answer(self):
+        self.client.post("/api/ai/chat/stream/", {"question": "What is SSE?"}, format="json").getvalue()
+        response = self.client.post("/api/ai/chat/stream/", {"question": "what is sse"}, format="json")
+
+        self.assertEqual(parse_sse(response)[-1][1]["answer"], "Hello, world")
+        self.assertEqual(len(self.llm_server.requests), 1)
+
+    def test_chat_stream_requires_question(self):
+        response = self.client.post("/api/ai/chat/stream/", {}, format="json", HTTP_ACCEPT="text/event-stream")
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.content, b'event: error\ndata: {"error": "No question provided"}\n\n')
+
+    def test_draft_stream_requires_authentication(self):
+        response = self.client.post("/api/ai/draft-answer/stream/", {"question_id": self.question.id}, format="json")
+
+        self.assertEqual(response.status_code, 401)
+
+    def test_draft_stream(self):
+        self.client.force_authenticate(self.user)
+        self.llm_server.set_tokens(["# Draft", "\n", "Use SSE."])
+
+        response = self.client.post("/api/ai/draft-answer/stream/", {"question_id": self.question.id}, format="json")
+
+        events = parse_sse(response)
+        self.assertEqual(events[-1], ("done", {"answer": "# Draft\nUse SSE.", "question_id": self.question.id}))
+        self.assertIn("How do I stream responses?", self.llm_server.requests[0]["messages"][0]["content"])
+
+    def test_draft_stream_unknown_question(self):
+        self.client.force_authenticate(self.user)
+
+        response = self.client.post("/api/ai/draft-answer/stream/", {"question_id": 999}, format="json")
+
+        self.assertEqual(response.status_code, 404)
+
+
+class RagCacheInvalidationTests(AITestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self._prev_fanout = notifications.set_fanout(notifications.NotificationFanout(background=False))
+        user = User.objects.create(username="dave")
+        self.question = Question.objects.create(title="Slow ORM", description="N+1 queries", user=user)
+        self.answer = self.save(Answer(question=self.question, user=user, content="Use select_related"))
+
+    def tearDown(self):
+        notifications.set_fanout(self._prev_fanout)
+        super().tearDown()
+
+    def save(self, answer):
+        with self.captureOnCommitCallbacks(execute=True):
+            answer.save()
+        get_embedding_pipeline().flush()
+        return answer
+
+    def context(self, query):
+        # Any indexed answer counts as relevant: stub embeddings of different texts are far apart.
+        return [c["content"] for c in rag.retrieve(query, relevance_threshold=-4)[1]]
+
+    def test_answer_change_invalidates_both_caches(self):
+        question = "Use select_related"
+        self.assertEqual(self.context(question), ["Use select_related"])
+        self.assertEqual(rag.answer_with_rag(question), "Hello, world")
+        hits = rag.query_cache.hits
+        self.assertEqual(self.context(question), ["Use select_related"])
+        self.assertEqual(rag.answer_with_rag(question), "Hello, world")
+        self.assertGreater(rag.query_cache.hits, hits)
+        self.assertEqual(len(self.llm_server.requests), 1)
+        self.assertEqual(len(rag.response_cache), 1)
+
+        self.answer.content = "Use prefetch_related"
+        self.save(self.answer)
+
+        self.assertEqual(len(rag.response_cache), 0)
+        self.assertEqual(self.context(question), ["Use prefetch_related"])
+        rag.answer_with_rag(question)
+        self.assertEqual(len(self.llm_server.requests), 2)
+
+
+class AsyncEndpointTests(AITestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.client = AsyncClient()
+        self.user = User.objects.create_user(username="bob", password="pw")
+        self.question = Question.objects.create(
+            title="Why use ASGI?", description="For long-lived requests", user=self.user,
+        )
+        self.auth = {"Authorization": f"Bearer {RefreshToken.for_user(self.user).access_token}"}
+
+    async def test_chat(self):
+        response = await self.client.post("/api/ai/async/chat/", {"question": "Why ASGI?"},
+                                          content_type="application/json")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {"answer": "Hello, world"})
+
+    async def test_chat_stream(self):
+        response = await self.client.post("/api/ai/async/chat/", {"question": "Why ASGI?"},
+                                          content_type="application/json", headers={"Accept": "text/event-stream"})
+
+        body = b"".join([chunk async for chunk in response.streaming_content]).decode()
+        events = parse_sse_text(body)
+        self.assertEqual([e for e, _ in events], ["token", "token", "token", "done"])
+        self.assertEqual(events[-1][1], {"answer": "Hello, world", "sources": []})
+
+    async def test_chat_stream_releases_slot_on_disconnect(self):
+        response = await self.client.post("/api/ai/async/chat/", {"question": "Why ASGI?"},
+                                          content_type="application/json", headers={"Accept": "text/event-stream"})
+        self.assertEqual(llm.slots.in_flight, 1)
+
+        await anext(aiter(response.streaming_content))
+        response.close()        # what the server does when the client leaves
+
+        self.assertEqual(llm.slots.in_flight, 0)
+        response.close()
+        self.assertEqual(llm.slots.in_flight, 0)
+
+    async def test_stream_endpoints_take_the_async_path(self):
+        response = await self.client.post("/api/ai/chat/stream/", {"question": "Why ASGI?"},
+                                          content_type="application/json")
+        self.assertTrue(response.is_async)
+        self.assertEqual(llm.slots.in_flight, 1)
+        body = b"".join([chunk async for chunk in response.streaming_content]).decode()
+        response.close()
+        self.assertEqual(parse_sse_text(body)[-1], ("done", {"answer": "Hello, world", "sources": []}))
+        self.assertEqual(llm.slots.in_flight, 0)
+
+        self.llm_server.set_tokens(["# Draft"])
+        response = await self.client.post("/api/ai/draft-answer/stream/", {"question_id": self.question.id},
+                                          content_type="application/json", headers=self.auth)
+        self.assertTrue(response.is_async)
+        body = b"".join([chunk async for chunk in response.streaming_content]).decode()
+        response.close()
+        self.assertEqual(parse_sse_text(body)[-1], ("done", {"answer": "# Draft", "question_id": self.question.id}))
+
+    async def test_stream_endpoint_errors_are_sse_events(self):
+        response = await self.client.post("/api/ai/chat/stream/", {}, content_type="application/json",
+                                          headers={"Accept": "text/event-stream"})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.content, b'event: error\ndata: {"error": "No question provided"}\n\n')
+
+        response = await self.client.post("/api/ai/draft-answer/stream/", {"question_id": self.question.id},
+                                          content_type="application/json")
+        self.assertEqual(response.status_code, 401)
+
+    async def test_chat_requires_question(self):
+        response = await self.client.post("/api/ai/async/chat/", {}, content_type="application/json")
+
+        self.assertEqual(response.status_code, 400)
+
+    @override_settings(AI_LLM_MAX_CONCURRENCY=0)
+    async def test_rejects_when_saturated(self):
+        response = await self.client.post("/api/ai/async/chat/", {"question": "Why ASGI?"},
+                                          content_type="application/json")
+
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response["Retry-After"], "1")
+        self.assertEqual(self.llm_server.requests, [])
+
+    @override_settings(AI_LLM_TIMEOUT=0.2)
+    async def test_upstream_timeout(self):
+        self.llm_server.set_tokens(["slow"], delay=1.0)
+
+        response = await self.client.post("/api/ai/async/chat/", {"question": "Why ASGI?"},
+                                          content_type="application/json")
+
+        self.assertEqual(response.status_code, 504)
+
+    async def test_draft_requires_authentication(self):
+        response = await self.client.post("/api/ai/async/draft-answer/", {"question_id": self.question.id},
+                                          content_type="application/json")
+
+        self.assertEqual(response.status_code, 401)
+
+    async def test_draft(self):
+        response = await self.client.post("/api/ai/async/draft-answer/", {"question_id": self.question.id},
+                                          content_type="application/json", headers=self.auth)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {"answer": "Hello, world"})
+        self.assertIn("Why use ASGI?", self.llm_server.requests[0]["messages"][0]["content"])
+
+
+class EmbeddingPipelineTests(AITestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.encoded = []
+        self.pipeline = EmbeddingPipeline(encode=self.encode, background=False)
+        self._prev_pipeline = set_embedding_pipeline(self.pipeline)
+        self._prev_fanout = notifications.set_fanout(notifications.NotificationFanout(background=False))
+        self.user = User.objects.create(username="carol")
+        self.question = Question.objects.create(title="Batching", description="...", user=self.user)
+
+    def tearDown(self):
+        set_embedding_pipeline(self._prev_pipeline)
+        notifications.set_fanout(self._prev_fanout)
+        super().tearDown()
+
+    def encode(self, texts, **kwargs):
+        self.encoded.extend(texts)
+        return embeddings.encode(texts)
+
+    def indexed(self, answer_id):
+        """Content of `answer_id` in the test index, or None."""
+        hits = get_index_manager().search(embeddings.encode(["probe"]), k=10)
+        return next((meta["content"] for _, meta in hits if meta["id"] == answer_id), None)
+
+    def answer(self, content):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Answer.objects.create(question=self.question, user=self.user, content=content)
+
+    def test_repeated_saves_embed_once(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            answer = Answer.objects.create(question=self.question, user=self.user, content="v1")
+            answer.content = "v2"
+            answer.save()
+            answer.content = "v3"
+            answer.save()
+        self.assertEqual(self.pipeline.metrics()["queue_depth"], 1)
+
+        self.assertTrue(self.pipeline.flush())
+
+        self.assertEqual(self.encoded, ["v3"])
+        self.assertEqual(self.indexed(answer.id), "v3")
+        metrics = self.pipeline.metrics()
+        self.assertEqual(
+            {key: metrics[key] for key in ("queue_depth", "enqueued", "coalesced", "batches", "embedded", "removed")},
+            {"queue_depth": 0, "enqueued": 3, "coalesced": 2, "batches": 1, "embedded": 1, "removed": 0},
+        )
+        self.assertEqual(metrics["last_batch_size"], 1)
+
+    def test_deactivated_and_deleted_answers_are_removed(self):
+        hidden, deleted = self.answer("hidden later"), self.answer("deleted later")
+        deleted_id = deleted.id
+        self.pipeline.flush()
+        self.assertIn(hidden.id, get_index_manager())
+        self.assertIn(deleted_id, get_index_manager())
+
+        with self.captureOnCommitCallbacks(execute=True):
+            hidden.is_active = False
+            hidden.save()
+            deleted.delete()
+        self.pipeline.flush()
+
+        self.assertNotIn(hidden.id, get_index_manager())
+        self.assertNotIn(deleted_id, get_index_manager())
+        self.assertEqual(len(self.encoded), 2)
+        metrics = self.pipeline.metrics()
+        self.assertEqual((metrics["batches"], metrics["embedded"], metrics["removed"]), (2, 2, 2))
+
+
+class InterruptedBuild(build_faiss.Command):
+    """build_faiss that dies right after checkpointing its first chunk."""
+
+    def _commit_chunk(self, checkpoint, rows, vectors):
+        super()._commit_chunk(checkpoint, rows, vectors)
+        raise KeyboardInterrupt
+
+
+class BuildFaissTests(AITestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.build_dir = tempfile.mkdtemp(prefix="stackit-build-")
+        self.addCleanup(shutil.rmtree, self.build_dir, ignore_errors=True)
+        user = User.objects.create(username="dave")
+        question = Question.objects.create(title="Builds", description="...", user=user)
+        self.answers = [
+            Answer.objects.create(question=question, user=user, content=f"answer {n}")
+            for n in range(5)
+        ]
+
+    def build(self, command="build_faiss", **options):
+        call_command(command, "--workers", "1", "--chunk-size", "2",
+                     "--build-dir", self.build_dir, stdout=StringIO(), **options)
+
+    def indexed(self):
+        """answer id -> content for everything in the test index."""
+        hits = get_index_manager().search(embeddings.encode(["probe"]), k=20)
+        return {meta["id"]: meta["content"] for _, meta in hits}
+
+    def test_builds_and_swaps_in_the_index(self):
+        self.build()
+
+        self.assertEqual(self.indexed(), {a.id: a.content for a in self.answers})
+        self.assertFalse(os.path.exists(self.build_dir))
+        # The snapshot replaced the files of the live manager and a fresh
+        # manager on the same files loads the same answers.
+        manager = get_index_manager()
+        reloaded = AnswerIndexManager(
+            index_path=manager.index_path, meta_path=manager.meta_path,
+            store_path=manager.store_path, journal_path=manager.journal_path,
+            lock_path=manager.lock_path,
+        )
+        self.addCleanup(reloaded.close)
+        self.assertEqual(len(reloaded), len(self.answers))
+
+    def test_resumes_from_checkpoint_and_replays_changes(self):
+        with self.assertRaises(KeyboardInterrupt):
+            self.build(InterruptedBuild())
+        with open(os.path.join(self.build_dir, build_faiss.CHECKPOINT_NAME)) as f:
+            checkpoint = json.load(f)
+        self.assertEqual((checkpoint["chunks"], checkpoint["count"]), (1, 2))
+
+        # Both answers of the checkpointed chunk change before the resume.
+        edited, deleted = self.answers[0], self.answers[1]
+        edited.content = "answer 0, edited"
+        edited.save()
+        deleted_id = deleted.id
+        deleted.delete()
+
+        encode = mock.Mock(wraps=build_faiss._encode_chunk)
+        out = StringIO()
+        with mock.patch.object(build_faiss, "_encode_chunk", encode):
+            call_command("build_faiss", "--workers", "1", "--chunk-size", "2",
+                         "--build-dir", self.build_dir, stdout=out)
+
+        self.assertIn("Resuming after answer", out.getvalue())
+        # Only the remaining chunks and the replayed edit were encoded.
+        self.assertEqual(
+            [texts for (texts,), _ in encode.call_args_list],
+            [["answer 2", "answer 3"], ["answer 4"], ["answer 0, edited"]],
+        )
+        expected = {a.id: a.content for a in self.answers if a is not deleted}
+        self.assertEqual(self.indexed(), expected)
+        self.assertNotIn(deleted_id, get_index_manager())
+        self.assertIn("Built FAISS index with 4 answers", out.getvalue())
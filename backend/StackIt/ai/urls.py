@@ -1,8 +1,14 @@
 # ai/urls.py
 from django.urls import path
-from .views import rag_chatbot, ai_draft_answer
+from .views import rag_chatbot, ai_draft_answer, ai_stats
+from .async_views import rag_chatbot_async, rag_chatbot_stream, ai_draft_answer_async, ai_draft_answer_stream
 
 urlpatterns = [
     path("chat/", rag_chatbot),
+    path("chat/stream/", rag_chatbot_stream),
      path("draft-answer/", ai_draft_answer),
+    path("draft-answer/stream/", ai_draft_answer_stream),
+    path("async/chat/", rag_chatbot_async),
+    path("async/draft-answer/", ai_draft_answer_async),
+    path("stats/", ai_stats),
 ]
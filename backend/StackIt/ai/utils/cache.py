@@ -0,0 +1,188 @@
+# ai/utils/cache.py
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+
+class LRUCache:
+    """
+    Thread-safe in-process LRU cache with a per-entry TTL.
+
+    Holds at most `max_size` entries; the least recently used one is evicted
+    first, and entries older than `ttl` seconds are treated as missing.
+    """
+
+    def __init__(self, max_size=1024, ttl=600):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._data = OrderedDict()          # key -> (stored_at, value)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            item = self._data.get(key)
+            if item is not None:
+                stored_at, value = item
+                if time.monotonic() - stored_at < self.ttl:
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._data[key]
+                self.expirations += 1
+            self.misses += 1
+            return default
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (time.monotonic(), value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "max_size": self.max_size,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
+
+
+class SemanticCache:
+    """
+    Cache of LLM answers looked up by meaning rather than exact text.
+
+    An entry stores the (unit-normalized) query vector, the ids of the
+    answers that were retrieved as context and the generated response. A new
+    question hits when it retrieved exactly the same context ids and its
+    vector has cosine similarity >= `threshold` with a cached one. Entries
+    are bucketed by context ids, so a lookup only compares against questions
+    that were answered from the same context.
+
+    `evict_answers(ids)` drops every entry whose context used one of `ids`.
+    """
+
+    def __init__(self, threshold=0.92, max_size=1024, ttl=3600):
+        self.threshold = threshold
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()       # key -> (stored_at, vector, context_ids, response)
+        self._buckets = {}                  # context_ids -> set of keys
+        self._by_answer = {}                # answer id -> set of keys
+        self._next_key = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def _unit(vector):
+        vector = np.asarray(vector, dtype="float32").reshape(-1)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _drop(self, key):
+        _, _, context_ids, _ = self._entries.pop(key)
+        bucket = self._buckets[context_ids]
+        bucket.discard(key)
+        if not bucket:
+            del self._buckets[context_ids]
+        for answer_id in context_ids:
+            keys = self._by_answer.get(answer_id)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._by_answer[answer_id]
+
+    def get(self, vector, context_ids):
+        context_ids = tuple(context_ids)
+        query = self._unit(vector)
+        now = time.monotonic()
+        with self._lock:
+            best_key, best_sim = None, self.threshold
+            for key in list(self._buckets.get(context_ids, ())):
+                stored_at, cached, _, _ = self._entries[key]
+                if now - stored_at >= self.ttl:
+                    self._drop(key)
+                    continue
+                sim = float(np.dot(query, cached))
+                if sim >= best_sim:
+                    best_key, best_sim = key, sim
+            if best_key is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(best_key)
+            self.hits += 1
+            return self._entries[best_key][3]
+
+    def set(self, vector, context_ids, response):
+        context_ids = tuple(context_ids)
+        with self._lock:
+            key = self._next_key
+            self._next_key += 1
+            self._entries[key] = (time.monotonic(), self._unit(vector), context_ids, response)
+            self._buckets.setdefault(context_ids, set()).add(key)
+            for answer_id in context_ids:
+                self._by_answer.setdefault(answer_id, set()).add(key)
+            while len(self._entries) > self.max_size:
+                self._drop(next(iter(self._entries)))
+                self.evictions += 1
+
+    def evict_answers(self, answer_ids):
+        """Forget responses built on any of `answer_ids` (None: forget everything)."""
+        with self._lock:
+            if answer_ids is None:
+                self.invalidations += len(self._entries)
+                self._entries.clear()
+                self._buckets.clear()
+                self._by_answer.clear()
+                return
+            for answer_id in answer_ids:
+                for key in list(self._by_answer.get(answer_id, ())):
+                    self._drop(key)
+                    self.invalidations += 1
+
+    def clear(self):
+        self.evict_answers(None)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "threshold": self.threshold,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
@@ -0,0 +1,224 @@
+# ai/utils/embedding_queue.py
+"""
+Background embedding of answer changes.
+
+Answer signals only enqueue the answer id; a worker thread picks pending ids
+up in batches of at most AI_EMBED_BATCH_SIZE (or whatever has accumulated
+after AI_EMBED_MAX_WAIT seconds), reads the current rows in one query,
+encodes all active ones in a single `encode` call and applies the whole
+batch to the resident index with one journal append.
+
+Because the queue is keyed by answer id, repeated edits to the same answer
+before the worker gets to it collapse into one embed of its latest content.
+Answers that were deleted or deactivated in the meantime are removed.
+
+With `background=False` there is no worker thread: enqueued ids wait until
+`flush()` embeds them in the calling thread (tests).
+"""
+import atexit
+import threading
+import time
+
+from django.conf import settings
+from django.db import close_old_connections
+
+from ai.utils import embeddings
+from ai.utils.index_manager import get_index_manager
+
+
+class EmbeddingPipeline:
+    def __init__(self, encode=None, batch_size=None, max_wait=None, background=True):
+        self._encode = encode
+        self.background = background
+        self.batch_size = batch_size or getattr(settings, "AI_EMBED_BATCH_SIZE", 64)
+        self.max_wait = max_wait if max_wait is not None else getattr(settings, "AI_EMBED_MAX_WAIT", 0.5)
+
+        self._pending = {}                  # answer id -> first enqueue time
+        self._cond = threading.Condition()
+        self._thread = None
+        self._stopping = False
+        self._flushing = 0
+        self._busy = False
+
+        self.enqueued = 0
+        self.coalesced = 0
+        self.batches = 0
+        self.embedded = 0
+        self.removed = 0
+        self.errors = 0
+        self.last_batch_size = 0
+        self.last_batch_seconds = 0.0
+        self.last_lag_seconds = 0.0
+
+    def encode(self, texts):
+        encode = self._encode or embeddings.encode
+        return encode(texts, batch_size=self.batch_size)
+
+    # ------------------------------------------------------------------ #
+    # Producer side
+    # ------------------------------------------------------------------ #
+    def enqueue(self, answer_id):
+        with self._cond:
+            self.enqueued += 1
+            if answer_id in self._pending:
+                self.coalesced += 1
+            else:
+                self._pending[answer_id] = time.monotonic()
+            self._ensure_worker()
+            self._cond.notify()
+
+    def _ensure_worker(self):
+        if self.background and (self._thread is None or not self._thread.is_alive()):
+            self._stopping = False
+            self._thread = threading.Thread(target=self._run, name="embedding-pipeline", daemon=True)
+            self._thread.start()
+
+    # ------------------------------------------------------------------ #
+    # Worker side
+    # ------------------------------------------------------------------ #
+    def _take_batch(self):
+        """Block until a batch is due, then pop and return it (oldest first)."""
+        with self._cond:
+            while True:
+                if self._pending:
+                    oldest = next(iter(self._pending.values()))
+                    wait = self.max_wait - (time.monotonic() - oldest)
+                    if (len(self._pending) >= self.batch_size or wait <= 0
+                            or self._stopping or self._flushing):
+                        break
+                    self._cond.wait(wait)
+                elif self._stopping:
+                    return {}
+                else:
+                    self._cond.wait()
+            return self._pop_batch()
+
+    def _pop_batch(self):
+        batch = {}
+        for answer_id in list(self._pending)[:self.batch_size]:
+            batch[answer_id] = self._pending.pop(answer_id)
+        self._busy = True
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._take_batch()
+            if not batch:
+                return
+            try:
+                self._process(batch)
+            except Exception as e:
+                self.errors += 1
+                print("⚠️  Embedding batch failed:", e)
+            finally:
+                close_old_connections()
+                with self._cond:
+                    self._busy = False
+                    self._cond.notify_all()
+
+    def _process(self, batch):
+        from main.models import Answer
+
+        started = time.monotonic()
+        rows = (
+            Answer.objects
+            .filter(id__in=list(batch), is_active=True)
+            .values_list("id", "content", "question__title")
+        )
+        rows = list(rows)
+        removes = set(batch) - {answer_id for answer_id, _, _ in rows}
+
+        upserts = []
+        if rows:
+            vectors = self.encode([content for _, content, _ in rows])
+            upserts = [
+                (answer_id, vec, content, title)
+                for (answer_id, content, title), vec in zip(rows, vectors)
+            ]
+        get_index_manager().apply(upserts=upserts, removes=removes)
+
+        self.batches += 1
+        self.embedded += len(upserts)
+        self.removed += len(removes)
+        self.last_batch_size = len(batch)
+        self.last_batch_seconds = time.monotonic() - started
+        self.last_lag_seconds = time.monotonic() - min(batch.values())
+
+    def flush(self, timeout=None):
+        """Wait until everything enqueued so far has been applied to the index."""
+        if not self.background:
+            while True:
+                with self._cond:
+                    if not self._pending:
+                        return True
+                    batch = self._pop_batch()
+                try:
+                    self._process(batch)
+                finally:
+                    with self._cond:
+                        self._busy = False
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            if self._pending:
+                self._ensure_worker()
+            self._flushing += 1
+            try:
+                while self._pending or self._busy:
+                    self._cond.notify_all()
+                    remaining = None if deadline is None else deadline - time.monotonic()
+                    if remaining is not None and remaining <= 0:
+                        return False
+                    self._cond.wait(remaining)
+            finally:
+                self._flushing -= 1
+        return True
+
+    def stop(self):
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join()
+
+    # ------------------------------------------------------------------ #
+    # Metrics
+    # ------------------------------------------------------------------ #
+    def metrics(self):
+        with self._cond:
+            oldest = min(self._pending.values(), default=None)
+            return {
+                "queue_depth": len(self._pending),
+                "lag_seconds": 0.0 if oldest is None else round(time.monotonic() - oldest, 3),
+                "enqueued": self.enqueued,
+                "coalesced": self.coalesced,
+                "batches": self.batches,
+                "embedded": self.embedded,
+                "removed": self.removed,
+                "errors": self.errors,
+                "last_batch_size": self.last_batch_size,
+                "last_batch_seconds": round(self.last_batch_seconds, 3),
+                "last_lag_seconds": round(self.last_lag_seconds, 3),
+            }
+
+
+_pipeline = None
+_pipeline_lock = threading.Lock()
+
+
+def get_embedding_pipeline():
+    """Process-wide EmbeddingPipeline, created on first use."""
+    global _pipeline
+    if _pipeline is None:
+        with _pipeline_lock:
+            if _pipeline is None:
+                _pipeline = EmbeddingPipeline()
+                atexit.register(_pipeline.stop)
+    return _pipeline
+
+
+def set_embedding_pipeline(pipeline):
+    """Replace the process-wide pipeline (tests); returns the previous one."""
+    global _pipeline
+    with _pipeline_lock:
+        previous, _pipeline = _pipeline, pipeline
+    return previous
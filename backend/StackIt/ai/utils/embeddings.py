@@ -0,0 +1,48 @@
+# ai/utils/embeddings.py
+"""
+Shared sentence-embedding model.
+
+Loading SentenceTransformer takes seconds and a few hundred MB, so it is
+created once per process on first use instead of at import time. Web
+workers can load it up front with `warm_up()` (see AI_PREWARM), and tests
+can swap it for a cheap stub with `set_embedding_model()`.
+"""
+import threading
+
+from main.instrumentation import timed
+
+EMB_MODEL_ID = "all-MiniLM-L6-v2"          # the FAISS index is built with this model
+
+_model = None
+_model_lock = threading.Lock()
+
+
+def get_embedding_model():
+    global _model
+    if _model is None:
+        with _model_lock:
+            if _model is None:
+                from sentence_transformers import SentenceTransformer
+                _model = SentenceTransformer(EMB_MODEL_ID)
+    return _model
+
+
+def set_embedding_model(model):
+    """Replace the shared model (e.g. with a stub in tests); returns the previous one."""
+    global _model
+    with _model_lock:
+        previous, _model = _model, model
+    return previous
+
+
+def encode(texts, **kwargs):
+    model = get_embedding_model()
+    with timed("embedding"):
+        return model.encode(texts, **kwargs)
+
+
+def warm_up():
+    """Load the embedding model and the answer index now rather than on the first request."""
+    from ai.utils.index_manager import get_index_manager
+    get_embedding_model()
+    get_index_manager()
@@ -0,0 +1,109 @@
+# ai/utils/index_factory.py
+"""
+FAISS index types for the answer index.
+
+    flat      exact search, scans every vector (default)
+    ivf_flat  inverted lists over k-means cells, scans AI_INDEX_NPROBE cells
+    ivf_pq    like ivf_flat but with product-quantized vectors (~16x smaller)
+    hnsw      graph search, no training, tuned with AI_INDEX_EF_SEARCH
+
+All of them are wrapped in an IndexIDMap so the resident index can address
+vectors by id. IVF types need training on a sample of the corpus, which
+build_faiss does; with too few vectors to train they fall back to flat.
+"""
+import math
+
+import faiss
+import numpy as np
+from django.conf import settings
+
+INDEX_TYPES = ("flat", "ivf_flat", "ivf_pq", "hnsw")
+
+PQ_BITS = 8
+HNSW_M = 32
+HNSW_EF_CONSTRUCTION = 80
+MIN_POINTS_PER_CENTROID = 39        # FAISS warns below this
+
+
+def default_index_type():
+    return getattr(settings, "AI_INDEX_TYPE", "flat")
+
+
+def _nlist_for(n_vectors):
+    # Rule of thumb: ~4*sqrt(n) cells, but keep enough points per cell to train.
+    return max(1, min(int(4 * math.sqrt(n_vectors)), n_vectors // MIN_POINTS_PER_CENTROID))
+
+
+def _pq_m_for(dim):
+    # Largest sub-quantizer count <= dim/8 that divides dim (48 for MiniLM's 384).
+    for m in range(max(1, dim // 8), 0, -1):
+        if dim % m == 0:
+            return m
+    return 1
+
+
+def min_training_size(index_type):
+    if index_type == "ivf_flat":
+        return MIN_POINTS_PER_CENTROID
+    if index_type == "ivf_pq":
+        return MIN_POINTS_PER_CENTROID * (1 << PQ_BITS)
+    return 0
+
+
+def make_index(index_type, dim, n_vectors):
+    """
+    Return an empty IndexIDMap of the requested type, sized for roughly
+    `n_vectors` vectors. Falls back to flat when there is too little data
+    to train an IVF index.
+    """
+    if index_type not in INDEX_TYPES:
+        raise ValueError(f"Unknown index type {index_type!r}, expected one of {', '.join(INDEX_TYPES)}")
+    if n_vectors < min_training_size(index_type):
+        index_type = "flat"
+
+    if index_type == "ivf_flat":
+        quantizer = faiss.IndexFlatL2(dim)
+        inner = faiss.IndexIVFFlat(quantizer, dim, _nlist_for(n_vectors))
+    elif index_type == "ivf_pq":
+        quantizer = faiss.IndexFlatL2(dim)
+        inner = faiss.IndexIVFPQ(quantizer, dim, _nlist_for(n_vectors), _pq_m_for(dim), PQ_BITS)
+    elif index_type == "hnsw":
+        inner = faiss.IndexHNSWFlat(dim, HNSW_M)
+        inner.hnsw.efConstruction = HNSW_EF_CONSTRUCTION
+    else:
+        inner = faiss.IndexFlatL2(dim)
+
+    index = faiss.IndexIDMap(inner)
+    configure_search(index)
+    return index
+
+
+def index_type_of(index):
+    inner = faiss.downcast_index(index.index) if isinstance(index, faiss.IndexIDMap) else index
+    if isinstance(inner, faiss.IndexIVFPQ):
+        return "ivf_pq"
+    if isinstance(inner, faiss.IndexIVFFlat):
+        return "ivf_flat"
+    if isinstance(inner, faiss.IndexHNSWFlat):
+        return "hnsw"
+    return "flat"
+
+
+def train(index, sample):
+    if not index.is_trained:
+        index.train(np.ascontiguousarray(sample, dtype="float32"))
+
+
+def configure_search(index, nprobe=None, ef_search=None):
+    """Apply the query-time knobs (IVF nprobe / HNSW efSearch) from settings."""
+    inner = faiss.downcast_index(index.index) if isinstance(index, faiss.IndexIDMap) else index
+    if isinstance(inner, faiss.IndexIVF):
+        inner.nprobe = min(inner.nlist, nprobe or getattr(settings, "AI_INDEX_NPROBE", 16))
+    elif isinstance(inner, faiss.IndexHNSW):
+        inner.hnsw.efSearch = ef_search or getattr(settings, "AI_INDEX_EF_SEARCH", 64)
+    return index
+
+
+def supports_remove(index):
+    # HNSW graphs cannot drop nodes; tombstones stay until the next build.
+    return index_type_of(index) != "hnsw"
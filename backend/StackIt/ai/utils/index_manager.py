@@ -0,0 +1,514 @@
+# ai/utils/index_manager.py
+"""
+Resident FAISS index for StackIt answers.
+
+The index and its metadata are loaded once per process and kept in memory.
+Every change is first appended to a journal (one line per op) and then
+applied in place, so an answer write costs O(1) disk I/O instead of
+rewriting the whole index. The journal is folded into a fresh snapshot
+every SNAPSHOT_EVERY_OPS writes / SNAPSHOT_EVERY_SECONDS, and on shutdown.
+
+Each answer gets an internal vector id ("vid"). An update adds a new vid and
+tombstones the old one, a removal just tombstones it; tombstoned vectors are
+skipped at search time and compacted away when they pile up. This keeps
+writes from paying FAISS' O(n) `remove_ids` on every edit.
+
+Only the id mapping lives in memory, as two flat int64 arrays (vid -> answer
+id and answer id -> vid), so lookups in either direction are O(1) and cost
+8 bytes per entry. Answer text and question titles sit in a SQLite side
+table (ContentStore) and are read only for the hits a search returns.
+
+Several processes can share the same files: appends and snapshots are
+serialized with an flock on LOCK_PATH, and every process tails the journal
+to pick up writes made by the others.
+"""
+import atexit
+import base64
+import fcntl
+import json
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+import faiss
+import numpy as np
+
+from ai.utils.index_factory import configure_search, supports_remove
+from main.instrumentation import timed
+
+INDEX_PATH   = "ai/faiss_data/answers.index"
+META_PATH    = "ai/faiss_data/answers_meta.npz"
+STORE_PATH   = "ai/faiss_data/answers.sqlite3"
+JOURNAL_PATH = "ai/faiss_data/answers.journal"
+LOCK_PATH    = "ai/faiss_data/answers.lock"
+
+LEGACY_META_NAME = "answers_meta.pkl"    # pickled metadata, upgraded on load
+
+SNAPSHOT_EVERY_OPS     = 500
+SNAPSHOT_EVERY_SECONDS = 300
+COMPACT_RATIO          = 0.1     # compact when >10% of vectors are tombstones
+
+META_FORMAT = 3
+
+_change_listeners = []
+
+
+def on_answers_changed(callback):
+    """
+    Register `callback(answer_ids)` to run whenever answers are added, updated
+    or removed in this process' resident index, including changes picked up
+    from other processes. `answer_ids` is None when the whole index was
+    reloaded. Callbacks run under the index lock and must be cheap.
+    """
+    _change_listeners.append(callback)
+    return callback
+
+
+def _notify(answer_ids):
+    for callback in _change_listeners:
+        callback(answer_ids)
+
+
+def _encode_vec(vec):
+    return base64.b64encode(np.asarray(vec, dtype="float32").tobytes()).decode("ascii")
+
+
+def _decode_vec(data):
+    return np.frombuffer(base64.b64decode(data), dtype="float32")
+
+
+@contextmanager
+def file_lock(path=LOCK_PATH, mode=fcntl.LOCK_EX):
+    """flock guarding the index files against concurrent writers."""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "a") as f:
+        fcntl.flock(f, mode)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def _grow(array, size):
+    """Return `array` padded with -1 to at least `size` entries (doubling)."""
+    if size <= len(array):
+        return array
+    grown = np.full(max(size, 2 * len(array), 1024), -1, dtype="int64")
+    grown[:len(array)] = array
+    return grown
+
+
+class ContentStore:
+    """
+    SQLite side table answer id -> (question title, content).
+
+    Only the writer holding `file_lock()` changes it; every process reads it
+    for the top-k hits of its searches.
+    """
+
+    SCHEMA = "CREATE TABLE IF NOT EXISTS answers (id INTEGER PRIMARY KEY, question TEXT NOT NULL, content TEXT NOT NULL)"
+
+    def __init__(self, path):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute(self.SCHEMA)
+        self._conn.commit()
+
+    @classmethod
+    def create(cls, path, rows):
+        """Write a fresh store with `rows` of (answer id, question, content) to `path`."""
+        if os.path.exists(path):
+            os.remove(path)
+        store = cls(path)
+        with store._conn:
+            store._conn.executemany("INSERT OR REPLACE INTO answers VALUES (?, ?, ?)", rows)
+        store.close()
+
+    def write(self, rows=(), removes=()):
+        """Insert/replace `rows` and delete `removes` in one transaction."""
+        with self._conn:
+            self._conn.executemany("DELETE FROM answers WHERE id = ?", ((answer_id,) for answer_id in removes))
+            self._conn.executemany("INSERT OR REPLACE INTO answers VALUES (?, ?, ?)", rows)
+
+    def get_many(self, answer_ids):
+        """Return {answer id: (question, content)} for the ids that exist."""
+        if not answer_ids:
+            return {}
+        placeholders = ",".join("?" * len(answer_ids))
+        rows = self._conn.execute(
+            f"SELECT id, question, content FROM answers WHERE id IN ({placeholders})", list(answer_ids),
+        )
+        return {answer_id: (question, content) for answer_id, question, content in rows}
+
+    def close(self):
+        self._conn.close()
+
+
+def write_snapshot(index, vid_answers, index_path=INDEX_PATH, meta_path=META_PATH,
+                   journal_path=JOURNAL_PATH, generation=0, next_vid=None,
+                   store_path=STORE_PATH, contents=None):
+    """
+    Atomically replace the on-disk index, metadata and journal. Callers
+    outside AnswerIndexManager should hold `file_lock()` while doing so.
+
+    `index` must be an IndexIDMap keyed by vid and `vid_answers` an int64
+    array mapping vid -> answer id (-1 for tombstoned vids). When `contents`
+    (an iterable of (answer id, question, content)) is given, the content
+    store is rebuilt from it too.
+    """
+    vid_answers = np.asarray(vid_answers, dtype="int64")
+    if next_vid is None:
+        next_vid = len(vid_answers)
+    os.makedirs(os.path.dirname(index_path) or ".", exist_ok=True)
+
+    faiss.write_index(index, index_path + ".tmp")
+    with open(meta_path + ".tmp", "wb") as f:
+        np.savez(f, format=META_FORMAT, generation=generation, next_vid=next_vid,
+                 vid_answers=vid_answers[:next_vid])
+    with open(journal_path + ".tmp", "w") as f:
+        f.write(json.dumps({"generation": generation}) + "\n")
+    if contents is not None:
+        ContentStore.create(store_path + ".tmp", contents)
+        os.replace(store_path + ".tmp", store_path)
+
+    os.replace(index_path + ".tmp", index_path)
+    os.replace(meta_path + ".tmp", meta_path)
+    os.replace(journal_path + ".tmp", journal_path)
+
+
+class AnswerIndexManager:
+    def __init__(self, index_path=INDEX_PATH, meta_path=META_PATH,
+                 store_path=STORE_PATH, journal_path=JOURNAL_PATH, lock_path=LOCK_PATH,
+                 snapshot_every_ops=SNAPSHOT_EVERY_OPS,
+                 snapshot_every_seconds=SNAPSHOT_EVERY_SECONDS):
+        self.index_path = index_path
+        self.meta_path = meta_path
+        self.store_path = store_path
+        self.journal_path = journal_path
+        self.lock_path = lock_path
+        self.snapshot_every_ops = snapshot_every_ops
+        self.snapshot_every_seconds = snapshot_every_seconds
+
+        self._lock = threading.RLock()
+        self._version = 0
+        self._snapshot_thread = None
+        self._ops_since_snapshot = 0
+        self._last_snapshot = time.monotonic()
+        self._store = None
+
+        with self._file_lock(fcntl.LOCK_SH):
+            upgraded = self._load()
+        if upgraded:
+            self.snapshot()     # persist the upgraded metadata in the new format
+
+    # ------------------------------------------------------------------ #
+    # Loading
+    # ------------------------------------------------------------------ #
+    def _file_lock(self, mode):
+        return file_lock(self.lock_path, mode)
+
+    def _load(self):
+        """
+        Load the snapshot from disk and replay the journal on top of it.
+        Returns True when the metadata was upgraded from the legacy pickle.
+        """
+        self._version += 1
+        index = faiss.read_index(self.index_path) if os.path.exists(self.index_path) else None
+        if self._store is not None:
+            self._store.close()
+        self._store = ContentStore(self.store_path)
+
+        upgraded = False
+        legacy_path = os.path.join(os.path.dirname(self.meta_path), LEGACY_META_NAME)
+        if os.path.exists(self.meta_path):
+            with np.load(self.meta_path) as meta:
+                generation, next_vid = int(meta["generation"]), int(meta["next_vid"])
+                vid_answers = meta["vid_answers"]
+        elif os.path.exists(legacy_path):
+            index, generation, next_vid, vid_answers = self._upgrade_legacy(index, legacy_path)
+            upgraded = True
+        else:
+            generation, next_vid, vid_answers = 0, 0, np.empty(0, dtype="int64")
+
+        self.index = configure_search(index) if index is not None else None
+        self.generation = generation
+        self.next_vid = next_vid
+        self._vid_answer = _grow(vid_answers.astype("int64"), next_vid)
+        live = np.flatnonzero(self._vid_answer >= 0)
+        answer_ids = self._vid_answer[live]
+        self._answer_vid = _grow(np.empty(0, dtype="int64"), int(answer_ids.max()) + 1 if len(live) else 0)
+        self._answer_vid[answer_ids] = live
+        self._live = len(live)
+
+        self._journal_ino = None
+        self._journal_offset = 0
+        self._journal_stale = False
+        _notify(None)
+        self._replay_journal()
+        return upgraded
+
+    def _upgrade_legacy(self, index, legacy_path):
+        """
+        Read metadata pickled by older versions (a list of dicts for a
+        positional IndexFlatL2, or a dict with an "answers" map) and move the
+        answer text into the content store.
+        """
+        with open(legacy_path, "rb") as f:
+            meta = pickle.load(f)
+
+        if isinstance(meta, list):
+            vid_answers = np.array([m["id"] for m in meta], dtype="int64")
+            rows = [(m["id"], m["question"], m["content"]) for m in meta]
+            if index is not None and index.ntotal:
+                vectors = index.reconstruct_n(0, index.ntotal)
+                index = faiss.IndexIDMap(faiss.IndexFlatL2(index.d))
+                index.add_with_ids(vectors, np.arange(len(vectors), dtype="int64"))
+            generation, next_vid = 0, len(meta)
+        else:
+            answers = meta["answers"]
+            generation, next_vid = meta["generation"], meta["next_vid"]
+            vid_answers = np.full(next_vid, -1, dtype="int64")
+            rows = []
+            for answer_id, a in answers.items():
+                vid_answers[a["vid"]] = answer_id
+                rows.append((answer_id, a["question"], a["content"]))
+
+        self._store.write(rows)
+        return index, generation, next_vid, vid_answers
+
+    def _replay_journal(self):
+        try:
+            st = os.stat(self.journal_path)
+        except FileNotFoundError:
+            return
+        with open(self.journal_path, "rb") as f:
+            header = f.readline()
+            try:
+                generation = json.loads(header)["generation"]
+            except (ValueError, KeyError):
+                generation = None
+            if generation != self.generation:
+                # Stale journal left over from before the current snapshot;
+                # it is replaced on the next write.
+                self._journal_stale = True
+                self._journal_ino = st.st_ino
+                self._journal_offset = st.st_size
+                return
+            self._journal_ino = st.st_ino
+            self._journal_offset = len(header)
+        self._tail_journal()
+
+    def _tail_journal(self):
+        """Apply journal entries appended since the last read (by any process)."""
+        with open(self.journal_path, "rb") as f:
+            f.seek(self._journal_offset)
+            data = f.read()
+        end = data.rfind(b"\n") + 1     # ignore a half-written trailing line
+        for line in data[:end].splitlines():
+            if line:
+                self._apply(json.loads(line))
+        self._journal_offset += end
+
+    def _sync(self, locked=False):
+        try:
+            st = os.stat(self.journal_path)
+        except FileNotFoundError:
+            return
+        if st.st_ino != self._journal_ino:
+            # Another process wrote a new snapshot and rotated the journal.
+            if locked:
+                self._load()
+            else:
+                with self._file_lock(fcntl.LOCK_SH):
+                    self._load()
+        elif st.st_size > self._journal_offset:
+            self._tail_journal()
+
+    # ------------------------------------------------------------------ #
+    # Mutations
+    # ------------------------------------------------------------------ #
+    def _vid_of(self, answer_id):
+        return int(self._answer_vid[answer_id]) if answer_id < len(self._answer_vid) else -1
+
+    def _apply(self, entry):
+        self._version += 1
+        answer_id = entry["id"]
+        old = self._vid_of(answer_id)
+        if old >= 0:
+            self._vid_answer[old] = -1
+            self._answer_vid[answer_id] = -1
+            self._live -= 1
+
+        if entry["op"] == "upsert":
+            vid = entry["vid"]
+            vec = _decode_vec(entry["vec"]).reshape(1, -1)
+            if self.index is None:
+                self.index = faiss.IndexIDMap(faiss.IndexFlatL2(vec.shape[1]))
+            self.index.add_with_ids(vec, np.array([vid], dtype="int64"))
+            self.next_vid = max(self.next_vid, vid + 1)
+            self._vid_answer = _grow(self._vid_answer, self.next_vid)
+            self._answer_vid = _grow(self._answer_vid, answer_id + 1)
+            self._vid_answer[vid] = answer_id
+            self._answer_vid[answer_id] = vid
+            self._live += 1
+        _notify({answer_id})
+
+    def _write(self, upserts, removes):
+        with self._lock:
+            with self._file_lock(fcntl.LOCK_EX):
+                self._sync(locked=True)
+                lines, rows = [], []
+                for answer_id, vector, content, question in upserts:
+                    entry = {"op": "upsert", "id": answer_id, "vid": self.next_vid, "vec": _encode_vec(vector)}
+                    self.next_vid += 1
+                    lines.append(json.dumps(entry) + "\n")
+                    rows.append((answer_id, question, content))
+                lines += [json.dumps({"op": "remove", "id": answer_id}) + "\n" for answer_id in removes]
+                if self._journal_ino is None or self._journal_stale:
+                    with open(self.journal_path + ".tmp", "w") as f:
+                        f.write(json.dumps({"generation": self.generation}) + "\n")
+                    os.replace(self.journal_path + ".tmp", self.journal_path)
+                    self._journal_stale = False
+                    st = os.stat(self.journal_path)
+                    self._journal_ino, self._journal_offset = st.st_ino, st.st_size
+                self._store.write(rows, removes)
+                with open(self.journal_path, "a") as f:
+                    f.write("".join(lines))
+                self._tail_journal()
+            self._ops_since_snapshot += len(lines)
+            self._maybe_snapshot()
+
+    def upsert(self, answer_id, vector, content, question):
+        self.apply(upserts=[(answer_id, vector, content, question)])
+
+    def apply(self, upserts=(), removes=()):
+        """
+        Apply a batch of changes with a single journal append.
+
+        `upserts` is an iterable of (answer_id, vector, content, question),
+        `removes` an iterable of answer ids.
+        """
+        upserts, removes = list(upserts), list(removes)
+        if upserts or removes:
+            self._write(upserts, removes)
+
+    def remove(self, answer_id):
+        with self._lock:
+            self._sync()
+            if self._vid_of(answer_id) < 0:
+                return
+        self._write([], [answer_id])
+
+    # ------------------------------------------------------------------ #
+    # Reads
+    # ------------------------------------------------------------------ #
+    def search(self, query_vectors, k):
+        """
+        Return the k nearest live answers for the first query vector as a
+        list of (distance, {"id", "content", "question"}) tuples.
+        """
+        with timed("vector"), self._lock:
+            self._sync()
+            if self.index is None or not self._live:
+                return []
+            query = np.asarray(query_vectors, dtype="float32").reshape(-1, self.index.d)
+            fetch = min(self.index.ntotal, k + self.index.ntotal - self._live)
+            D, I = self.index.search(query[:1], fetch)
+
+            hits = []
+            for dist, vid in zip(D[0], I[0]):
+                if vid == -1:
+                    continue  # no more matches
+                answer_id = int(self._vid_answer[vid])
+                if answer_id < 0:
+                    continue  # tombstoned
+                hits.append((float(dist), answer_id))
+                if len(hits) == k:
+                    break
+
+            contents = self._store.get_many([answer_id for _, answer_id in hits])
+            return [
+                (dist, {"id": answer_id, "content": contents[answer_id][1], "question": contents[answer_id][0]})
+                for dist, answer_id in hits
+                if answer_id in contents     # removed by another process we have not caught up with
+            ]
+
+    def __contains__(self, answer_id):
+        with self._lock:
+            self._sync()
+            return self._vid_of(answer_id) >= 0
+
+    def version(self):
+        """Counter that changes whenever the index content does (in any process)."""
+        with self._lock:
+            self._sync()
+            return self._version
+
+    def __len__(self):
+        with self._lock:
+            self._sync()
+            return self._live
+
+    # ------------------------------------------------------------------ #
+    # Snapshots
+    # ------------------------------------------------------------------ #
+    def _maybe_snapshot(self):
+        due = (self._ops_since_snapshot >= self.snapshot_every_ops
+               or time.monotonic() - self._last_snapshot >= self.snapshot_every_seconds)
+        if not due or (self._snapshot_thread and self._snapshot_thread.is_alive()):
+            return
+        self._snapshot_thread = threading.Thread(target=self.snapshot, daemon=True)
+        self._snapshot_thread.start()
+
+    def snapshot(self):
+        """Fold the journal into a new snapshot on disk and rotate the journal."""
+        with self._lock:
+            with self._file_lock(fcntl.LOCK_EX):
+                self._sync(locked=True)
+                if self.index is None:
+                    return
+                dead = self.index.ntotal - self._live
+                if dead and supports_remove(self.index) and dead >= COMPACT_RATIO * self.index.ntotal:
+                    vids = faiss.vector_to_array(self.index.id_map)
+                    self.index.remove_ids(faiss.IDSelectorBatch(vids[self._vid_answer[vids] < 0]))
+                self.generation += 1
+                write_snapshot(
+                    self.index, self._vid_answer,
+                    index_path=self.index_path, meta_path=self.meta_path,
+                    journal_path=self.journal_path, generation=self.generation,
+                    next_vid=self.next_vid,
+                )
+                st = os.stat(self.journal_path)
+                self._journal_ino, self._journal_offset = st.st_ino, st.st_size
+            self._ops_since_snapshot = 0
+            self._last_snapshot = time.monotonic()
+
+    def close(self):
+        if self._ops_since_snapshot:
+            self.snapshot()
+
+
+_manager = None
+_manager_lock = threading.Lock()
+
+
+def get_index_manager():
+    """Process-wide AnswerIndexManager, created on first use."""
+    global _manager
+    if _manager is None:
+        with _manager_lock:
+            if _manager is None:
+                _manager = AnswerIndexManager()
+                atexit.register(_manager.close)
+    return _manager
+
+
+def set_index_manager(manager):
+    """Replace the process-wide manager (e.g. with one on a temp dir in tests); returns the previous one."""
+    global _manager
+    with _manager_lock:
+        previous, _manager = _manager, manager
+    return previous
@@ -0,0 +1,159 @@
+# ai/utils/llm.py
+"""
+Chat-completion client shared by the AI views and the RAG pipeline.
+
+The OpenAI-compatible endpoint, key and model come from settings
+(AI_LLM_BASE_URL / AI_LLM_API_KEY / AI_LLM_MODEL), so tests and local
+development can point them at a fake server. The client is created on first
+use rather than at import time.
+
+The async variants (used by the ASGI views) share one pooled HTTP client per
+event loop. The views run them under `slots`, which caps the number of
+in-flight upstream calls per process at AI_LLM_MAX_CONCURRENCY: a call
+inside `upstream_slot()`, a streamed answer from `slots.acquire()` until
+its response is closed.
+"""
+import asyncio
+import threading
+import weakref
+from contextlib import contextmanager
+
+from django.conf import settings
+
+from main.instrumentation import timed
+
+_clients = {}
+_clients_lock = threading.Lock()
+_async_clients = weakref.WeakKeyDictionary()        # event loop -> {key: AsyncOpenAI}
+
+
+class UpstreamSaturated(Exception):
+    """All AI_LLM_MAX_CONCURRENCY upstream slots are in use."""
+
+
+class _Slots:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.rejected = 0
+
+    def acquire(self):
+        with self._lock:
+            if self.in_flight >= settings.AI_LLM_MAX_CONCURRENCY:
+                self.rejected += 1
+                raise UpstreamSaturated()
+            self.in_flight += 1
+
+    def release(self):
+        with self._lock:
+            self.in_flight -= 1
+
+
+slots = _Slots()
+
+
+@contextmanager
+def upstream_slot():
+    """Hold one upstream slot, or raise UpstreamSaturated right away if none is free."""
+    slots.acquire()
+    try:
+        yield
+    finally:
+        slots.release()
+
+
+def get_client():
+    from openai import OpenAI
+
+    key = (settings.AI_LLM_BASE_URL, settings.AI_LLM_API_KEY)
+    client = _clients.get(key)
+    if client is None:
+        with _clients_lock:
+            client = _clients.get(key)
+            if client is None:
+                client = _clients[key] = OpenAI(api_key=key[1], base_url=key[0])
+    return client
+
+
+def _messages(prompt):
+    return [{"role": "user", "content": prompt}]
+
+
+def complete(prompt):
+    """Return the full completion for `prompt`."""
+    with timed("llm"):
+        response = get_client().chat.completions.create(
+            model=settings.AI_LLM_MODEL,
+            messages=_messages(prompt),
+        )
+    return response.choices[0].message.content.strip()
+
+
+def stream(prompt):
+    """Yield completion text deltas for `prompt` as the server produces them."""
+    with timed("llm"):
+        chunks = get_client().chat.completions.create(
+            model=settings.AI_LLM_MODEL,
+            messages=_messages(prompt),
+            stream=True,
+        )
+        try:
+            for chunk in chunks:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+        finally:
+            chunks.close()
+
+
+def get_async_client():
+    import httpx
+    from openai import AsyncOpenAI
+
+    loop = asyncio.get_running_loop()
+    key = (settings.AI_LLM_BASE_URL, settings.AI_LLM_API_KEY)
+    clients = _async_clients.setdefault(loop, {})
+    client = clients.get(key)
+    if client is None:
+        http_client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=settings.AI_LLM_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.AI_LLM_MAX_CONNECTIONS,
+            ),
+            timeout=httpx.Timeout(settings.AI_LLM_TIMEOUT, connect=5.0),
+        )
+        client = clients[key] = AsyncOpenAI(
+            api_key=key[1], base_url=key[0], http_client=http_client, max_retries=0,
+        )
+    return client
+
+
+async def acomplete(prompt):
+    """Async `complete`, bounded by AI_LLM_TIMEOUT seconds overall."""
+    with timed("llm"):
+        response = await asyncio.wait_for(
+            get_async_client().chat.completions.create(
+                model=settings.AI_LLM_MODEL,
+                messages=_messages(prompt),
+            ),
+            timeout=settings.AI_LLM_TIMEOUT,
+        )
+    return response.choices[0].message.content.strip()
+
+
+async def astream(prompt):
+    """Async `stream`; each wait for the next delta is bounded by AI_LLM_TIMEOUT."""
+    with timed("llm"):
+        chunks = await asyncio.wait_for(
+            get_async_client().chat.completions.create(
+                model=settings.AI_LLM_MODEL,
+                messages=_messages(prompt),
+                stream=True,
+            ),
+            timeout=settings.AI_LLM_TIMEOUT,
+        )
+        try:
+            async for chunk in chunks:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+        finally:
+            await chunks.close()
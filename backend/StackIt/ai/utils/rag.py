@@ -1,38 +1,67 @@
 # ai/utils/rag.py
-import faiss
-import pickle
-import os
-from sentence_transformers import SentenceTransformer
-from openai import OpenAI
-from dotenv import load_dotenv
-
-load_dotenv()
-
-model = SentenceTransformer("all-MiniLM-L6-v2")
-client = OpenAI(
-    api_key=os.getenv("OPENROUTER_API_KEY"),
-    base_url="https://openrouter.ai/api/v1/"
+import re
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from ai.utils import llm
+from ai.utils.cache import LRUCache, SemanticCache
+from ai.utils.embeddings import encode
+from ai.utils.index_manager import get_index_manager, on_answers_changed
+
+# normalized question -> {"vector", "version", "contexts": {(k, threshold): [...]}}
+# The vector only depends on the text; retrieved contexts are reused while
+# the index version they were computed against is still current.
+query_cache = LRUCache(
+    max_size=getattr(settings, "AI_QUERY_CACHE_SIZE", 2048),
+    ttl=getattr(settings, "AI_QUERY_CACHE_TTL", 3600),
 )
 
-# Load FAISS index & metadata
-index = faiss.read_index("ai/faiss_data/answers.index")
-with open("ai/faiss_data/answers_meta.pkl", "rb") as f:
-    metadata = pickle.load(f)
+# Generated answers, reused for paraphrased questions that retrieve the same
+# context. Entries built on an answer are dropped as soon as it changes.
+response_cache = SemanticCache(
+    threshold=getattr(settings, "AI_RESPONSE_CACHE_THRESHOLD", 0.92),
+    max_size=getattr(settings, "AI_RESPONSE_CACHE_SIZE", 1024),
+    ttl=getattr(settings, "AI_RESPONSE_CACHE_TTL", 3600),
+)
+on_answers_changed(response_cache.evict_answers)
 
 
-def get_relevant_context(query, k=4, relevance_threshold=0.65):
-    """Search FAISS and filter based on distance threshold."""
-    query_vector = model.encode([query])
-    D, I = index.search(query_vector, k)
+def normalize_question(text):
+    """Case-fold, collapse whitespace and drop trailing punctuation."""
+    return re.sub(r"\s+", " ", text.casefold()).strip().rstrip("?!.").strip()
+
+
+def retrieve(query, k=4, relevance_threshold=0.65):
+    """Return (query vector, context) for `query`, served from query_cache when possible."""
+    manager = get_index_manager()
+    version = manager.version()
+    key = normalize_question(query)
+
+    entry = query_cache.get(key)
+    if entry is None:
+        entry = {"vector": encode([query]), "version": version, "contexts": {}}
+    elif entry["version"] != version:
+        entry = {"vector": entry["vector"], "version": version, "contexts": {}}
+    else:
+        context = entry["contexts"].get((k, relevance_threshold))
+        if context is not None:
+            return entry["vector"], context
+
+    hits = manager.search(entry["vector"], k)
 
     context = []
-    for dist, idx in zip(D[0], I[0]):
-        if idx == -1:
-            continue  # no more matches
+    for dist, meta in hits:
         similarity = 1 - dist  # L2 distance → cosine-like
         if similarity >= relevance_threshold:
-            context.append(metadata[idx])
-    return context
+            context.append(meta)
+
+    entry["contexts"][(k, relevance_threshold)] = context
+    query_cache.set(key, entry)
+    return entry["vector"], context
+
+
+def get_relevant_context(query, k=4, relevance_threshold=0.65):
+    """Search FAISS and filter based on distance threshold."""
+    return retrieve(query, k, relevance_threshold)[1]
 
 
 def build_prompt(contexts, question):
@@ -61,13 +90,85 @@ Your Answer:
 """
 
 
-def answer_with_rag(question):
-    context = get_relevant_context(question)
-    prompt = build_prompt(context, question)
+def build_draft_prompt(question):
+    return f"""
+You are a helpful developer answering questions on a technical Q&A platform.
 
-    response = client.chat.completions.create(
-        model="mistralai/mistral-7b-instruct:free",
-        messages=[{"role": "user", "content": prompt}],
-    )
+Here is the user's question:
+Title: {question.title}
+Description: {question.description}
 
-    return response.choices[0].message.content.strip()
+Write a clear, step-by-step, expert-level answer in Markdown format. If code is needed, include properly formatted code blocks.
+"""
+
+
+def answer_with_rag(question):
+    vector, context = retrieve(question)
+    context_ids = [c["id"] for c in context]
+    cached = response_cache.get(vector, context_ids)
+    if cached is not None:
+        return cached
+
+    prompt = build_prompt(context, question)
+    answer = llm.complete(prompt)
+    response_cache.set(vector, context_ids, answer)
+    return answer
+
+
+def stream_answer_with_rag(question):
+    """
+    Like answer_with_rag, but returns (context, tokens) where `tokens`
+    yields the answer text as the LLM produces it. Retrieval happens up
+    front; the full answer is cached once the stream has been consumed.
+    """
+    vector, context = retrieve(question)
+    context_ids = [c["id"] for c in context]
+    cached = response_cache.get(vector, context_ids)
+
+    def tokens():
+        if cached is not None:
+            yield cached
+            return
+        parts = []
+        for token in llm.stream(build_prompt(context, question)):
+            parts.append(token)
+            yield token
+        response_cache.set(vector, context_ids, "".join(parts).strip())
+
+    return context, tokens()
+
+
+# Retrieval is CPU-bound (embedding + FAISS); run it off the event loop.
+aretrieve = sync_to_async(retrieve, thread_sensitive=False)
+
+
+async def aanswer_with_rag(question):
+    """Async answer_with_rag for the ASGI views."""
+    vector, context = await aretrieve(question)
+    context_ids = [c["id"] for c in context]
+    cached = response_cache.get(vector, context_ids)
+    if cached is not None:
+        return cached
+
+    answer = await llm.acomplete(build_prompt(context, question))
+    response_cache.set(vector, context_ids, answer)
+    return answer
+
+
+async def astream_answer_with_rag(question):
+    """Async stream_answer_with_rag: returns (context, async token iterator)."""
+    vector, context = await aretrieve(question)
+    context_ids = [c["id"] for c in context]
+    cached = response_cache.get(vector, context_ids)
+
+    async def tokens():
+        if cached is not None:
+            yield cached
+            return
+        parts = []
+        async for token in llm.astream(build_prompt(context, question)):
+            parts.append(token)
+            yield token
+        response_cache.set(vector, context_ids, "".join(parts).strip())
+
+    return context, tokens()
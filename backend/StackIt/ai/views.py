@@ -1,19 +1,15 @@
 # ai/views.py
-from rest_framework.decorators import api_view, permission_classes
-from rest_framework.permissions import AllowAny, IsAuthenticated
+from django.conf import settings
+from rest_framework.decorators import api_view, permission_classes, renderer_classes
+from rest_framework.permissions import AllowAny, IsAuthenticated, IsAdminUser
+from rest_framework.renderers import JSONRenderer
 from rest_framework.response import Response
-from ai.utils.rag import answer_with_rag
+from ai.streaming import EventStreamRenderer, sse_events, sse_response
+from ai.utils import llm
+from ai.utils.rag import answer_with_rag, build_draft_prompt, query_cache, response_cache, stream_answer_with_rag
+from ai.utils.embedding_queue import get_embedding_pipeline
 from main.models import Question, Answer
-from openai import OpenAI
-from dotenv import load_dotenv
-import os
-
-load_dotenv()
-
-client = OpenAI(
-    api_key=os.getenv("OPENROUTER_API_KEY"),
-    base_url="https://openrouter.ai/api/v1/",
-)
+from main.vote_buffer import get_vote_buffer
 
 @api_view(["POST"])
 @permission_classes([AllowAny])
@@ -27,6 +23,18 @@ def rag_chatbot(request):
     return Response({"answer": clean_answer})
 
 
+@api_view(["POST"])
+@permission_classes([AllowAny])
+@renderer_classes([EventStreamRenderer, JSONRenderer])
+def rag_chatbot_stream(request):
+    question = request.data.get("question")
+    if not question:
+        return Response({"error": "No question provided"}, status=400)
+
+    context, tokens = stream_answer_with_rag(question)
+    return sse_response(sse_events(tokens, {"sources": [c["id"] for c in context]}))
+
+
 @api_view(["POST"])
 @permission_classes([IsAuthenticated])
 def ai_draft_answer(request):
@@ -40,22 +48,41 @@ def ai_draft_answer(request):
     except Question.DoesNotExist:
         return Response({"error": "Question not found"}, status=404)
 
-    prompt = f"""
-You are a helpful developer answering questions on a technical Q&A platform.
-
-Here is the user's question:
-Title: {question.title}
-Description: {question.description}
-
-Write a clear, step-by-step, expert-level answer in Markdown format. If code is needed, include properly formatted code blocks.
-"""
-
     try:
-        response = client.chat.completions.create(
-            model="mistralai/mistral-7b-instruct:free",
-            messages=[{"role": "user", "content": prompt}]
-        )
-        ai_answer = response.choices[0].message.content.strip()
+        ai_answer = llm.complete(build_draft_prompt(question))
         return Response({"answer": ai_answer})
     except Exception as e:
         return Response({"error": str(e)}, status=500)
+
+
+@api_view(["POST"])
+@permission_classes([IsAuthenticated])
+@renderer_classes([EventStreamRenderer, JSONRenderer])
+def ai_draft_answer_stream(request):
+    question_id = request.data.get("question_id")
+
+    if not question_id:
+        return Response({"error": "question_id is required"}, status=400)
+
+    try:
+        question = Question.objects.get(pk=question_id, is_active=True)
+    except Question.DoesNotExist:
+        return Response({"error": "Question not found"}, status=404)
+
+    return sse_response(sse_events(llm.stream(build_draft_prompt(question)), {"question_id": question.id}))
+
+
+@api_view(["GET"])
+@permission_classes([IsAdminUser])
+def ai_stats(request):
+    return Response({
+        "embedding_queue": get_embedding_pipeline().metrics(),
+        "vote_buffer": get_vote_buffer().metrics(),
+        "query_cache": query_cache.stats(),
+        "response_cache": response_cache.stats(),
+        "llm_upstream": {
+            "in_flight": llm.slots.in_flight,
+            "max_concurrency": settings.AI_LLM_MAX_CONCURRENCY,
+            "rejected": llm.slots.rejected,
+        },
+    })
@@ -0,0 +1,87 @@
+# main/async_views.py
+"""
+Long-poll and SSE delivery of notifications (/api/notifications/poll/ and
+/api/notifications/stream/), as async views.
+
+A waiting client only holds a coroutine parked on the doorbell (see
+main/notifications.py), not a worker thread, and under ASGI (e.g.
+`uvicorn StackIt.asgi:application`) each stream event is sent as soon as it
+is yielded. The ORM is used through sync_to_async.
+"""
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import JsonResponse
+from django.views.decorators.http import require_GET
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+
+from ai.streaming import sse_response
+from . import notifications as inbox
+from .serializers import NotificationSerializer
+
+
+def _unauthorized():
+    return JsonResponse({"detail": "Authentication credentials were not provided."}, status=401)
+
+
+def _invalid(field, message):
+    return JsonResponse({field: [message]}, status=400)
+
+
+async def _authenticate(request):
+    try:
+        result = await sync_to_async(JWTAuthentication().authenticate)(request)
+    except AuthenticationFailed:
+        return None
+    return result[0] if result else None
+
+
+async def _after(request, user):
+    """
+    Last notification id the client has: a reconnecting EventSource's
+    Last-Event-ID, else ?after=, else the newest one. None if malformed.
+    """
+    after = request.headers.get("Last-Event-ID") or request.GET.get("after")
+    if after is None:
+        return await sync_to_async(inbox.latest_id)(user.id)
+    try:
+        return int(after)
+    except ValueError:
+        return None
+
+
+def _serialize(rows):
+    return NotificationSerializer(rows, many=True).data
+
+
+@require_GET
+async def poll(request):
+    user = await _authenticate(request)
+    if user is None:
+        return _unauthorized()
+    after = await _after(request, user)
+    if after is None:
+        return _invalid("after", "Must be a notification id.")
+    try:
+        timeout = float(request.GET.get("timeout", settings.NOTIFICATION_LONG_POLL_TIMEOUT))
+    except ValueError:
+        return _invalid("timeout", "Must be a number of seconds.")
+    timeout = min(max(0.0, timeout), settings.NOTIFICATION_LONG_POLL_TIMEOUT)
+
+    rows = await inbox.wait_for_notifications(user.id, after, timeout)
+    return JsonResponse({
+        "results": await sync_to_async(_serialize)(rows),
+        "last_id": rows[-1].pk if rows else after,
+        "unread": await sync_to_async(inbox.unread_count)(user.id),
+    })
+
+
+@require_GET
+async def stream(request):
+    user = await _authenticate(request)
+    if user is None:
+        return _unauthorized()
+    after = await _after(request, user)
+    if after is None:
+        return _invalid("after", "Must be a notification id.")
+    return sse_response(inbox.stream_events(user.id, after, _serialize))
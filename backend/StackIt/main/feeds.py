@@ -0,0 +1,66 @@
+# main/feeds.py
+"""
+Precomputed ranking for the question list's ?sort= feeds.
+
+"top" and "unanswered" read stored columns (vote_score, num_answers).
+"hot" reads Question.hot_score, a Reddit-style score that combines
+engagement with age:
+
+    hot = sign(s) * log10(max(|s|, 1)) + created_at (epoch s) / FEED_HOT_TIMESCALE
+    s   = vote_score + num_answers
+
+Every question's age term grows at the same rate, so the order of two
+questions never changes just because time passes. The score only has to be
+recomputed when a question's votes or answer count change
+(`Question.bump` does that in the same transaction), never on read. Each
+feed is served by walking an index in keyset order (see Question.Meta),
+so no request sorts the table.
+
+`manage.py refresh_feeds` recomputes every hot_score in bulk, e.g. after
+changing FEED_HOT_TIMESCALE or loading rows with bulk_create.
+"""
+import math
+
+from django.conf import settings
+from django.db import connection, transaction
+
+REFRESH_BATCH_SIZE = 1000
+
+
+def hot_score(vote_score, num_answers, created_at):
+    engagement = vote_score + num_answers
+    order = math.log10(max(abs(engagement), 1))
+    sign = (engagement > 0) - (engagement < 0)
+    return round(sign * order + created_at.timestamp() / settings.FEED_HOT_TIMESCALE, 7)
+
+
+def refresh_hot_score(pk):
+    """Recompute one question's hot_score from its stored counters."""
+    from .models import Question
+
+    row = Question.objects.filter(pk=pk).values_list('vote_score', 'num_answers', 'created_at').first()
+    if row is not None:
+        Question.objects.filter(pk=pk).update(hot_score=hot_score(*row))
+
+
+def refresh_hot_scores():
+    """Recompute every question's hot_score in batches; returns the number of questions."""
+    from .models import Question
+
+    # One prepared UPDATE per row by primary key: bulk_update's CASE
+    # expression gets slower with the batch size and dominated bulk loads.
+    sql = "UPDATE {} SET {} = %s WHERE {} = %s".format(*map(
+        connection.ops.quote_name, (Question._meta.db_table, 'hot_score', Question._meta.pk.column),
+    ))
+    total, last_pk = 0, 0
+    with transaction.atomic(), connection.cursor() as cursor:
+        while True:
+            rows = list(
+                Question.objects.filter(pk__gt=last_pk).order_by('pk')
+                .values_list('pk', 'vote_score', 'num_answers', 'created_at')[:REFRESH_BATCH_SIZE]
+            )
+            if not rows:
+                return total
+            cursor.executemany(sql, [(hot_score(*counters), pk) for pk, *counters in rows])
+            total += len(rows)
+            last_pk = rows[-1][0]
@@ -0,0 +1,26 @@
+from django_filters import rest_framework as filters
+
+from . import tags as tag_index
+from .models import Question
+
+
+class NumberInFilter(filters.BaseInFilter, filters.NumberFilter):
+    pass
+
+
+class QuestionFilter(filters.FilterSet):
+    # ?tags__id=1,2,3 with ?tags_match=all (tagged with every one, the
+    # default) or ?tags_match=any (tagged with at least one).
+    tags__id = NumberInFilter(method='filter_tags')
+    tags_match = filters.ChoiceFilter(choices=[('all', 'all'), ('any', 'any')], method='match_mode')
+
+    class Meta:
+        model = Question
+        fields = []
+
+    def filter_tags(self, queryset, name, value):
+        match = self.form.cleaned_data.get('tags_match') or 'all'
+        return tag_index.filter_questions(queryset, [int(tag_id) for tag_id in value], match)
+
+    def match_mode(self, queryset, name, value):
+        return queryset     # read by filter_tags
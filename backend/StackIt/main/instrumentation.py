@@ -0,0 +1,280 @@
+# main/instrumentation.py
+"""
+Per-request performance breakdown, Prometheus metrics and slow-request log.
+
+`InstrumentationMiddleware` (first in MIDDLEWARE) times each request and
+the phases it spent in:
+- sql: every statement on any database connection, through an execute
+  wrapper that is installed on each connection once;
+- embedding, vector, llm: the embedding model, the FAISS answer index and
+  the upstream LLM, timed by the `timed(phase)` blocks in ai/utils.
+
+The breakdown goes into the response's Server-Timing header (browsers show
+it in the network panel) and into histograms served in the Prometheus text
+format by the `metrics` view at /metrics, which only answers scrapers
+sending the METRICS_TOKEN (env STACKIT_METRICS_TOKEN). Requests slower than
+METRICS_SLOW_REQUEST_SECONDS are logged, a METRICS_SLOW_SAMPLE_RATE share
+of them, to the "stackit.slow_requests" logger with their slowest queries.
+
+The current request lives in a context variable, so work done in
+sync_to_async threads or async tasks of the request counts towards it;
+work done after the response has been returned (a streamed body, on_commit
+and background workers) doesn't. Metrics are kept per process: with several
+workers, scrape each one or run the metrics view in a single one.
+"""
+import heapq
+import hmac
+import logging
+import random
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.http import HttpResponse
+
+logger = logging.getLogger("stackit.slow_requests")
+
+PHASES = ("sql", "embedding", "vector", "llm")
+SLOWEST_QUERIES = 3                 # statements kept per request for the slow-request log
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+
+_current = ContextVar("stackit_request_timings", default=None)
+
+
+class RequestTimings:
+    """Time spent per phase by one request, plus its slowest SQL statements."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.phases = {}                # phase -> [seconds, calls]
+        self.slowest_sql = []           # min-heap of (seconds, sql)
+        self._lock = threading.Lock()
+
+    def add(self, phase, seconds):
+        with self._lock:
+            entry = self.phases.setdefault(phase, [0.0, 0])
+            entry[0] += seconds
+            entry[1] += 1
+
+    def add_sql(self, sql, seconds):
+        self.add("sql", seconds)
+        with self._lock:
+            item = (seconds, sql)
+            if len(self.slowest_sql) < SLOWEST_QUERIES:
+                heapq.heappush(self.slowest_sql, item)
+            elif item > self.slowest_sql[0]:
+                heapq.heapreplace(self.slowest_sql, item)
+
+    def seconds(self, phase):
+        return self.phases.get(phase, (0.0, 0))[0]
+
+    def calls(self, phase):
+        return self.phases.get(phase, (0.0, 0))[1]
+
+
+@contextmanager
+def timed(phase):
+    """Count the block's wall time towards `phase` of the current request, if any."""
+    timings = _current.get()
+    if timings is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.add(phase, time.perf_counter() - started)
+
+
+def _record_sql(execute, sql, params, many, context):
+    timings = _current.get()
+    if timings is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        timings.add_sql(sql, time.perf_counter() - started)
+
+
+def _install(connection, **kwargs):
+    # At the front, so that an execute_wrapper() block around a request
+    # (tests, bench_api) still pops its own wrapper when it exits.
+    if _record_sql not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, _record_sql)
+
+
+connection_created.connect(_install)
+
+
+# ---------------------------------------------------------------------- #
+# Metrics
+# ---------------------------------------------------------------------- #
+def _labels(names, values):
+    def escape(value):
+        return str(value).replace("\\", r"\\").replace('"', r"\"").replace("\n", r"\n")
+    return ",".join(f'{name}="{escape(value)}"' for name, value in zip(names, values))
+
+
+class Counter:
+    def __init__(self, name, documentation, labelnames=()):
+        self.name, self.documentation, self.labelnames = name, documentation, labelnames
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for labels, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{{{_labels(self.labelnames, labels)}}} {value}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, documentation, labelnames=(), buckets=DURATION_BUCKETS):
+        self.name, self.documentation, self.labelnames = name, documentation, labelnames
+        self.buckets = tuple(buckets)
+        self._values = {}               # labels -> [count per bucket..., +Inf count, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labels):
+        with self._lock:
+            entry = self._values.get(labels)
+            if entry is None:
+                entry = self._values[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    entry[i] += 1
+            entry[-2] += 1
+            entry[-1] += value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for labels, entry in sorted(self._values.items()):
+                base = _labels(self.labelnames, labels)
+                sep = "," if base else ""
+                for bound, count in zip(self.buckets, entry):
+                    lines.append(f'{self.name}_bucket{{{base}{sep}le="{bound:g}"}} {count}')
+                lines.append(f'{self.name}_bucket{{{base}{sep}le="+Inf"}} {entry[-2]}')
+                suffix = f"{{{base}}}" if base else ""
+                lines.append(f"{self.name}_count{suffix} {entry[-2]}")
+                lines.append(f"{self.name}_sum{suffix} {entry[-1]:.6f}")
+        return lines
+
+
+REQUESTS = Counter("stackit_http_requests_total", "HTTP requests by view, method and status.",
+                   ("view", "method", "status"))
+DURATION = Histogram("stackit_http_request_duration_seconds", "Request duration in seconds.",
+                     ("view", "method"))
+PHASE_DURATION = Histogram("stackit_http_request_phase_seconds",
+                           "Time a request spent in SQL, embedding, vector search or the LLM.",
+                           ("view", "phase"))
+SQL_QUERIES = Histogram("stackit_http_request_sql_queries", "SQL statements per request.",
+                        ("view",), buckets=QUERY_BUCKETS)
+SLOW_REQUESTS = Counter("stackit_http_slow_requests_total",
+                        "Requests slower than METRICS_SLOW_REQUEST_SECONDS.", ("view",))
+METRICS = (REQUESTS, DURATION, PHASE_DURATION, SQL_QUERIES, SLOW_REQUESTS)
+
+
+def render_metrics():
+    return "\n".join(line for metric in METRICS for line in metric.render()) + "\n"
+
+
+def metrics(request):
+    """Prometheus scrape endpoint; requires `Authorization: Bearer <METRICS_TOKEN>`, refused if that is unset."""
+    token = settings.METRICS_TOKEN
+    sent = request.headers.get("Authorization", "")
+    if not token or not hmac.compare_digest(sent.encode(), f"Bearer {token}".encode()):
+        return HttpResponse(status=403)
+    return HttpResponse(render_metrics(), content_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+# ---------------------------------------------------------------------- #
+# Middleware
+# ---------------------------------------------------------------------- #
+class InstrumentationMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        for connection in connections.all(initialized_only=True):
+            _install(connection)
+        timings = RequestTimings()
+        token = _current.set(timings)
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, timings)
+
+    async def __acall__(self, request):
+        timings = RequestTimings()
+        token = _current.set(timings)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, timings)
+
+    def finish(self, request, response, timings):
+        total = time.perf_counter() - timings.started
+        match = request.resolver_match
+        view = match.view_name if match is not None else "unmatched"
+
+        response["Server-Timing"] = server_timing(timings, total)
+        REQUESTS.inc(view, request.method, str(response.status_code))
+        DURATION.observe(total, view, request.method)
+        SQL_QUERIES.observe(timings.calls("sql"), view)
+        for phase in PHASES:
+            if phase == "sql" or phase in timings.phases:
+                PHASE_DURATION.observe(timings.seconds(phase), view, phase)
+
+        if total >= settings.METRICS_SLOW_REQUEST_SECONDS:
+            SLOW_REQUESTS.inc(view)
+            if random.random() < settings.METRICS_SLOW_SAMPLE_RATE:
+                log_slow_request(request, response, view, timings, total)
+        return response
+
+
+def server_timing(timings, total):
+    entries = [f'sql;dur={timings.seconds("sql") * 1000:.1f};desc="{timings.calls("sql")} queries"']
+    entries += [
+        f"{phase};dur={timings.seconds(phase) * 1000:.1f}"
+        for phase in PHASES[1:] if phase in timings.phases
+    ]
+    entries.append(f"total;dur={total * 1000:.1f}")
+    return ", ".join(entries)
+
+
+def log_slow_request(request, response, view, timings, total):
+    phases = " ".join(
+        f"{phase}={timings.seconds(phase) * 1000:.1f}ms/{timings.calls(phase)}"
+        for phase in PHASES if phase in timings.phases
+    )
+    queries = "".join(
+        f"\n  {seconds * 1000:.1f}ms {' '.join(sql.split())[:500]}"
+        for seconds, sql in sorted(timings.slowest_sql, reverse=True)
+    )
+    logger.warning(
+        "Slow request: %s %s -> %s in %.1fms (view %s) %s%s",
+        request.method, request.get_full_path(), response.status_code, total * 1000, view, phases, queries,
+    )
@@ -0,0 +1,181 @@
+import re
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import override_settings
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from main.models import Answer, Comment, Question, Tag, Vote
+from main.notifications import NotificationFanout
+
+# Plan steps that read a whole table or sort rows outside an index. An index
+# walk (SCAN ... USING [COVERING] INDEX), a single-row constant scan and an
+# FTS5 lookup (SCAN ... VIRTUAL TABLE) are fine.
+PROBLEM = re.compile(r"^(SCAN (?!CONSTANT ROW)(?!\S+ VIRTUAL TABLE)(?!\S+ USING (COVERING )?INDEX )|USE TEMP B-TREE)")
+
+# Sorts that are bounded by design: (pattern in the SQL, plan step, why).
+BOUNDED = [
+    (r'FROM "main_tag" INNER JOIN "main_question_tags"', "USE TEMP B-TREE FOR ORDER BY",
+     "sorts the tags of one page of questions by name"),
+    (r'"main_question"\."id" IN \(SELECT', "USE TEMP B-TREE FOR ORDER BY",
+     "tag filter drive plan: only chosen when the rarest tag has few questions"),
+    (r'"main_tag"\."normalized_name" >=', "USE TEMP B-TREE FOR ORDER BY",
+     "orders the tags matching one prefix by popularity"),
+    (r'"question_id" IN \(SELECT .* LIMIT \d+\)', "USE TEMP B-TREE FOR",
+     "related tags are counted over the tag's RELATED_SAMPLE_SIZE newest questions"),
+    (r"bm25\(", "USE TEMP B-TREE FOR ORDER BY",
+     "ranks full-text matches by relevance"),
+]
+
+
+def bounded_reason(sql, step):
+    for pattern, prefix, reason in BOUNDED:
+        if step.startswith(prefix) and re.search(pattern, sql):
+            return reason
+    return None
+
+
+class _Recorder:
+    """execute_wrapper collecting the SELECTs a request runs."""
+
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        if sql.lstrip().upper().startswith("SELECT") and (sql, params) not in self.queries:
+            self.queries.append((sql, params))
+        return execute(sql, params, many, context)
+
+
+class Command(BaseCommand):
+    help = (
+        "Replay the API's hot reads (question feeds and tag filters, answers, "
+        "comments, tags, notifications, search) and the notification fan-out "
+        "against this database, run EXPLAIN QUERY PLAN on every SELECT and "
+        "flag full table scans and temp B-tree sorts. Uses the question with "
+        "the most answers and the most used tags as samples."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--user", help="Username to make authenticated requests as (default: the first user)")
+        parser.add_argument("--strict", action="store_true", help="Exit with an error if any query is flagged")
+        parser.add_argument("--verbose", action="store_true", help="Print every query plan, not only flagged ones")
+
+    def handle(self, *args, **options):
+        if connection.vendor != "sqlite":
+            raise CommandError("The audit reads SQLite's EXPLAIN QUERY PLAN output")
+        users = User.objects.order_by("pk")
+        user = users.filter(username=options["user"]).first() if options["user"] else users.first()
+        if user is None:
+            raise CommandError("No user to make requests as; create one or seed the database first")
+
+        self.verbose = options["verbose"]
+        flagged = total = 0
+        with transaction.atomic(), override_settings(ALLOWED_HOSTS=["testserver"]):
+            client = APIClient()
+            client.force_authenticate(user)     # authenticated reads skip the response cache
+            # The async notification views authenticate the JWT themselves.
+            client.credentials(HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(user)}")
+            for label, run in self.workload(client, user):
+                recorder = _Recorder()
+                with connection.execute_wrapper(recorder):
+                    run()
+                flagged += self.report(label, recorder.queries)
+                total += len(recorder.queries)
+            transaction.set_rollback(True)
+
+        if flagged:
+            message = f"⚠️  {flagged} of {total} queries need a full scan or a sort"
+            if options["strict"]:
+                raise CommandError(message)
+            self.stdout.write(self.style.WARNING(message))
+        else:
+            self.stdout.write(self.style.SUCCESS(f"✅ All {total} queries are index-backed"))
+
+    # ------------------------------------------------------------------ #
+    # Workload
+    # ------------------------------------------------------------------ #
+    def workload(self, client, user):
+        """(label, callable) pairs; endpoints that need a missing sample row are left out."""
+
+        def get(path, pages=1):
+            def run():
+                url = path
+                for _ in range(pages):
+                    response = client.get(url)
+                    if response.status_code >= 400:
+                        raise CommandError(f"GET {url} returned {response.status_code}")
+                    url = response.json().get("next") if pages > 1 else None
+                    if not url:
+                        return
+            return (f"GET {path}", run)
+
+        # Two pages of each list: the second one runs the keyset predicate.
+        yield get("/api/questions/", pages=2)
+        for sort in ("hot", "top", "unanswered"):
+            yield get(f"/api/questions/?sort={sort}", pages=2)
+        tags = list(Tag.objects.order_by("-question_count", "pk").values_list("pk", flat=True)[:2])
+        if tags:
+            yield get(f"/api/questions/?tags__id={tags[0]}", pages=2)
+            yield get("/api/questions/?" + "&".join(f"tags__id={pk}" for pk in tags) + "&tags_match=any")
+            yield get(f"/api/tags/{tags[0]}/related/")
+        yield get("/api/tags/autocomplete/?q=a")
+
+        question = Question.objects.filter(is_active=True).order_by("-num_answers", "-pk").first()
+        if question is not None:
+            yield get(f"/api/questions/{question.pk}/")
+            yield get(f"/api/questions/{question.pk}/answers/", pages=2)
+            yield get(f"/api/questions/{question.pk}/comments/", pages=2)
+            answer = Answer.objects.filter(question=question, is_active=True).order_by("pk").first()
+            if answer is not None:
+                yield get(f"/api/questions/{question.pk}/answers/{answer.pk}/comments/", pages=2)
+            yield ("fan-out: thread watchers", lambda: NotificationFanout._thread_watchers(question))
+            yield ("fan-out: recent unread", lambda: NotificationFanout._recent_unread([question.pk]))
+            yield ("vote: existing vote", lambda: Vote.objects.filter(user=user, question=question).first())
+            if answer is not None:
+                yield ("vote: existing answer vote", lambda: Vote.objects.filter(user=user, answer=answer).first())
+        comment = Comment.objects.filter(is_active=True).order_by("-pk").first()
+        if comment is not None:
+            yield ("fan-out: post watchers", lambda: NotificationFanout._post_watchers(comment))
+
+        yield get("/api/notifications/", pages=2)
+        yield get("/api/notifications/?unread=1", pages=2)
+        yield get("/api/notifications/unread_count/")
+        yield get("/api/notifications/poll/?after=0&timeout=0")
+        yield get("/api/search/?q=the")
+
+    # ------------------------------------------------------------------ #
+    # Plans
+    # ------------------------------------------------------------------ #
+    def explain(self, sql, params):
+        with connection.cursor() as cursor:
+            cursor.execute("EXPLAIN QUERY PLAN " + sql, params)
+            return [detail for _, _, _, detail in cursor.fetchall()]
+
+    def report(self, label, queries):
+        """Print the audit of one workload entry; returns the number of flagged queries."""
+        shown = []
+        for sql, params in queries:
+            plan = self.explain(sql, params)
+            marks = {}
+            for step in plan:
+                if PROBLEM.match(step):
+                    reason = bounded_reason(sql, step)
+                    marks[step] = f"~~ {step}  (bounded: {reason})" if reason else f"!! {step}"
+            problems = [mark for mark in marks.values() if mark.startswith("!!")]
+            if problems or self.verbose:
+                shown.append((sql, [marks.get(step, f"   {step}") for step in plan], problems))
+
+        bad = sum(1 for _, _, problems in shown if problems)
+        if bad:
+            self.stdout.write(self.style.WARNING(f"⚠️  {label}: {bad} of {len(queries)} queries flagged"))
+        else:
+            self.stdout.write(f"✅ {label}: {len(queries)} queries")
+        for sql, steps, problems in shown:
+            self.stdout.write(f"    {' '.join(sql.split())}")
+            for step in steps:
+                line = f"      {step}"
+                self.stdout.write(self.style.WARNING(line) if step in problems else line)
+        return bad
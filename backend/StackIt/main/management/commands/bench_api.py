@@ -0,0 +1,251 @@
+import json
+import statistics
+import time
+import uuid
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import override_settings
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from ai.testing import stub_ai
+from ai.utils import embeddings, index_manager
+from main import response_cache
+from main.models import Answer, Question
+
+BENCH_PASSWORD = "bench-password"
+SAMPLE_SIZE = 200           # questions the endpoints rotate through
+
+
+def _percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))]
+
+
+class _Counter:
+    """execute_wrapper counting the statements a request runs."""
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark the API in-process through the real URLconf and middleware: "
+        "question list and detail, answer create, voting, comments, login and "
+        "token refresh, and the RAG chatbot with a stub embedding model and a "
+        "local fake LLM. Reports throughput, p50/p95/p99 latency and SQL "
+        "queries per request for each endpoint, and compares them with a "
+        "baseline file. Everything runs in a transaction that is rolled back; "
+        "--seed-questions loads a bulk dataset into it first."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=100, help="Timed requests per endpoint (default: 100)")
+        parser.add_argument("--warmup", type=int, default=5, help="Untimed requests per endpoint first (default: 5)")
+        parser.add_argument("--only", help="Comma-separated endpoint names to run")
+        parser.add_argument("--seed-questions", type=int, default=0,
+                            help="Bulk-seed this many questions (seed_data --bulk) before measuring")
+        parser.add_argument("--seed", type=int, default=0, help="seed_data --seed for --seed-questions")
+        parser.add_argument("--index-answers", type=int, default=1000,
+                            help="Answers put in the chatbot's temporary vector index (default: 1000)")
+        parser.add_argument("--baseline", help="JSON file of an earlier run to compare with")
+        parser.add_argument("--save-baseline", help="Write this run's results to this JSON file")
+        parser.add_argument("--tolerance", type=float, default=0.25,
+                            help="Allowed p95 slowdown against the baseline, as a fraction (default: 0.25)")
+        parser.add_argument("--strict", action="store_true",
+                            help="Exit with an error if any endpoint regressed against the baseline")
+
+    def handle(self, *args, **options):
+        baseline = None
+        if options["baseline"]:
+            try:
+                with open(options["baseline"]) as f:
+                    baseline = json.load(f)
+            except (OSError, ValueError) as e:
+                raise CommandError(f"Cannot read baseline {options['baseline']}: {e}")
+        only = set(options["only"].split(",")) if options["only"] else None
+        if only and only - set(ENDPOINTS):
+            raise CommandError(f"Unknown endpoints: {', '.join(sorted(only - set(ENDPOINTS)))}")
+
+        with transaction.atomic(), override_settings(ALLOWED_HOSTS=["testserver"]), stub_ai():
+            if options["seed_questions"]:
+                call_command(
+                    "seed_data", "--bulk", "--seed", str(options["seed"]),
+                    "--questions", str(options["seed_questions"]),
+                    "--users", str(max(100, options["seed_questions"] // 10)),
+                    stdout=self.stdout,
+                )
+            response_cache.clear()
+            self.prepare(options["index_answers"])
+            meta = {"questions": Question.objects.count(), "answers": Answer.objects.count(),
+                    "requests": options["requests"]}
+            results = {}
+            for name in ENDPOINTS:
+                if only is None or name in only:
+                    results[name] = self.measure(name, options["requests"], options["warmup"])
+            transaction.set_rollback(True)
+
+        self.stdout.write(
+            f"Sequential requests, one client; {meta['questions']} questions, {meta['answers']} answers"
+        )
+        regressions = self.report(results, baseline and baseline.get("endpoints", {}), options["tolerance"])
+
+        if options["save_baseline"]:
+            with open(options["save_baseline"], "w") as f:
+                json.dump({"meta": meta, "endpoints": results}, f, indent=2, sort_keys=True)
+            self.stdout.write(f"💾 Saved results to {options['save_baseline']}")
+        if regressions:
+            message = f"⚠️  {len(regressions)} endpoints regressed: {', '.join(regressions)}"
+            if options["strict"]:
+                raise CommandError(message)
+            self.stdout.write(self.style.WARNING(message))
+        elif baseline is not None:
+            self.stdout.write(self.style.SUCCESS("✅ No regressions against the baseline"))
+
+    # ------------------------------------------------------------------ #
+    # Workload
+    # ------------------------------------------------------------------ #
+    def prepare(self, index_answers):
+        self.questions = list(
+            Question.objects.filter(is_active=True).order_by("-pk").values_list("pk", "title")[:SAMPLE_SIZE]
+        )
+        if not self.questions:
+            raise CommandError("No questions to benchmark; seed the database or pass --seed-questions")
+
+        self.user = User.objects.create_user(f"bench-{uuid.uuid4().hex[:8]}", password=BENCH_PASSWORD)
+        self.anonymous = APIClient()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.refresh = str(RefreshToken.for_user(self.user))
+
+        # The chatbot retrieves from a temporary index of the newest answers.
+        rows = list(
+            Answer.objects.filter(is_active=True).order_by("-pk")
+            .values_list("pk", "content", "question__title")[:index_answers]
+        )
+        if rows:
+            vectors = embeddings.encode([content for _, content, _ in rows])
+            index_manager.get_index_manager().apply(
+                upserts=[(pk, vector, content, title) for (pk, content, title), vector in zip(rows, vectors)]
+            )
+
+    def question(self, i):
+        return self.questions[i % len(self.questions)]
+
+    def vote_type(self, i):
+        # Each visit to a question flips the vote, so every request changes it.
+        return 1 if (i // len(self.questions)) % 2 == 0 else -1
+
+    def measure(self, name, requests, warmup):
+        client_name, method, build = ENDPOINTS[name]
+        client = getattr(self, client_name)
+        latencies, queries = [], []
+        for i in range(warmup + requests):
+            path, data = build(self, i)
+            counter = _Counter()
+            with connection.execute_wrapper(counter):
+                started = time.perf_counter()
+                response = getattr(client, method)(path, data, format="json") if data is not None \
+                    else getattr(client, method)(path)
+                elapsed = time.perf_counter() - started
+            if response.status_code >= 400:
+                raise CommandError(f"{name}: {method.upper()} {path} returned {response.status_code}")
+            if i >= warmup:
+                latencies.append(elapsed * 1000)
+                queries.append(counter.count)
+        return {
+            "rps": round(len(latencies) / (sum(latencies) / 1000), 1),
+            "p50_ms": round(_percentile(latencies, 50), 3),
+            "p95_ms": round(_percentile(latencies, 95), 3),
+            "p99_ms": round(_percentile(latencies, 99), 3),
+            "queries": statistics.median(queries),
+        }
+
+    # ------------------------------------------------------------------ #
+    # Report
+    # ------------------------------------------------------------------ #
+    def report(self, results, baseline, tolerance):
+        """Print the results table; returns the names of endpoints that regressed."""
+        header = f"{'endpoint':<22}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'queries':>9}"
+        if baseline is not None:
+            header += f"{'p95 vs base':>13}{'queries vs base':>17}"
+        self.stdout.write(header)
+
+        regressions = []
+        for name, result in results.items():
+            line = (
+                f"{name:<22}{result['rps']:>9.1f}{result['p50_ms']:>9.2f}{result['p95_ms']:>9.2f}"
+                f"{result['p99_ms']:>9.2f}{result['queries']:>9g}"
+            )
+            before = baseline.get(name) if baseline is not None else None
+            if before is None:
+                if baseline is not None:
+                    line += f"{'new':>13}"
+                self.stdout.write(line)
+                continue
+
+            slower = result["p95_ms"] > before["p95_ms"] * (1 + tolerance)
+            more_queries = result["queries"] > before["queries"]
+            change = (result["p95_ms"] / before["p95_ms"] - 1) * 100 if before["p95_ms"] else 0.0
+            line += f"{change:>+12.0f}%{result['queries'] - before['queries']:>+17g}"
+            if slower or more_queries:
+                regressions.append(name)
+                self.stdout.write(self.style.WARNING(line + "  !!"))
+            else:
+                self.stdout.write(line)
+        return regressions
+
+
+def _question_list(bench, i):
+    return "/api/questions/", None
+
+
+def _question_detail(bench, i):
+    return f"/api/questions/{bench.question(i)[0]}/", None
+
+
+def _answer_create(bench, i):
+    return f"/api/questions/{bench.question(i)[0]}/answers/", {"content": f"Benchmark answer number {i}."}
+
+
+def _question_vote(bench, i):
+    return f"/api/questions/{bench.question(i)[0]}/vote/", {"vote_type": bench.vote_type(i)}
+
+
+def _comment_list(bench, i):
+    return f"/api/questions/{bench.question(i)[0]}/comments/", None
+
+
+def _login(bench, i):
+    return "/api/auth/login/", {"username": bench.user.username, "password": BENCH_PASSWORD}
+
+
+def _refresh(bench, i):
+    return "/api/auth/refresh/", {"refresh": bench.refresh}
+
+
+def _chat(bench, i):
+    # A different question each time, so neither RAG cache answers it.
+    return "/api/ai/chat/", {"question": f"{bench.question(i)[1]} (variant {i})"}
+
+
+# name -> (client attribute, method, request builder returning (path, JSON body or None))
+ENDPOINTS = {
+    "questions.list": ("client", "get", _question_list),
+    "questions.list.anon": ("anonymous", "get", _question_list),
+    "questions.detail": ("client", "get", _question_detail),
+    "answers.create": ("client", "post", _answer_create),
+    "questions.vote": ("client", "post", _question_vote),
+    "comments.list": ("client", "get", _comment_list),
+    "auth.login": ("anonymous", "post", _login),
+    "auth.refresh": ("anonymous", "post", _refresh),
+    "ai.chat": ("anonymous", "post", _chat),
+}
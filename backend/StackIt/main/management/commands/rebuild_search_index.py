@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from main.search import SearchUnavailable, rebuild_index
+
+
+class Command(BaseCommand):
+    help = "Rebuild the FTS5 keyword search index over active questions and answers."
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                count = rebuild_index()
+        except SearchUnavailable:
+            raise CommandError("Keyword search needs SQLite with FTS5")
+        self.stdout.write(self.style.SUCCESS(f"✅ Indexed {count} questions and answers"))
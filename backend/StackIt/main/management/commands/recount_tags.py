@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Count, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+from main.models import QuestionTag, Tag
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute every Tag.question_count (active questions with the tag) "
+        "with one set-based UPDATE, e.g. after bulk-loading questions."
+    )
+
+    def handle(self, *args, **options):
+        active = (
+            QuestionTag.objects
+            .filter(tag=OuterRef("pk"), question__is_active=True)
+            .order_by()
+            .values("tag")
+            .annotate(total=Count("*"))
+            .values("total")
+        )
+        count = Tag.objects.update(question_count=Coalesce(Subquery(active, output_field=IntegerField()), Value(0)))
+        self.stdout.write(self.style.SUCCESS(f"✅ Recounted questions for {count} tags"))
@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import IntegerField, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+from main.feeds import refresh_hot_scores
+from main.models import Question, Answer, Vote
+from main.vote_buffer import get_vote_buffer
+
+
+def _score(target):
+    votes = (
+        Vote.objects
+        .filter(**{target: OuterRef("pk")})
+        .order_by()
+        .values(target)
+        .annotate(total=Sum("vote_type"))
+        .values("total")
+    )
+    return Coalesce(Subquery(votes, output_field=IntegerField()), Value(0))
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute Question/Answer vote_score from the Vote rows with one "
+        "set-based UPDATE per table, e.g. after a process running with "
+        "VOTE_WRITE_BEHIND was killed before flushing its buffer. Question "
+        "hot scores are refreshed afterwards. Only this process's buffer is "
+        "flushed first: run it while no other process is serving votes in "
+        "write-behind mode, or the deltas those still hold are applied on top "
+        "of the recount when they flush and are counted twice."
+    )
+
+    def handle(self, *args, **options):
+        get_vote_buffer().flush()
+        with transaction.atomic():
+            questions = Question.objects.update(vote_score=_score("question"))
+            answers = Answer.objects.update(vote_score=_score("answer"))
+            refresh_hot_scores()
+        self.stdout.write(self.style.SUCCESS(f"✅ Recounted votes on {questions} questions and {answers} answers"))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from main.feeds import refresh_hot_scores
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute every question's hot_score (the ?sort=hot feed) from its "
+        "stored vote_score, num_answers and created_at."
+    )
+
+    def handle(self, *args, **options):
+        count = refresh_hot_scores()
+        self.stdout.write(self.style.SUCCESS(f"✅ Refreshed hot scores for {count} questions"))
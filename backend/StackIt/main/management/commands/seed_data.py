@@ -1,16 +1,72 @@
-from django.core.management.base import BaseCommand
+from array import array
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone as dt_timezone
+from itertools import accumulate
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.contrib.auth.hashers import make_password
 from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import Count, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
 from accounts.models import UserProfile
-from main.models import Question, Answer, Tag
+from main import response_cache, search, tags as tag_index
+from main.models import Question, QuestionTag, Answer, Comment, Tag, Vote
 from faker import Faker
 import random
 
 fake = Faker()
 
+# Bulk data is dated in the --days before this instant, so a seed produces
+# the same rows whenever it is run.
+BULK_EPOCH = datetime(2025, 1, 1, tzinfo=dt_timezone.utc)
+
+
+@contextmanager
+def _explicit_timestamps(*models):
+    """Let bulk_create keep generated created_at/updated_at values instead of stamping now()."""
+    fields = [
+        field for model in models for field in model._meta.concrete_fields
+        if getattr(field, "auto_now", False) or getattr(field, "auto_now_add", False)
+    ]
+    saved = [(field, field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in saved:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
 class Command(BaseCommand):
-    help = "Seed the database with fake users, profiles, questions, answers, and tags"
+    help = (
+        "Seed the database with fake users, profiles, questions, answers, and tags. "
+        "With --bulk, generate a large reproducible dataset (users, questions, "
+        "answers, comments, votes) with batched bulk_create instead: no per-row "
+        "signals or saves, counters and the search index rebuilt in set-based "
+        "passes afterwards, and optionally the vector index (--build-index)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--bulk", action="store_true", help="Generate a large dataset with bulk inserts")
+        parser.add_argument("--seed", type=int, default=0, help="Random seed; the same seed gives the same data")
+        parser.add_argument("--users", type=int, default=10_000)
+        parser.add_argument("--questions", type=int, default=100_000)
+        parser.add_argument("--tags", type=int, default=500)
+        parser.add_argument("--answers-per-question", type=float, default=2.0, help="Mean answers per question")
+        parser.add_argument("--comments-per-post", type=float, default=0.5, help="Mean comments per question or answer")
+        parser.add_argument("--votes-per-post", type=float, default=3.0, help="Mean votes per question or answer")
+        parser.add_argument("--days", type=int, default=365, help="Questions are spread over this many days")
+        parser.add_argument("--batch-size", type=int, default=2000, help="Rows per INSERT and questions per transaction")
+        parser.add_argument("--password", default="test1234", help="Password of every generated user")
+        parser.add_argument("--build-index", action="store_true", help="Run build_faiss when done")
 
-    def handle(self, *args, **kwargs):
+    def handle(self, *args, **options):
+        if options["bulk"]:
+            self.seed_bulk(options)
+            return
         self.stdout.write("🔄 Seeding database...")
         self.seed_users(10)
         self.seed_tags(10)
@@ -57,3 +113,134 @@ class Command(BaseCommand):
                     is_accepted=random.random() < 0.3,
                 )
         self.stdout.write(f"❓ Created {count} questions with answers")
+
+    # ------------------------------------------------------------------ #
+    # Bulk mode
+    # ------------------------------------------------------------------ #
+    def seed_bulk(self, options):
+        seed = options["seed"]
+        self.rng = random.Random(seed)
+        self.batch_size = options["batch_size"]
+        self.options = options
+        words_faker = Faker()
+        words_faker.seed_instance(seed)
+        self.words = words_faker.get_words_list()
+
+        self.username_prefix = f"user{seed}_"
+        if User.objects.filter(username=f"{self.username_prefix}0").exists():
+            raise CommandError(f"Seed {seed} was already loaded into this database; pick another --seed")
+
+        self.stdout.write(f"🔄 Bulk seeding with seed {seed}...")
+        self.user_ids = self.bulk_users(options["users"], make_password(options["password"]))
+        self.tag_ids, self.tag_weights = self.bulk_tags(options["tags"])
+        with _explicit_timestamps(Question, Answer, Comment, Vote):
+            total = options["questions"]
+            for start in range(0, total, self.batch_size):
+                with transaction.atomic():
+                    self.bulk_threads(start, min(start + self.batch_size, total), total)
+                self.stdout.write(f"❓ {min(start + self.batch_size, total)}/{total} questions")
+
+        self.fix_counters()
+        if options["build_index"]:
+            call_command("build_faiss", stdout=self.stdout, stderr=self.stderr)
+        self.stdout.write(self.style.SUCCESS("✅ Done bulk seeding!"))
+
+    def sentence(self, low, high):
+        return " ".join(self.rng.choices(self.words, k=self.rng.randint(low, high))).capitalize()
+
+    def bulk_users(self, count, password):
+        user_ids = array("q")
+        for start in range(0, count, self.batch_size):
+            with transaction.atomic():
+                users = User.objects.bulk_create([
+                    User(username=f"{self.username_prefix}{i}", email=f"{self.username_prefix}{i}@example.com",
+                         password=password, date_joined=BULK_EPOCH)
+                    for i in range(start, min(start + self.batch_size, count))
+                ])
+                UserProfile.objects.bulk_create([
+                    UserProfile(user=user, full_name=self.sentence(2, 2).title(), email=user.email)
+                    for user in users
+                ])
+            user_ids.extend(user.pk for user in users)
+        self.stdout.write(f"👤 Created {count} users")
+        return user_ids
+
+    def bulk_tags(self, count):
+        names = []
+        while len(names) < count:
+            names.append(f"{self.rng.choice(self.words)}-{self.rng.choice(self.words)}")
+        tags = tag_index.resolve(names)
+        # Zipf-like popularity: the n-th tag is used about 1/n as often as the first.
+        weights = list(accumulate(1 / (rank + 1) for rank in range(len(tags))))
+        self.stdout.write(f"🏷️ Resolved {len(tags)} tags")
+        return [tag.pk for tag in tags], weights
+
+    def bulk_threads(self, start, stop, total):
+        """Questions start..stop-1 of `total`, with their tags, answers, comments and votes."""
+        rng, options = self.rng, self.options
+        span = options["days"] * 86400
+        first = BULK_EPOCH - timedelta(days=options["days"])
+
+        questions = []
+        for i in range(start, stop):
+            created = first + timedelta(seconds=span * (i + rng.random()) / total)
+            questions.append(Question(
+                title=self.sentence(5, 12) + "?", description=self.sentence(30, 120) + ".",
+                user_id=rng.choice(self.user_ids), created_at=created, updated_at=created,
+            ))
+        questions = Question.objects.bulk_create(questions, batch_size=self.batch_size)
+
+        links = []
+        for question in questions:
+            picked = rng.choices(self.tag_ids, cum_weights=self.tag_weights, k=rng.randint(1, 4))
+            links.extend(QuestionTag(question=question, tag_id=tag_id) for tag_id in set(picked))
+        QuestionTag.objects.bulk_create(links, batch_size=self.batch_size)
+
+        answers = []
+        for question in questions:
+            for n in range(self.count(options["answers_per_question"])):
+                created = question.created_at + timedelta(seconds=rng.expovariate(1 / 21600))
+                answers.append(Answer(
+                    question=question, user_id=rng.choice(self.user_ids), content=self.sentence(20, 80) + ".",
+                    is_accepted=n == 0 and rng.random() < 0.3, created_at=created, updated_at=created,
+                ))
+        answers = Answer.objects.bulk_create(answers, batch_size=self.batch_size)
+
+        comments, votes = [], []
+        for target, post in [("question", q) for q in questions] + [("answer", a) for a in answers]:
+            for _ in range(self.count(options["comments_per_post"])):
+                created = post.created_at + timedelta(seconds=rng.expovariate(1 / 43200))
+                comments.append(Comment(
+                    **{target: post}, user_id=rng.choice(self.user_ids), content=self.sentence(5, 25) + ".",
+                    created_at=created, updated_at=created,
+                ))
+            voters = rng.sample(self.user_ids, min(self.count(options["votes_per_post"]), len(self.user_ids)))
+            votes.extend(
+                Vote(**{target: post}, user_id=user_id, vote_type=1 if rng.random() < 0.8 else -1,
+                     created_at=post.created_at)
+                for user_id in voters
+            )
+        Comment.objects.bulk_create(comments, batch_size=self.batch_size)
+        Vote.objects.bulk_create(votes, batch_size=self.batch_size)
+
+    def count(self, mean):
+        """Non-negative whole number, exponentially distributed around `mean`."""
+        return round(self.rng.expovariate(1 / mean)) if mean > 0 else 0
+
+    def fix_counters(self):
+        # bulk_create skipped Answer/Vote.save and the signals: recompute
+        # every denormalized counter and the keyword index in bulk.
+        active_answers = (
+            Answer.objects.filter(question=OuterRef("pk"), is_active=True)
+            .order_by().values("question").annotate(total=Count("*")).values("total")
+        )
+        with transaction.atomic():
+            count = Question.objects.update(
+                num_answers=Coalesce(Subquery(active_answers, output_field=IntegerField()), Value(0))
+            )
+        self.stdout.write(f"🔢 Recounted answers on {count} questions")
+        call_command("recount_votes", stdout=self.stdout)     # also refreshes hot scores
+        call_command("recount_tags", stdout=self.stdout)
+        if search.is_available():
+            call_command("rebuild_search_index", stdout=self.stdout)
+        response_cache.clear()
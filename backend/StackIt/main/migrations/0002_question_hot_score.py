@@ -0,0 +1,56 @@
+# Generated by Django 5.2.4 on 2026-10-18 05:51
+
+from django.conf import settings
+from django.db import migrations, models
+
+from main.feeds import REFRESH_BATCH_SIZE, hot_score
+
+
+def refresh_hot_scores(apps, schema_editor):
+    # What `manage.py refresh_feeds` does, with the historical model.
+    Question = apps.get_model('main', 'Question')
+    last_pk = 0
+    while True:
+        rows = list(
+            Question.objects.filter(pk__gt=last_pk).order_by('pk')
+            .values_list('pk', 'vote_score', 'num_answers', 'created_at')[:REFRESH_BATCH_SIZE]
+        )
+        if not rows:
+            return
+        Question.objects.bulk_update(
+            [Question(pk=pk, hot_score=hot_score(*counters)) for pk, *counters in rows], ['hot_score'],
+        )
+        last_pk = rows[-1][0]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='question',
+            name='hot_score',
+            field=models.FloatField(default=0, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='question',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['-created_at', '-id'], name='question_new_feed'),
+        ),
+        migrations.AddIndex(
+            model_name='question',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['-hot_score', '-id'], name='question_hot_feed'),
+        ),
+        migrations.AddIndex(
+            model_name='question',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['-vote_score', '-id'], name='question_top_feed'),
+        ),
+        migrations.AddIndex(
+            model_name='question',
+            index=models.Index(condition=models.Q(('is_active', True), ('num_answers', 0)), fields=['-created_at', '-id'], name='question_unanswered_feed'),
+        ),
+        migrations.RunPython(refresh_hot_scores, migrations.RunPython.noop),
+    ]
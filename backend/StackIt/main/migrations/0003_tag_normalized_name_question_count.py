@@ -0,0 +1,70 @@
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+from main.tags import normalize
+
+
+def backfill_tags(apps, schema_editor):
+    """
+    Fill normalized_name before it becomes unique. Tags whose names only
+    differ in case or spacing ("Django", "django ") become one tag: the
+    oldest keeps its name and takes over the others' questions. Then count
+    every tag's active questions.
+    """
+    Tag = apps.get_model('main', 'Tag')
+    Link = apps.get_model('main', 'Question').tags.through
+
+    kept = {}
+    for tag in Tag.objects.order_by('pk'):
+        key = normalize(tag.name)
+        into = kept.get(key)
+        if into is None:
+            kept[key] = tag.pk
+            Tag.objects.filter(pk=tag.pk).update(normalized_name=key)
+            continue
+        linked = Link.objects.filter(tag_id=into).values('question_id')
+        Link.objects.filter(tag_id=tag.pk, question_id__in=linked).delete()
+        Link.objects.filter(tag_id=tag.pk).update(tag_id=into)
+        tag.delete()
+
+    active = (
+        Link.objects.filter(tag=OuterRef('pk'), question__is_active=True)
+        .order_by().values('tag').annotate(total=Count('*')).values('total')
+    )
+    Tag.objects.update(question_count=Coalesce(Subquery(active, output_field=IntegerField()), Value(0)))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0002_question_hot_score'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tag',
+            name='normalized_name',
+            field=models.CharField(default='', editable=False, max_length=50),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='tag',
+            name='question_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(backfill_tags, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='tag',
+            name='normalized_name',
+            field=models.CharField(editable=False, max_length=50, unique=True),
+        ),
+        migrations.AddIndex(
+            model_name='tag',
+            index=models.Index(fields=['normalized_name', 'question_count', 'name'], name='tag_prefix'),
+        ),
+        migrations.AddIndex(
+            model_name='tag',
+            index=models.Index(fields=['-question_count', 'normalized_name'], name='tag_popular'),
+        ),
+    ]
@@ -0,0 +1,39 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0003_tag_normalized_name_question_count'),
+    ]
+
+    operations = [
+        # QuestionTag takes over the table Django created for Question.tags
+        # (same name, columns and constraints), so only the state changes.
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.CreateModel(
+                    name='QuestionTag',
+                    fields=[
+                        ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                        ('question', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='main.question')),
+                        ('tag', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='main.tag')),
+                    ],
+                    options={
+                        'db_table': 'main_question_tags',
+                        'unique_together': {('question', 'tag')},
+                    },
+                ),
+                migrations.AlterField(
+                    model_name='question',
+                    name='tags',
+                    field=models.ManyToManyField(related_name='questions', through='main.QuestionTag', to='main.tag'),
+                ),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='questiontag',
+            index=models.Index(fields=['tag', 'question'], name='question_tag_by_tag'),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.4 on 2026-10-18 05:51
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0004_questiontag'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='answer',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['question', '-is_accepted', '-created_at', '-id'], name='answer_thread'),
+        ),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['question', 'created_at', 'id'], name='comment_question_thread'),
+        ),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['answer', 'created_at', 'id'], name='comment_answer_thread'),
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['user', '-created_at', '-id'], name='notification_inbox'),
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(condition=models.Q(('is_read', False)), fields=['user', '-created_at', '-id'], name='notification_unread'),
+        ),
+    ]
@@ -0,0 +1,31 @@
+from django.db import migrations
+
+# The FTS5 keyword index of main/search.py, filled from the existing rows
+# with the same statements as `rebuild_search_index`. Databases that got an
+# empty or partial table from the earlier post_migrate hook are rebuilt.
+CREATE_INDEX = [
+    "DROP TABLE IF EXISTS main_search_fts",
+    "CREATE VIRTUAL TABLE main_search_fts USING fts5("
+    "question_id UNINDEXED, answer_id UNINDEXED, title, body, "
+    "tokenize = 'porter unicode61')",
+]
+FILL_INDEX = [
+    "INSERT INTO main_search_fts (rowid, question_id, answer_id, title, body) "
+    "SELECT 2 * id, id, NULL, title, description FROM main_question WHERE is_active",
+    "INSERT INTO main_search_fts (rowid, question_id, answer_id, title, body) "
+    "SELECT 2 * id + 1, question_id, id, '', content FROM main_answer WHERE is_active",
+]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0005_thread_and_inbox_indexes'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            [*CREATE_INDEX, *FILL_INDEX],
+            reverse_sql="DROP TABLE main_search_fts",
+        ),
+    ]
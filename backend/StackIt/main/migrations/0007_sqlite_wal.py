@@ -0,0 +1,26 @@
+from django.db import migrations
+
+# WAL lets readers run alongside the writer. The journal mode is stored in
+# the database file, so it is switched once here rather than by every
+# connection (which rewrote the file header on each manage.py run).
+# SQLite refuses the switch inside a transaction, hence atomic = False.
+
+
+def set_journal_mode(mode):
+    def run(apps, schema_editor):
+        if schema_editor.connection.vendor == "sqlite":
+            with schema_editor.connection.cursor() as cursor:
+                cursor.execute(f"PRAGMA journal_mode={mode}")
+    return run
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('main', '0006_search_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(set_journal_mode("WAL"), set_journal_mode("DELETE")),
+    ]
@@ -1,39 +1,133 @@
-from django.db import models
+from django.conf import settings
+from django.db import models, transaction
+from django.db.models import F
 from django.contrib.auth.models import User
 from django.utils import timezone
 from django.core.validators import MinLengthValidator
+from .feeds import hot_score, refresh_hot_score
+from .tags import normalize as normalize_tag_name
+from .vote_buffer import get_vote_buffer
 
 # Placeholder for rich text field (replace with django-ckeditor's RichTextField if used)
 RichTextField = models.TextField
 
-class Tag(models.Model):
+class CounterFieldsMixin:
+    """
+    Keeps denormalized counters out of ordinary saves.
+
+    A plain `save()` of an existing row writes every column except those in
+    `counter_fields`, so editing a question can't overwrite votes recorded
+    since it was loaded. Counters change only through `bump()`, a single
+    `UPDATE ... SET col = col + n` that is safe under concurrency.
+    """
+    counter_fields = ()
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding and kwargs.get('update_fields') is None and not kwargs.get('force_insert'):
+            kwargs['update_fields'] = [
+                f.name for f in self._meta.concrete_fields
+                if not f.primary_key and f.name not in self.counter_fields
+            ]
+        super().save(*args, **kwargs)
+
+    @classmethod
+    def bump(cls, pk, **deltas):
+        """Atomically add `deltas` (field=n) to the counters of row `pk`."""
+        updates = {field: F(field) + delta for field, delta in deltas.items() if delta}
+        if updates:
+            cls.objects.filter(pk=pk).update(**updates)
+
+class Tag(CounterFieldsMixin, models.Model):
     name = models.CharField(max_length=50, unique=True, validators=[MinLengthValidator(1)])
+    # Case-folded name (see main/tags.py): uniqueness, lookups and prefix search
+    normalized_name = models.CharField(max_length=50, unique=True, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
+    question_count = models.PositiveIntegerField(default=0, editable=False)
+
+    counter_fields = ('question_count',)
     
     class Meta:
         ordering = ['name']
+        indexes = [
+            # Autocomplete: the prefix range is read from the index alone
+            # (it covers every selected column) before sorting by usage.
+            models.Index(fields=['normalized_name', 'question_count', 'name'], name='tag_prefix'),
+            models.Index(fields=['-question_count', 'normalized_name'], name='tag_popular'),
+        ]
+    
+    def save(self, *args, **kwargs):
+        self.normalized_name = normalize_tag_name(self.name)
+        super().save(*args, **kwargs)
     
     def __str__(self):
         return self.name
 
-class Question(models.Model):
+class Question(CounterFieldsMixin, models.Model):
     title = models.CharField(max_length=255, validators=[MinLengthValidator(5)])
     description = RichTextField()
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='questions')
-    tags = models.ManyToManyField(Tag, related_name='questions')
+    tags = models.ManyToManyField(Tag, related_name='questions', through='QuestionTag')
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     is_active = models.BooleanField(default=True)
     num_answers = models.PositiveIntegerField(default=0, editable=False)
     vote_score = models.IntegerField(default=0, editable=False)
+    hot_score = models.FloatField(default=0, editable=False)
+
+    # hot_score is derived from the counters (see main/feeds.py) and kept
+    # out of ordinary saves with them.
+    counter_fields = ('num_answers', 'vote_score', 'hot_score')
     
     class Meta:
         ordering = ['-created_at']
+        # One index per ?sort= feed, matching its keyset ordering, so a page
+        # is an index range scan rather than a sort of every question.
+        indexes = [
+            models.Index(fields=['-created_at', '-id'], name='question_new_feed', condition=models.Q(is_active=True)),
+            models.Index(fields=['-hot_score', '-id'], name='question_hot_feed', condition=models.Q(is_active=True)),
+            models.Index(fields=['-vote_score', '-id'], name='question_top_feed', condition=models.Q(is_active=True)),
+            models.Index(
+                fields=['-created_at', '-id'], name='question_unanswered_feed',
+                condition=models.Q(is_active=True, num_answers=0),
+            ),
+        ]
+    
+    def save(self, *args, **kwargs):
+        if self._state.adding:
+            self.hot_score = hot_score(self.vote_score, self.num_answers, self.created_at or timezone.now())
+            super().save(*args, **kwargs)
+            return
+        with transaction.atomic():
+            # Lock the row so a concurrent (de)activation can't count twice.
+            was_active = Question.objects.select_for_update().filter(pk=self.pk).values_list('is_active', flat=True).first()
+            super().save(*args, **kwargs)
+            if was_active is not None and was_active != self.is_active:
+                # Tag.question_count only counts active questions.
+                Tag.objects.filter(questions=self).update(
+                    question_count=F('question_count') + (1 if self.is_active else -1)
+                )
+
+    @classmethod
+    def bump(cls, pk, **deltas):
+        with transaction.atomic():
+            super().bump(pk, **deltas)
+            if any(deltas.values()):
+                refresh_hot_score(pk)
     
     def __str__(self):
         return self.title
 
-class Answer(models.Model):
+class QuestionTag(models.Model):
+    """Question.tags link, with an index to go from a tag to its questions."""
+    question = models.ForeignKey(Question, on_delete=models.CASCADE)
+    tag = models.ForeignKey(Tag, on_delete=models.CASCADE)
+
+    class Meta:
+        db_table = 'main_question_tags'
+        unique_together = [('question', 'tag')]
+        indexes = [models.Index(fields=['tag', 'question'], name='question_tag_by_tag')]
+
+class Answer(CounterFieldsMixin, models.Model):
     question = models.ForeignKey(Question, on_delete=models.CASCADE, related_name='answers')
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='answers')
     content = RichTextField()
@@ -42,30 +136,42 @@ class Answer(models.Model):
     is_accepted = models.BooleanField(default=False)
     is_active = models.BooleanField(default=True)
     vote_score = models.IntegerField(default=0, editable=False)
+
+    counter_fields = ('vote_score',)
     
     def save(self, *args, **kwargs):
-        is_new = self.pk is None
-        was_active = None
-        if not is_new:
-            was_active = Answer.objects.get(pk=self.pk).is_active
-        
-        super().save(*args, **kwargs)
-        
-        if is_new and self.is_active:
-            self.question.num_answers += 1
-            self.question.save()
-        elif not is_new and was_active != self.is_active:
-            self.question.num_answers = self.question.answers.filter(is_active=True).count()
-            self.question.save()
+        is_new = self._state.adding
+        with transaction.atomic():
+            was_active = None
+            if not is_new:
+                # Lock the row so a concurrent (de)activation can't count twice.
+                was_active = Answer.objects.select_for_update().filter(pk=self.pk).values_list('is_active', flat=True).first()
+            
+            super().save(*args, **kwargs)
+            
+            if is_new and self.is_active:
+                Question.bump(self.question_id, num_answers=1)
+            elif not is_new and was_active is not None and was_active != self.is_active:
+                Question.bump(self.question_id, num_answers=1 if self.is_active else -1)
     
     def delete(self, *args, **kwargs):
-        if self.is_active:
-            self.question.num_answers = max(0, self.question.answers.filter(is_active=True).count() - 1)
-            self.question.save()
-        super().delete(*args, **kwargs)
+        with transaction.atomic():
+            was_active = Answer.objects.select_for_update().filter(pk=self.pk).values_list('is_active', flat=True).first()
+            result = super().delete(*args, **kwargs)
+            if was_active:
+                Question.bump(self.question_id, num_answers=-1)
+        return result
     
     class Meta:
         ordering = ['-is_accepted', '-created_at']
+        # A question's active answers in AnswerPagination order; also finds
+        # them for the notification fan-out.
+        indexes = [
+            models.Index(
+                fields=['question', '-is_accepted', '-created_at', '-id'], name='answer_thread',
+                condition=models.Q(is_active=True),
+            ),
+        ]
     
     def __str__(self):
         return f"Answer to {self.question.title} by {self.user.username}"
@@ -81,6 +187,17 @@ class Comment(models.Model):
     
     class Meta:
         ordering = ['created_at']
+        # Active comments on a question or an answer in CommentPagination order.
+        indexes = [
+            models.Index(
+                fields=['question', 'created_at', 'id'], name='comment_question_thread',
+                condition=models.Q(is_active=True),
+            ),
+            models.Index(
+                fields=['answer', 'created_at', 'id'], name='comment_answer_thread',
+                condition=models.Q(is_active=True),
+            ),
+        ]
     
     def __str__(self):
         target = self.question.title if self.question else f"Answer {self.answer.id}"
@@ -98,27 +215,35 @@ class Vote(models.Model):
     vote_type = models.IntegerField(choices=VOTE_TYPES)
     created_at = models.DateTimeField(auto_now_add=True)
     
+    def _bump_target(self, delta):
+        model, pk = (Question, self.question_id) if self.question_id else (Answer, self.answer_id)
+        if settings.VOTE_WRITE_BEHIND:
+            buffer = get_vote_buffer()
+            transaction.on_commit(lambda: buffer.add(model, pk, delta))
+        else:
+            model.bump(pk, vote_score=delta)
+    
     def save(self, *args, **kwargs):
-        is_new = self.pk is None
-        was_vote_type = None
-        if not is_new:
-            was_vote_type = Vote.objects.get(pk=self.pk).vote_type
-        
-        super().save(*args, **kwargs)
-        
-        target = self.question if self.question else self.answer
-        if is_new:
-            target.vote_score += self.vote_type
-            target.save()
-        elif was_vote_type != self.vote_type:
-            target.vote_score += (self.vote_type - was_vote_type)
-            target.save()
+        is_new = self._state.adding
+        with transaction.atomic():
+            was_vote_type = None
+            if not is_new:
+                was_vote_type = Vote.objects.select_for_update().filter(pk=self.pk).values_list('vote_type', flat=True).first()
+            
+            super().save(*args, **kwargs)
+            
+            if is_new:
+                self._bump_target(self.vote_type)
+            elif was_vote_type is not None and was_vote_type != self.vote_type:
+                self._bump_target(self.vote_type - was_vote_type)
     
     def delete(self, *args, **kwargs):
-        target = self.question if self.question else self.answer
-        target.vote_score -= self.vote_type
-        target.save()
-        super().delete(*args, **kwargs)
+        with transaction.atomic():
+            vote_type = Vote.objects.select_for_update().filter(pk=self.pk).values_list('vote_type', flat=True).first()
+            result = super().delete(*args, **kwargs)
+            if vote_type is not None:
+                self._bump_target(-vote_type)
+        return result
     
     class Meta:
         unique_together = [
@@ -155,6 +280,15 @@ class Notification(models.Model):
     
     class Meta:
         ordering = ['-created_at']
+        # A user's inbox in NotificationPagination order, all or unread only;
+        # the partial index also answers the unread count on its own.
+        indexes = [
+            models.Index(fields=['user', '-created_at', '-id'], name='notification_inbox'),
+            models.Index(
+                fields=['user', '-created_at', '-id'], name='notification_unread',
+                condition=models.Q(is_read=False),
+            ),
+        ]
     
     def __str__(self):
         return f"Notification for {self.user.username}: {self.content}"
\ No newline at end of file
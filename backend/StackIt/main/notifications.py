@@ -0,0 +1,448 @@
+# main/notifications.py
+"""
+Notification fan-out and delivery.
+
+Creating an answer or comment only enqueues an event once the transaction
+commits; the author's request never looks at who should be told. A worker
+thread drains the queue and, per batch:
+
+- works out the recipients: for an answer, everyone watching the thread
+  (the asker, the other answerers and the commenters); for a comment, the
+  owner of the post commented on and its earlier commenters; for either,
+  every user @mentioned in the text, who gets a "mention" instead. The
+  author is never notified of their own post.
+- drops bursts: a user who still has an unread notification of the same
+  type about the same question from the last NOTIFICATION_DEDUP_WINDOW
+  seconds doesn't get another one (ten answers in a minute are one
+  "new answer" notification until it is read).
+- writes the rest with bulk_create, NOTIFICATION_BULK_SIZE rows per INSERT,
+  however many watchers the thread has.
+
+Each user's unread count is cached (in the API cache) and dropped when the
+user gets notifications or marks them read. Clients either poll the
+paginated list, long-poll (`wait_for_notifications`) or hold an SSE stream
+(`stream_events`). Both are coroutines, served by main/async_views.py, so a
+waiting client holds no worker thread; they wake as soon as this process
+fans out to the user and otherwise re-check the database every
+NOTIFICATION_POLL_INTERVAL seconds, which picks up notifications written by
+other processes.
+"""
+import asyncio
+import atexit
+import re
+import threading
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import OperationalError, close_old_connections, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from ai.streaming import sse_event
+from . import response_cache
+
+# Django usernames are letters, digits and @.+-_; a mention stops at any
+# other character (the HTML around rich text included).
+MENTION_RE = re.compile(r"(?<![\w@.+-])@([\w.+-]+)")
+
+VERBS = {"answer": "answered", "comment": "commented on", "mention": "mentioned you in"}
+
+
+def mentioned_usernames(text):
+    return {name.rstrip(".") for name in MENTION_RE.findall(text or "")} - {""}
+
+
+# ---------------------------------------------------------------------- #
+# Unread counts
+# ---------------------------------------------------------------------- #
+def _unread_key(user_id):
+    return f"notifications:unread:{user_id}"
+
+
+def unread_count(user_id):
+    from .models import Notification
+
+    cache = response_cache.get_cache()
+    count = cache.get(_unread_key(user_id))
+    if count is None:
+        count = Notification.objects.filter(user_id=user_id, is_read=False).count()
+        cache.set(_unread_key(user_id), count, timeout=settings.NOTIFICATION_UNREAD_TTL)
+    return count
+
+
+def _forget_unread(user_ids):
+    response_cache.get_cache().delete_many([_unread_key(user_id) for user_id in user_ids])
+
+
+def mark_read(user_id, ids=None):
+    """Mark the user's notifications `ids` (all of them if None) read; returns how many changed."""
+    from .models import Notification
+
+    notifications = Notification.objects.filter(user_id=user_id, is_read=False)
+    if ids is not None:
+        notifications = notifications.filter(pk__in=ids)
+    updated = notifications.update(is_read=True)
+    if updated:
+        _forget_unread([user_id])
+    return updated
+
+
+# ---------------------------------------------------------------------- #
+# Fan-out
+# ---------------------------------------------------------------------- #
+class NotificationFanout:
+    """
+    Queue of ("answer" | "comment", id) events and the batch job turning
+    them into Notification rows. With `background=False` nothing runs until
+    `flush()` is called (tests).
+    """
+
+    def __init__(self, background=True, delay=None):
+        self.background = background
+        self.delay = delay if delay is not None else getattr(settings, "NOTIFICATION_FANOUT_DELAY", 0.2)
+
+        self._pending = {}                  # (kind, id) -> enqueue time
+        self._cond = threading.Condition()
+        self._flush_lock = threading.Lock()
+        self._thread = None
+        self._stopping = False
+
+        self.enqueued = 0
+        self.batches = 0
+        self.created = 0
+        self.deduplicated = 0
+        self.errors = 0
+        self.last_batch_seconds = 0.0
+
+    # ------------------------------------------------------------------ #
+    # Producer side
+    # ------------------------------------------------------------------ #
+    def enqueue(self, kind, pk):
+        with self._cond:
+            self.enqueued += 1
+            self._pending.setdefault((kind, pk), time.monotonic())
+            if self.background and (self._thread is None or not self._thread.is_alive()):
+                self._stopping = False
+                self._thread = threading.Thread(target=self._run, name="notification-fanout", daemon=True)
+                self._thread.start()
+            self._cond.notify()
+
+    # ------------------------------------------------------------------ #
+    # Worker side
+    # ------------------------------------------------------------------ #
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._pending and not self._stopping:
+                    self._cond.wait()
+                if self._stopping:
+                    return
+            # Let a burst accumulate so it is deduplicated and written together.
+            time.sleep(self.delay)
+            try:
+                self.flush()
+            except Exception as e:
+                self.errors += 1
+                print("⚠️  Notification fan-out failed:", e)
+            finally:
+                close_old_connections()
+
+    def flush(self):
+        """Fan out every queued event now; returns the number of notifications created."""
+        with self._flush_lock:
+            with self._cond:
+                batch = self._pending
+                self._pending = {}
+            if not batch:
+                return 0
+
+            started = time.monotonic()
+            try:
+                with transaction.atomic():
+                    rows, skipped = self._build(sorted(batch, key=batch.get))
+                    self._write(rows)
+            except OperationalError as e:
+                # e.g. SQLite busy: requeue and retry with the next batch.
+                with self._cond:
+                    for key, enqueued_at in batch.items():
+                        self._pending.setdefault(key, enqueued_at)
+                    self.errors += 1
+                print("⚠️  Notification fan-out failed:", e)
+                return 0
+
+            recipients = {row.user_id for row in rows}
+            _forget_unread(recipients)
+            doorbell.ring(recipients)
+            with self._cond:
+                self.batches += 1
+                self.created += len(rows)
+                self.deduplicated += skipped
+                self.last_batch_seconds = time.monotonic() - started
+            return len(rows)
+
+    def _build(self, events):
+        """Notification rows for `events` (oldest first) and the number dropped as duplicates."""
+        from .models import Answer, Comment, Notification
+
+        answer_ids = [pk for kind, pk in events if kind == "answer"]
+        comment_ids = [pk for kind, pk in events if kind == "comment"]
+        answers = (
+            Answer.objects.filter(pk__in=answer_ids, is_active=True, question__is_active=True)
+            .select_related("user", "question").in_bulk()
+        )
+        comments = (
+            Comment.objects.filter(pk__in=comment_ids, is_active=True)
+            .select_related("user", "question", "answer__question").in_bulk()
+        )
+
+        watchers = {}
+        candidates = []                     # (user id, type, question, content, related posts)
+        for kind, pk in events:
+            if kind == "answer" and pk in answers:
+                answer = answers[pk]
+                question = answer.question
+                if question.pk not in watchers:
+                    watchers[question.pk] = self._thread_watchers(question)
+                recipients = dict.fromkeys(watchers[question.pk], "answer")
+                post, target = answer, {"answer": answer}
+            elif kind == "comment" and pk in comments:
+                comment = comments[pk]
+                question = comment.question or comment.answer.question
+                if not question.is_active or (comment.answer and not comment.answer.is_active):
+                    continue
+                recipients = dict.fromkeys(self._post_watchers(comment), "comment")
+                post, target = comment, {"comment": comment, "answer": comment.answer}
+            else:
+                continue                    # deleted or deactivated since
+
+            for user_id in self._mentioned(post.content):
+                recipients[user_id] = "mention"
+            recipients.pop(post.user_id, None)
+
+            for user_id, notification_type in recipients.items():
+                content = f'{post.user.username} {VERBS[notification_type]} "{question.title}"'
+                candidates.append((user_id, notification_type, question, content, target))
+
+        seen = self._recent_unread({c[2].pk for c in candidates})
+        rows = []
+        for user_id, notification_type, question, content, target in candidates:
+            key = (user_id, notification_type, question.pk)
+            if key in seen:
+                continue
+            seen.add(key)
+            rows.append(Notification(
+                user_id=user_id, notification_type=notification_type, content=content,
+                related_question=question,
+                related_answer=target.get("answer"),
+                related_comment=target.get("comment"),
+            ))
+        return rows, len(candidates) - len(rows)
+
+    @staticmethod
+    def _recent_unread(question_ids):
+        """(user id, type, question id) of unread notifications inside the dedup window."""
+        from .models import Notification
+
+        cutoff = timezone.now() - timedelta(seconds=settings.NOTIFICATION_DEDUP_WINDOW)
+        return set(
+            Notification.objects
+            .filter(related_question_id__in=question_ids, is_read=False, created_at__gte=cutoff)
+            .order_by().values_list("user_id", "notification_type", "related_question_id")
+        )
+
+    @staticmethod
+    def _thread_watchers(question):
+        """The asker plus everyone with an active answer or comment on the question."""
+        from .models import Answer, Comment
+
+        # One index-backed branch per source; duplicates are dropped here
+        # rather than by a UNION sort.
+        answers = Answer.objects.filter(question=question, is_active=True).order_by()
+        comments = Comment.objects.filter(is_active=True).order_by()
+        user_ids = answers.values_list("user_id").union(
+            comments.filter(question=question).values_list("user_id"),
+            comments.filter(answer__in=answers.values("pk")).values_list("user_id"),
+            all=True,
+        )
+        return {question.user_id} | {user_id for user_id, in user_ids}
+
+    @staticmethod
+    def _post_watchers(comment):
+        """Owner of the commented post and its earlier commenters."""
+        from .models import Comment
+
+        post = comment.answer or comment.question
+        target = {"answer_id": comment.answer_id} if comment.answer_id else {"question_id": comment.question_id}
+        earlier = (
+            Comment.objects.filter(is_active=True, pk__lt=comment.pk, **target)
+            .order_by().values_list("user_id", flat=True)
+        )
+        return {post.user_id, *earlier}
+
+    @staticmethod
+    def _mentioned(text):
+        names = mentioned_usernames(text)
+        if not names:
+            return []
+        return User.objects.filter(username__in=names, is_active=True).values_list("pk", flat=True)
+
+    @staticmethod
+    def _write(rows):
+        from .models import Notification
+
+        Notification.objects.bulk_create(rows, batch_size=settings.NOTIFICATION_BULK_SIZE)
+
+    def stop(self):
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join()
+        self.flush()
+
+    # ------------------------------------------------------------------ #
+    # Metrics
+    # ------------------------------------------------------------------ #
+    def metrics(self):
+        with self._cond:
+            return {
+                "queue_depth": len(self._pending),
+                "enqueued": self.enqueued,
+                "batches": self.batches,
+                "created": self.created,
+                "deduplicated": self.deduplicated,
+                "errors": self.errors,
+                "last_batch_seconds": round(self.last_batch_seconds, 3),
+            }
+
+
+_fanout = None
+_fanout_lock = threading.Lock()
+
+
+def get_fanout():
+    """Process-wide NotificationFanout, created on first use."""
+    global _fanout
+    if _fanout is None:
+        with _fanout_lock:
+            if _fanout is None:
+                _fanout = NotificationFanout()
+                atexit.register(_fanout.stop)
+    return _fanout
+
+
+def set_fanout(fanout):
+    """Replace the process-wide fan-out (tests); returns the previous one."""
+    global _fanout
+    with _fanout_lock:
+        previous, _fanout = _fanout, fanout
+    return previous
+
+
+# ---------------------------------------------------------------------- #
+# Push delivery
+# ---------------------------------------------------------------------- #
+class Doorbell:
+    """
+    Wakes this process's long-polls and streams waiting on a user who was
+    just notified. Waiters are coroutines; `ring` may be called from any
+    thread (the fan-out worker's included).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._listeners = {}                # user id -> {asyncio.Event: its event loop}
+
+    @contextmanager
+    def listening(self, user_id):
+        """An asyncio.Event that is set whenever `user_id` is rung during the block."""
+        event = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            self._listeners.setdefault(user_id, {})[event] = loop
+        try:
+            yield event
+        finally:
+            with self._lock:
+                listeners = self._listeners[user_id]
+                del listeners[event]
+                if not listeners:
+                    del self._listeners[user_id]
+
+    def ring(self, user_ids):
+        with self._lock:
+            waiters = [
+                (loop, event)
+                for user_id in user_ids
+                for event, loop in self._listeners.get(user_id, {}).items()
+            ]
+        for loop, event in waiters:
+            try:
+                loop.call_soon_threadsafe(event.set)
+            except RuntimeError:
+                pass                        # its loop has closed
+
+    @staticmethod
+    async def wait(event, timeout):
+        """Wait until `event` is set, at most `timeout` seconds; returns whether it was."""
+        try:
+            await asyncio.wait_for(event.wait(), timeout)
+        except asyncio.TimeoutError:
+            return False
+        return True
+
+
+doorbell = Doorbell()
+
+
+def latest_id(user_id):
+    from .models import Notification
+
+    return Notification.objects.filter(user_id=user_id).order_by("-pk").values_list("pk", flat=True).first() or 0
+
+
+async def wait_for_notifications(user_id, after, timeout, limit=None):
+    """
+    The user's notifications with id > `after`, oldest first, waiting up to
+    `timeout` seconds for one to arrive. Returns [] on timeout.
+    """
+    from .models import Notification
+
+    limit = limit or settings.API_MAX_PAGE_SIZE
+    newer = Notification.objects.filter(user_id=user_id, pk__gt=after).order_by("pk")
+    deadline = time.monotonic() + timeout
+    with doorbell.listening(user_id) as rung:
+        while True:
+            rung.clear()                    # before querying, so a ring during the query isn't lost
+            rows = await sync_to_async(list)(newer[:limit])
+            remaining = deadline - time.monotonic()
+            if rows or remaining <= 0:
+                return rows
+            await doorbell.wait(rung, min(remaining, settings.NOTIFICATION_POLL_INTERVAL))
+
+
+async def stream_events(user_id, after, serialize):
+    """
+    SSE events for the user's notifications with id > `after`: one
+    `notification` event each (its id as the SSE id, so a reconnecting
+    EventSource resumes via Last-Event-ID) followed by an `unread` event,
+    and a comment line every NOTIFICATION_KEEPALIVE seconds without news.
+    Ends after NOTIFICATION_STREAM_SECONDS; clients reconnect.
+    """
+    deadline = time.monotonic() + settings.NOTIFICATION_STREAM_SECONDS
+    while True:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return
+        rows = await wait_for_notifications(user_id, after, min(remaining, settings.NOTIFICATION_KEEPALIVE))
+        if not rows:
+            yield ": keepalive\n\n"
+            continue
+        for row, data in zip(rows, await sync_to_async(serialize)(rows)):
+            yield sse_event("notification", data, event_id=row.pk)
+        after = rows[-1].pk
+        yield sse_event("unread", {"unread": await sync_to_async(unread_count)(user_id)})
@@ -0,0 +1,172 @@
+import base64
+import json
+import operator
+from functools import reduce
+
+from django.conf import settings
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Keyset (seek) pagination over a fixed, unique ordering.
+
+    The cursor holds the ordering values of the last row served, and the
+    next page is fetched with `WHERE (ordering) > (those values)`, so every
+    page costs the same however deep it is. Unlike DRF's CursorPagination,
+    which seeks on the first ordering field only and falls back to offsets
+    on ties, the whole ordering tuple is compared, so `ordering` must end in
+    a unique field.
+
+    Responses look like {"next": url|null, "previous": url|null, "results": [...]}.
+    Pages hold settings.API_PAGE_SIZE rows; `?page_size=` can change that up
+    to settings.API_MAX_PAGE_SIZE.
+    """
+    ordering = ("-created_at", "-id")
+    cursor_query_param = "cursor"
+    page_size_query_param = "page_size"
+    invalid_cursor_message = "Invalid cursor"
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.model = queryset.model
+        position, reverse = self.decode_cursor(request)
+
+        ordering = self._flipped(self.ordering) if reverse else self.ordering
+        queryset = queryset.order_by(*ordering)
+        if position is not None:
+            queryset = queryset.filter(self._after(ordering, position))
+
+        rows = list(queryset[:self.page_size + 1])
+        has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        if reverse:
+            rows.reverse()
+
+        # Whichever way we are going, rows lie beyond the page if the query
+        # overflowed, and behind it if we arrived through a cursor.
+        ahead, behind = has_more, position is not None
+        more_after, more_before = (behind, ahead) if reverse else (ahead, behind)
+
+        self.next_position = self.previous_position = None
+        if rows:
+            if more_after:
+                self.next_position = self._position(rows[-1])
+            if more_before:
+                self.previous_position = self._position(rows[0])
+        elif position is not None:
+            # Paged past either end: offer the way back.
+            if reverse:
+                self.next_position = position
+            else:
+                self.previous_position = position
+        return rows
+
+    def get_paginated_response(self, data):
+        return Response({
+            "next": self.get_next_link(),
+            "previous": self.get_previous_link(),
+            "results": data,
+        })
+
+    def get_page_size(self, request):
+        page_size = settings.API_PAGE_SIZE
+        try:
+            requested = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            requested = 0
+        if requested > 0:
+            page_size = requested
+        return min(page_size, settings.API_MAX_PAGE_SIZE)
+
+    def get_next_link(self):
+        return self._link(self.next_position, reverse=False)
+
+    def get_previous_link(self):
+        return self._link(self.previous_position, reverse=True)
+
+    # ------------------------------------------------------------------ #
+    # Cursor encoding
+    # ------------------------------------------------------------------ #
+    def _link(self, position, reverse):
+        if position is None:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(position, reverse))
+
+    def encode_cursor(self, position, reverse):
+        data = json.dumps({"p": position, "r": int(reverse)}, separators=(",", ":"))
+        return base64.urlsafe_b64encode(data.encode()).decode().rstrip("=")
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None, False
+        try:
+            data = json.loads(base64.urlsafe_b64decode(encoded + "=" * (-len(encoded) % 4)))
+            position, reverse = data["p"], bool(data["r"])
+            if len(position) != len(self.ordering):
+                raise ValueError(position)
+            for name, value in zip(self._fields(), position):
+                self.model._meta.get_field(name).to_python(value)
+        except Exception:
+            raise NotFound(self.invalid_cursor_message)
+        return position, reverse
+
+    # ------------------------------------------------------------------ #
+    # Keyset predicate
+    # ------------------------------------------------------------------ #
+    def _fields(self):
+        return [field.lstrip("-") for field in self.ordering]
+
+    @staticmethod
+    def _flipped(ordering):
+        return tuple(field[1:] if field.startswith("-") else "-" + field for field in ordering)
+
+    def _position(self, obj):
+        values = []
+        for name in self._fields():
+            value = getattr(obj, name)
+            values.append(value.isoformat() if hasattr(value, "isoformat") else value)
+        return values
+
+    def _after(self, ordering, position):
+        """(a, b, c) after (x, y, z): a>x | a=x & b>y | a=x & b=y & c>z, per field direction."""
+        branches = []
+        equal = Q()
+        for field, value in zip(ordering, position):
+            name = field.lstrip("-")
+            value = self.model._meta.get_field(name).to_python(value)
+            lookup = "lt" if field.startswith("-") else "gt"
+            branches.append(equal & Q(**{f"{name}__{lookup}": value}))
+            equal &= Q(**{name: value})
+        return reduce(operator.or_, branches)
+
+
+class QuestionPagination(KeysetPagination):
+    ordering = ("-created_at", "-id")
+
+
+class HotQuestionPagination(KeysetPagination):
+    ordering = ("-hot_score", "-id")
+
+
+class TopQuestionPagination(KeysetPagination):
+    ordering = ("-vote_score", "-id")
+
+
+class AnswerPagination(KeysetPagination):
+    ordering = ("-is_accepted", "-created_at", "-id")
+
+
+class CommentPagination(KeysetPagination):
+    ordering = ("created_at", "id")
+
+
+class NotificationPagination(KeysetPagination):
+    ordering = ("-created_at", "-id")
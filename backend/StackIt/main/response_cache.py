@@ -0,0 +1,121 @@
+# main/response_cache.py
+"""
+Versioned cache of anonymous list responses, with strong ETags.
+
+Every cached list depends on one or more *scopes*: "questions" (the question
+list), "tags" (the tag list) and "question:<id>" (that question's answers).
+Each scope has a version token in the cache. A response is stored under a
+key built from the request URL and the current tokens of its scopes, so
+bumping a scope's token orphans exactly the entries that depend on it; they
+are never looked up again and age out after API_CACHE_TIMEOUT.
+
+Model signals bump the affected scopes (see main/signals.py). They bump
+once right away and once after the transaction commits, so that a request
+that read the old rows while the write was in flight cannot leave them
+cached under the new token. Bulk updates that bypass signals (management
+commands such as recount_votes) show up once entries expire.
+
+The ETag is a hash of the response content, stored next to it. A request
+whose If-None-Match matches the cached ETag gets a 304 after a couple of
+cache reads and no database query.
+
+Responses come from the `settings.API_CACHE_ALIAS` Django cache: local
+memory by default. Point it at a shared backend (Redis, Memcached) so that
+a write in one process invalidates every process's entries.
+"""
+import hashlib
+import json
+import uuid
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.utils.cache import patch_vary_headers
+from django.utils.http import parse_etags
+from rest_framework.response import Response
+
+
+def get_cache():
+    return caches[settings.API_CACHE_ALIAS]
+
+
+def _version_key(scope):
+    return f"api:version:{scope}"
+
+
+def _new_token():
+    # Random rather than a counter: a token that was evicted and recreated
+    # can't collide with entries stored under its old value.
+    return uuid.uuid4().hex[:16]
+
+
+def versions(scopes):
+    """Current version tokens of `scopes`, creating missing ones."""
+    cache = get_cache()
+    keys = [_version_key(scope) for scope in scopes]
+    tokens = cache.get_many(keys)
+    for key in keys:
+        if key not in tokens:
+            cache.add(key, _new_token(), timeout=None)
+            tokens[key] = cache.get(key, "")     # "" only with a no-op (dummy) cache
+    return [tokens[key] for key in keys]
+
+
+def _bump(scopes):
+    get_cache().set_many({_version_key(scope): _new_token() for scope in scopes}, timeout=None)
+
+
+def invalidate(*scopes):
+    """Invalidate every cached response depending on any of `scopes`, now and on commit."""
+    _bump(scopes)
+    transaction.on_commit(lambda: _bump(scopes))
+
+
+def clear():
+    get_cache().clear()
+
+
+def _etag(data, renderer_format):
+    content = json.dumps(data, separators=(",", ":"), default=str)
+    return '"%s"' % hashlib.sha1(f"{renderer_format}:{content}".encode()).hexdigest()
+
+
+def _not_modified(request, etag):
+    header = request.META.get("HTTP_IF_NONE_MATCH")
+    if not header:
+        return False
+    tags = [tag.removeprefix("W/") for tag in parse_etags(header)]
+    return "*" in tags or etag in tags
+
+
+class CachedListMixin:
+    """
+    Serves `list` for anonymous users from the response cache.
+
+    Views implement `cache_scopes()`, returning the scopes their list depends on.
+    Authenticated requests always go to the database.
+    """
+
+    def cache_scopes(self):
+        raise NotImplementedError
+
+    def list(self, request, *args, **kwargs):
+        if request.user.is_authenticated:
+            return super().list(request, *args, **kwargs)
+
+        renderer_format = request.accepted_renderer.format
+        key_parts = [request.build_absolute_uri(), renderer_format, *versions(self.cache_scopes())]
+        key = "api:response:" + hashlib.sha1("|".join(key_parts).encode()).hexdigest()
+
+        cache = get_cache()
+        entry = cache.get(key)
+        if entry is None:
+            response = super().list(request, *args, **kwargs)
+            entry = (_etag(response.data, renderer_format), response.data)
+            cache.set(key, entry, timeout=settings.API_CACHE_TIMEOUT)
+
+        etag, data = entry
+        response = Response(status=304) if _not_modified(request, etag) else Response(data)
+        response["ETag"] = etag
+        patch_vary_headers(response, ["Authorization"])
+        return response
@@ -0,0 +1,258 @@
+# main/search.py
+"""
+Keyword search over questions and answers with SQLite FTS5.
+
+One FTS5 table holds a row per question (title + description) and per
+answer (content). Row ids are derived from the model ids (question n ->
+2n, answer n -> 2n + 1), so a single document is updated or removed by
+rowid without scanning. Signals keep the table in sync inside the writing
+transaction; `manage.py rebuild_search_index` repopulates it in bulk.
+
+The table is created and filled by migration 0006_search_index. On other
+database backends search is unavailable and the sync hooks do nothing.
+
+`hybrid_search` merges these keyword results with nearest answers from the
+chatbot's resident FAISS index (no LLM call) by reciprocal-rank fusion.
+"""
+import html
+import re
+
+from django.conf import settings
+from django.db import connection
+
+from ai.utils.rag import get_relevant_context
+
+FTS_TABLE = "main_search_fts"
+
+TITLE_WEIGHT = 10.0         # bm25 weight of a title match relative to body text
+SNIPPET_TOKENS = 24
+
+_MARK_OPEN, _MARK_CLOSE = "\x02", "\x03"
+
+
+class SearchUnavailable(Exception):
+    """The database backend has no FTS5."""
+
+
+def is_available():
+    return connection.vendor == "sqlite"
+
+
+def _question_rowid(question_id):
+    return 2 * question_id
+
+
+def _answer_rowid(answer_id):
+    return 2 * answer_id + 1
+
+
+# ---------------------------------------------------------------------- #
+# Incremental sync
+# ---------------------------------------------------------------------- #
+def index_question(question):
+    if not is_available():
+        return
+    rowid = _question_rowid(question.pk)
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [rowid])
+        if question.is_active:
+            cursor.execute(
+                f"INSERT INTO {FTS_TABLE} (rowid, question_id, answer_id, title, body) VALUES (%s, %s, NULL, %s, %s)",
+                [rowid, question.pk, question.title, question.description],
+            )
+
+
+def index_answer(answer):
+    if not is_available():
+        return
+    rowid = _answer_rowid(answer.pk)
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [rowid])
+        if answer.is_active:
+            cursor.execute(
+                f"INSERT INTO {FTS_TABLE} (rowid, question_id, answer_id, title, body) VALUES (%s, %s, %s, '', %s)",
+                [rowid, answer.question_id, answer.pk, answer.content],
+            )
+
+
+def remove_question(question_id):
+    if is_available():
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [_question_rowid(question_id)])
+
+
+def remove_answer(answer_id):
+    if is_available():
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [_answer_rowid(answer_id)])
+
+
+def rebuild_index():
+    """Drop and repopulate the FTS table with set-based INSERT ... SELECTs; returns the row count."""
+    if not is_available():
+        raise SearchUnavailable()
+    with connection.cursor() as cursor:
+        cursor.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+        cursor.execute(
+            f"CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5("
+            "question_id UNINDEXED, answer_id UNINDEXED, title, body, "
+            "tokenize = 'porter unicode61')"
+        )
+        cursor.execute(
+            f"INSERT INTO {FTS_TABLE} (rowid, question_id, answer_id, title, body) "
+            "SELECT 2 * id, id, NULL, title, description FROM main_question WHERE is_active"
+        )
+        cursor.execute(
+            f"INSERT INTO {FTS_TABLE} (rowid, question_id, answer_id, title, body) "
+            "SELECT 2 * id + 1, question_id, id, '', content FROM main_answer WHERE is_active"
+        )
+        cursor.execute(f"INSERT INTO {FTS_TABLE} ({FTS_TABLE}) VALUES ('optimize')")
+        cursor.execute(f"SELECT count(*) FROM {FTS_TABLE}")
+        return cursor.fetchone()[0]
+
+
+# ---------------------------------------------------------------------- #
+# Querying
+# ---------------------------------------------------------------------- #
+def match_expression(query):
+    """
+    Turn free text into an FTS5 query: every word must match, the last one
+    as a prefix (so partially typed words match). Quoting each term keeps
+    FTS5 operators in user input from being interpreted.
+    """
+    terms = re.findall(r"\w+", query)
+    if not terms:
+        return None
+    quoted = [f'"{term}"' for term in terms]
+    quoted[-1] += "*"
+    return " ".join(quoted)
+
+
+def _marked(text):
+    """Escape `text` for HTML and turn the FTS match markers into <mark> tags."""
+    return html.escape(text).replace(_MARK_OPEN, "<mark>").replace(_MARK_CLOSE, "</mark>")
+
+
+def _candidate_floor(expression, max_candidates):
+    """
+    Lowest rowid among the newest `max_candidates` matches, or 0 if there
+    are fewer. bm25 has to score every match before sorting, which takes
+    hundreds of ms for a common word on a large corpus; bounding the rowid
+    range (FTS5 seeks it directly) bounds that work.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s ORDER BY rowid DESC LIMIT 1 OFFSET %s",
+            [expression, max_candidates - 1],
+        )
+        row = cursor.fetchone()
+    return row[0] if row else 0
+
+
+def search(query, limit=20, offset=0, max_candidates=None):
+    """
+    BM25-ranked matches for `query`, best first, as a list of dicts:
+    {"question_id", "answer_id" (None for a question match), "title",
+    "snippet", "score"}. `title` and `snippet` are HTML-escaped with the
+    matched terms wrapped in <mark>. Inactive questions and answers, and
+    answers to inactive questions, are skipped. With `max_candidates`, only
+    the most recently indexed that many matches are ranked.
+    """
+    if not is_available():
+        raise SearchUnavailable()
+    expression = match_expression(query)
+    if expression is None:
+        return []
+    floor = _candidate_floor(expression, max_candidates) if max_candidates else 0
+
+    sql = f"""
+        SELECT {FTS_TABLE}.question_id, {FTS_TABLE}.answer_id, q.title,
+               highlight({FTS_TABLE}, 2, %s, %s),
+               snippet({FTS_TABLE}, 3, %s, %s, '…', %s),
+               bm25({FTS_TABLE}, 0, 0, %s, 1.0) AS score
+        FROM {FTS_TABLE}
+        JOIN main_question q ON q.id = {FTS_TABLE}.question_id AND q.is_active
+        LEFT JOIN main_answer a ON a.id = {FTS_TABLE}.answer_id
+        WHERE {FTS_TABLE} MATCH %s AND {FTS_TABLE}.rowid >= %s
+          AND ({FTS_TABLE}.answer_id IS NULL OR a.is_active)
+        ORDER BY score, {FTS_TABLE}.rowid
+        LIMIT %s OFFSET %s
+    """
+    params = [_MARK_OPEN, _MARK_CLOSE, _MARK_OPEN, _MARK_CLOSE, SNIPPET_TOKENS,
+              TITLE_WEIGHT, expression, floor, limit, offset]
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        rows = cursor.fetchall()
+
+    return [{
+        "question_id": question_id,
+        "answer_id": answer_id,
+        "title": _marked(title_hit) if answer_id is None else html.escape(title),
+        "snippet": _marked(snippet),
+        "score": round(-score, 4),          # FTS5 bm25 is lower-is-better
+    } for question_id, answer_id, title, title_hit, snippet, score in rows]
+
+
+# ---------------------------------------------------------------------- #
+# Hybrid (keyword + vector) search
+# ---------------------------------------------------------------------- #
+def _excerpt(text):
+    words = text.split()
+    excerpt = " ".join(words[:SNIPPET_TOKENS])
+    return html.escape(excerpt + ("…" if len(words) > SNIPPET_TOKENS else ""))
+
+
+def _semantic_answers(query, depth):
+    """Active answers nearest to `query` in the answer index, nearest first, as DB rows by id."""
+    from main.models import Answer
+
+    hits = get_relevant_context(query, k=depth, relevance_threshold=settings.SEARCH_MIN_SIMILARITY)
+    ids = [hit["id"] for hit in hits]
+    rows = (
+        Answer.objects
+        .filter(id__in=ids, is_active=True, question__is_active=True)
+        .values_list("id", "question_id", "question__title", "content")
+    )
+    by_id = {row[0]: row for row in rows}
+    return [by_id[answer_id] for answer_id in ids if answer_id in by_id]
+
+
+def hybrid_search(query, limit=20, offset=0):
+    """
+    Keyword and vector results fused by reciprocal rank: each result scores
+    sum(1 / (SEARCH_RRF_K + rank)) over the lists it appears in, so
+    documents found both ways rise to the top without having to reconcile
+    BM25 scores with vector distances. Keyword ranking is limited to the
+    newest SEARCH_MAX_CANDIDATES matches to keep latency flat. Results have the same shape as
+    `search` plus "matched" (["keyword"], ["semantic"] or both); vector-only
+    answers get a plain excerpt instead of a highlighted snippet.
+    """
+    depth = max(settings.SEARCH_HYBRID_DEPTH, offset + limit)
+    rrf_k = settings.SEARCH_RRF_K
+
+    fused = {}
+    keyword = search(query, limit=depth, max_candidates=settings.SEARCH_MAX_CANDIDATES)
+    for rank, hit in enumerate(keyword, 1):
+        fused[hit["question_id"], hit["answer_id"]] = {
+            **hit, "score": 1.0 / (rrf_k + rank), "matched": ["keyword"],
+        }
+
+    for rank, (answer_id, question_id, title, content) in enumerate(_semantic_answers(query, depth), 1):
+        hit = fused.get((question_id, answer_id))
+        if hit is None:
+            hit = fused[question_id, answer_id] = {
+                "question_id": question_id,
+                "answer_id": answer_id,
+                "title": html.escape(title),
+                "snippet": _excerpt(content),
+                "score": 0.0,
+                "matched": [],
+            }
+        hit["score"] += 1.0 / (rrf_k + rank)
+        hit["matched"].append("semantic")
+
+    # sorted() is stable: ties keep keyword order.
+    ranked = sorted(fused.values(), key=lambda hit: -hit["score"])[offset:offset + limit]
+    for hit in ranked:
+        hit["score"] = round(hit["score"], 6)
+    return ranked
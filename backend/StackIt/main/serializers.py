@@ -1,6 +1,9 @@
+from django.db import transaction
 from rest_framework import serializers
 from .models import Question, Tag, Answer, Comment, Vote, Notification
 from django.contrib.auth.models import User
+from . import tags as tag_index
+from .vote_buffer import pending_score
 
 class TagSerializer(serializers.ModelSerializer):
     class Meta:
@@ -9,10 +12,19 @@ class TagSerializer(serializers.ModelSerializer):
         read_only_fields = ['id']
 
     def validate_name(self, value):
-        if self.instance is None and Tag.objects.filter(name__iexact=value).exists():
+        existing = Tag.objects.filter(normalized_name=tag_index.normalize(value))
+        if self.instance is not None:
+            existing = existing.exclude(pk=self.instance.pk)
+        if existing.exists():
             raise serializers.ValidationError("Tag with this name already exists.")
         return value
 
+class TagUsageSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Tag
+        fields = ['id', 'name', 'question_count']
+        read_only_fields = fields
+
 class UserSerializer(serializers.ModelSerializer):
     class Meta:
         model = User
@@ -85,7 +97,15 @@ class CommentSerializer(serializers.ModelSerializer):
             question = Question.objects.get(id=question_id)
             return Comment.objects.create(user=user, question=question, **validated_data)
 
-class AnswerSerializer(serializers.ModelSerializer):
+class PendingVotesMixin:
+    """Adds score changes still buffered by write-behind voting to vote_score."""
+
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        data['vote_score'] += pending_score(type(instance), instance.pk)
+        return data
+
+class AnswerSerializer(PendingVotesMixin, serializers.ModelSerializer):
     user = UserSerializer(read_only=True)
     
     class Meta:
@@ -98,7 +118,7 @@ class AnswerSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError("Answer content cannot be empty.")
         return value
 
-class QuestionSerializer(serializers.ModelSerializer):
+class QuestionSerializer(PendingVotesMixin, serializers.ModelSerializer):
     user = UserSerializer(read_only=True)
     tags = TagSerializer(many=True, read_only=True)
     tag_names = serializers.ListField(
@@ -120,13 +140,18 @@ class QuestionSerializer(serializers.ModelSerializer):
 
     def create(self, validated_data):
         tag_names = validated_data.pop('tag_names', [])
-        question = Question.objects.create(**validated_data)
-        tags = []
-        for name in tag_names:
-            tag, _ = Tag.objects.get_or_create(
-                name__iexact=name,
-                defaults={'name': name}
-            )
-            tags.append(tag)
-        question.tags.set(tags)
-        return question
\ No newline at end of file
+        with transaction.atomic():
+            question = Question.objects.create(**validated_data)
+            question.tags.add(*tag_index.resolve(tag_names))
+        return question
+
+
+class NotificationSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Notification
+        fields = ['id', 'notification_type', 'content', 'related_question', 'related_answer', 'related_comment', 'is_read', 'created_at']
+        read_only_fields = fields
+
+
+class MarkReadSerializer(serializers.Serializer):
+    ids = serializers.ListField(child=serializers.IntegerField(), required=False, max_length=1000)
@@ -1,67 +1,148 @@
 # main/signals.py
-import os, faiss, pickle
-from django.db.models.signals import post_save, post_delete
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import post_save, post_delete, pre_delete, m2m_changed
 from django.dispatch import receiver
-from sentence_transformers import SentenceTransformer
-from .models import Answer
+from ai.utils.embedding_queue import get_embedding_pipeline
+from . import notifications, response_cache, search
+from .models import Answer, Comment, Question, Tag, Vote
 
-INDEX_PATH   = "ai/faiss_data/answers.index"
-META_PATH    = "ai/faiss_data/answers_meta.pkl"
-EMB_MODEL_ID = "all-MiniLM-L6-v2"          # keep in sync with build_faiss.py
+# Embedding happens off the request path: the pipeline re-reads the answer
+# once the transaction commits and upserts or removes it in a batch.
 
-emb_model = SentenceTransformer(EMB_MODEL_ID)
-
-def _load_index_and_meta():
-    index  = faiss.read_index(INDEX_PATH)
-    with open(META_PATH, "rb") as f:
-        meta = pickle.load(f)
-    return index, meta
-
-def _save_index_and_meta(index, meta):
-    faiss.write_index(index, INDEX_PATH)
-    with open(META_PATH, "wb") as f:
-        pickle.dump(meta, f)
+def _enqueue(answer_id):
+    pipeline = get_embedding_pipeline()
+    transaction.on_commit(lambda: pipeline.enqueue(answer_id))
 
 @receiver(post_save, sender=Answer)
 def add_or_update_answer(sender, instance, created, **kwargs):
-    if not instance.is_active:          # ignore inactive edits
-        return
-
-    # Load
-    index, meta = _load_index_and_meta()
-
-    if created:
-        vec = emb_model.encode([instance.content])
-        index.add(vec)
-        meta.append({
-            "id": instance.id,
-            "content": instance.content,
-            "question": instance.question.title,
-        })
-    else:
-        # For edits → rebuild vector in place
-        try:
-            idx = next(i for i, m in enumerate(meta) if m["id"] == instance.id)
-        except StopIteration:
-            return  # safety
-        meta[idx]["content"] = instance.content
-        meta[idx]["question"] = instance.question.title
-        vec = emb_model.encode([instance.content])
-        index.reconstruct(idx)          # ensure same dim
-        index.replace_ids(faiss.IDSelector64(idx), vec)
-
-    _save_index_and_meta(index, meta)
-    print("✅ FAISS index updated for Answer", instance.id)
+    _enqueue(instance.id)
 
 @receiver(post_delete, sender=Answer)
 def remove_answer(sender, instance, **kwargs):
-    index, meta = _load_index_and_meta()
-    try:
-        idx = next(i for i, m in enumerate(meta) if m["id"] == instance.id)
-    except StopIteration:
-        return
-    index.remove_ids(faiss.IDSelector64(idx))
-    meta.pop(idx)
-    _save_index_and_meta(index, meta)
-    print("🗑️  Removed Answer", instance.id, "from FAISS")
-    
\ No newline at end of file
+    _enqueue(instance.id)
+
+
+# Keyword search index, updated in the same transaction as the row.
+
+@receiver(post_save, sender=Question)
+def index_question(sender, instance, **kwargs):
+    search.index_question(instance)
+
+@receiver(post_save, sender=Answer)
+def index_answer(sender, instance, **kwargs):
+    search.index_answer(instance)
+
+@receiver(post_delete, sender=Question)
+def unindex_question(sender, instance, **kwargs):
+    search.remove_question(instance.id)
+
+@receiver(post_delete, sender=Answer)
+def unindex_answer(sender, instance, **kwargs):
+    search.remove_answer(instance.id)
+
+
+
+# Notifications are fanned out in the background once the new answer or
+# comment commits, so the author's request doesn't wait for the watchers.
+
+def _notify(kind, instance, created):
+    if created and instance.is_active:
+        fanout = notifications.get_fanout()
+        transaction.on_commit(lambda: fanout.enqueue(kind, instance.id))
+
+@receiver(post_save, sender=Answer)
+def notify_answer(sender, instance, created, **kwargs):
+    _notify("answer", instance, created)
+
+@receiver(post_save, sender=Comment)
+def notify_comment(sender, instance, created, **kwargs):
+    _notify("comment", instance, created)
+
+
+# Cached list responses (main/response_cache.py): bump the version of every
+# list that shows the changed row. Soft deletes are saves.
+
+@receiver([post_save, post_delete], sender=Question)
+def invalidate_question(sender, instance, **kwargs):
+    response_cache.invalidate("questions", f"question:{instance.id}")
+
+@receiver(m2m_changed, sender=Question.tags.through)
+def invalidate_question_tags(sender, instance, **kwargs):
+    response_cache.invalidate("questions")
+
+@receiver([post_save, post_delete], sender=Answer)
+def invalidate_answer(sender, instance, **kwargs):
+    # num_answers is part of the question list
+    response_cache.invalidate("questions", f"question:{instance.question_id}")
+
+def _answer_question_id(instance):
+    """Question id of the answer a vote or comment is on, without a query when the answer is loaded."""
+    if type(instance).answer.is_cached(instance):
+        return instance.answer.question_id
+    return Answer.objects.filter(pk=instance.answer_id).values_list('question_id', flat=True).first()
+
+@receiver([post_save, post_delete], sender=Vote)
+def invalidate_vote(sender, instance, **kwargs):
+    if instance.question_id:
+        response_cache.invalidate("questions", f"question:{instance.question_id}")
+    else:
+        response_cache.invalidate(f"question:{_answer_question_id(instance)}")
+
+@receiver([post_save, post_delete], sender=Comment)
+def invalidate_comment(sender, instance, **kwargs):
+    question_id = instance.question_id or _answer_question_id(instance)
+    response_cache.invalidate(f"question:{question_id}")
+
+@receiver([post_save, post_delete], sender=Tag)
+def invalidate_tag(sender, instance, **kwargs):
+    # Questions embed their tags' names
+    response_cache.invalidate("tags", "questions")
+
+
+# Tag.question_count: the number of *active* questions with the tag,
+# adjusted by however many links each change adds or removes (from either
+# side of the relation). Question.save handles (de)activation.
+
+def _count_tags(tag_ids, delta):
+    if tag_ids and delta:
+        Tag.objects.filter(pk__in=tag_ids).update(question_count=F('question_count') + delta)
+
+def _active_questions(question_ids):
+    return Question.objects.filter(pk__in=question_ids, is_active=True).count()
+
+@receiver(m2m_changed, sender=Question.tags.through)
+def count_question_tags(sender, instance, action, reverse, pk_set, **kwargs):
+    if action in ('pre_clear', 'pre_remove'):
+        # clear() doesn't say what it removes, and remove() passes every pk
+        # it was given, linked or not: look at the links before they go.
+        if reverse:
+            links = sender.objects.filter(tag=instance, question__is_active=True)
+            if pk_set is not None:
+                links = links.filter(question_id__in=pk_set)
+            instance._removed_links = links.count()
+        elif instance.is_active:
+            links = sender.objects.filter(question=instance)
+            if pk_set is not None:
+                links = links.filter(tag_id__in=pk_set)
+            instance._removed_links = list(links.values_list('tag_id', flat=True))
+        else:
+            instance._removed_links = []
+    elif action in ('post_clear', 'post_remove'):
+        removed = instance.__dict__.pop('_removed_links')
+        if reverse:
+            _count_tags([instance.pk], -removed)
+        else:
+            _count_tags(removed, -1)
+    elif action == 'post_add':
+        # add() only reports the links it created.
+        if reverse:
+            _count_tags([instance.pk], _active_questions(pk_set))
+        elif instance.is_active:
+            _count_tags(pk_set, 1)
+
+@receiver(pre_delete, sender=Question)
+def uncount_deleted_question(sender, instance, **kwargs):
+    # The cascade deletes its tag links without an m2m_changed signal.
+    if Question.objects.filter(pk=instance.pk, is_active=True).exists():
+        Tag.objects.filter(questions=instance).update(question_count=F('question_count') - 1)
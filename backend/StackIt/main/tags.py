@@ -0,0 +1,155 @@
+# main/tags.py
+"""
+Tag name normalization, bulk resolution, autocomplete and tag filters.
+
+Every tag stores `normalized_name` (NFKC, case-folded, whitespace
+collapsed), which is unique: "Django", "django " and "DJANGO" are the same
+tag. Lookups go through that column's index instead of case-insensitive
+scans, and a prefix search is an index range scan,
+normalized_name >= prefix AND normalized_name < prefix + U+10FFFF.
+Django's `startswith` compiles to LIKE on SQLite, which can't use the index.
+
+Tag.question_count (active questions per tag, kept up to date by signals)
+makes popularity ordering free and tells multi-tag filters which tag is
+the rarest. Filters and related-tag lookups go through the QuestionTag
+link table and its (tag, question) index.
+"""
+import math
+import unicodedata
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Count, Exists, Func, OuterRef, Subquery
+
+from . import response_cache
+
+MAX_PREFIX_CHAR = "\U0010ffff"      # sorts after any character a prefix can continue with
+AUTOCOMPLETE_LIMIT = 10
+AUTOCOMPLETE_MAX_LIMIT = 50
+RELATED_SAMPLE_SIZE = 1000          # newest questions of a tag looked at for related tags
+WALK_ROW_COST = 3                   # cost of a scanned row with tag checks, relative to a linked id
+
+
+def normalize(name):
+    return " ".join(unicodedata.normalize("NFKC", name).casefold().split())
+
+
+def resolve(names):
+    """
+    Tags for `names` in order (duplicates after normalization dropped),
+    creating missing ones with the spelling first given. One SELECT, plus
+    one INSERT when some are new.
+    """
+    from .models import Tag
+
+    wanted = {}
+    for name in names:
+        wanted.setdefault(normalize(name), name.strip())
+
+    found = {tag.normalized_name: tag for tag in Tag.objects.filter(normalized_name__in=wanted)}
+    missing = [Tag(name=wanted[key], normalized_name=key) for key in wanted if key not in found]
+    if missing:
+        try:
+            with transaction.atomic():
+                created = Tag.objects.bulk_create(missing)
+        except IntegrityError:
+            # Created concurrently: take whatever is there now.
+            Tag.objects.bulk_create(missing, ignore_conflicts=True)
+            created = Tag.objects.filter(normalized_name__in=[tag.normalized_name for tag in missing])
+        found.update((tag.normalized_name, tag) for tag in created)
+        response_cache.invalidate("tags")       # bulk_create sends no post_save
+    return [found[key] for key in wanted]
+
+
+def autocomplete(prefix, limit=AUTOCOMPLETE_LIMIT):
+    """The `limit` most used tags whose normalized name starts with `prefix`."""
+    from .models import Tag
+
+    tags = Tag.objects.only("id", "name", "question_count")
+    key = normalize(prefix)
+    if key:
+        tags = tags.filter(normalized_name__gte=key, normalized_name__lt=key + MAX_PREFIX_CHAR)
+    return list(tags.order_by("-question_count", "normalized_name")[:limit])
+
+
+def filter_questions(queryset, tag_ids, match="all"):
+    """
+    Questions tagged with all (match="all") or any (match="any") of
+    `tag_ids`, each question once.
+
+    There are two ways to run it, and the tags' question counts pick one:
+    - drive: collect the question ids linked to the rarest tag (for "any",
+      to any tag) from the (tag, question) index, then check the other tags
+      for each candidate. Its cost grows with that tag's question count.
+    - walk: scan the list in its usual index order and check each question's
+      tags until the page is full. Its cost grows with how sparse matches
+      are: page size / expected fraction of questions that match, the
+      fraction estimated as if tags were independent.
+    """
+    from .models import Question, QuestionTag, Tag
+
+    tag_ids = list(dict.fromkeys(tag_ids))
+    if not tag_ids:
+        return queryset
+
+    # MAX as a plain function: SQLite reads it off the end of the rowid
+    # B-tree, and unlike the Max aggregate it doesn't make Django GROUP BY.
+    last_id = Question.objects.order_by().annotate(last=Func("pk", function="MAX")).values("last")
+    counts = {
+        pk: (count, total or 0)
+        for pk, count, total in Tag.objects.filter(pk__in=tag_ids)
+        .annotate(total=Subquery(last_id)).values_list("pk", "question_count", "total")
+    }
+    if match == "all" and len(counts) < len(tag_ids):
+        return queryset.none()          # an unknown tag matches nothing
+    if not counts:
+        return queryset.none()
+
+    total = max(1, next(iter(counts.values()))[1])      # max(id): a cheap stand-in for the question count
+    shares = [min(1.0, count / total) for count, _ in counts.values()]
+    if match == "all":
+        expected = total * math.prod(shares)
+        drive_rows = min(count for count, _ in counts.values())
+    else:
+        expected = total * (1 - math.prod(1 - share for share in shares))
+        drive_rows = sum(count for count, _ in counts.values())
+    walk_rows = settings.API_PAGE_SIZE * total / expected if expected >= 1 else float("inf")
+
+    def linked(**lookup):
+        return Exists(QuestionTag.objects.filter(question_id=OuterRef("pk"), **lookup))
+
+    if WALK_ROW_COST * walk_rows < drive_rows:
+        if match == "any":
+            return queryset.filter(linked(tag_id__in=tag_ids))
+        for tag_id in tag_ids:
+            queryset = queryset.filter(linked(tag_id=tag_id))
+        return queryset
+
+    if match == "any":
+        return queryset.filter(pk__in=QuestionTag.objects.filter(tag_id__in=tag_ids).values("question_id"))
+    rarest, *others = sorted(tag_ids, key=lambda tag_id: counts[tag_id][0])
+    queryset = queryset.filter(pk__in=QuestionTag.objects.filter(tag_id=rarest).values("question_id"))
+    for tag_id in others:
+        queryset = queryset.filter(linked(tag_id=tag_id))
+    return queryset
+
+
+def related(tag, limit=AUTOCOMPLETE_LIMIT):
+    """
+    Tags most often used together with `tag`, as (tag, questions in common)
+    pairs, counted over its RELATED_SAMPLE_SIZE newest questions so the cost
+    doesn't grow with the tag's popularity.
+    """
+    from .models import QuestionTag, Tag
+
+    sample = (
+        QuestionTag.objects.filter(tag=tag, question__is_active=True)
+        .order_by("-question_id").values("question_id")[:RELATED_SAMPLE_SIZE]
+    )
+    top = list(
+        QuestionTag.objects.filter(question_id__in=sample).exclude(tag=tag)
+        .values("tag_id").annotate(shared=Count("*")).order_by("-shared", "tag_id")
+        .values_list("tag_id", "shared")[:limit]
+    )
+    tags = Tag.objects.only("id", "name", "question_count").order_by().in_bulk([tag_id for tag_id, _ in top])
+    return [(tags[tag_id], shared) for tag_id, shared in top if tag_id in tags]
@@ -0,0 +1,51 @@
+# main/testing.py
+"""
+Query-budget assertions for API tests.
+
+An endpoint that issues one query per listed row (N+1) passes a test with a
+single fixture row and falls over in production. `QueryBudgetMixin` catches
+that: `assertConstantQueries` calls an endpoint, adds more rows, calls it
+again and fails unless both calls stayed within the budget and issued the
+same number of queries.
+"""
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+
+class QueryBudgetMixin:
+    def _request(self, method, url, **kwargs):
+        with CaptureQueriesContext(connection) as queries:
+            response = getattr(self.client, method)(url, **kwargs)
+        self.assertLess(response.status_code, 400, f"{method.upper()} {url} returned {response.status_code}")
+        return response, queries.captured_queries
+
+    def _format(self, queries):
+        return "\n".join(f"  {i}. {q['sql']}" for i, q in enumerate(queries, 1))
+
+    def _check_budget(self, budget, method, url, queries):
+        if len(queries) > budget:
+            self.fail(f"{method.upper()} {url} ran {len(queries)} queries, budget is {budget}:\n{self._format(queries)}")
+
+    def assertQueryBudget(self, budget, url, method="get", **kwargs):
+        """Request `url` and fail if it took more than `budget` SQL queries; returns the response."""
+        response, queries = self._request(method, url, **kwargs)
+        self._check_budget(budget, method, url, queries)
+        return response
+
+    def assertConstantQueries(self, budget, url, add_rows, method="get", **kwargs):
+        """
+        Request `url`, call `add_rows()` to grow the data it returns, request
+        it again, and fail unless both requests stayed within `budget` and ran
+        the same number of queries.
+        """
+        response, before = self._request(method, url, **kwargs)
+        self._check_budget(budget, method, url, before)
+        add_rows()
+        response, after = self._request(method, url, **kwargs)
+        self._check_budget(budget, method, url, after)
+        if len(after) != len(before):
+            self.fail(
+                f"{method.upper()} {url} went from {len(before)} to {len(after)} queries "
+                f"after adding rows:\n{self._format(after)}"
+            )
+        return response
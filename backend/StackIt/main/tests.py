@@ -1,3 +1,1071 @@
-from django.test import TestCase
+import asyncio
+import io
+import json
+import os
+import random
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import User
+from django.db import OperationalError, connection
+from django.db.models import Sum
+from django.core.management import CommandError, call_command
+from django.test import AsyncClient, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from ai.testing import AITestMixin
+from ai.utils import embeddings, index_manager
+from ai.utils.embedding_queue import get_embedding_pipeline
+from . import feeds, notifications, response_cache, search as fts, tags as tag_index
+from .models import Question, Tag, Answer, Comment, Vote, Notification
+from .testing import QueryBudgetMixin
+from .vote_buffer import VoteBuffer, set_vote_buffer
+
+
+class QueryBudgetTests(QueryBudgetMixin, TestCase):
+    """Listing and detail endpoints run a fixed number of queries, whatever the page size."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.n = 0
+        self.tags = [Tag.objects.create(name=name) for name in ("python", "django", "sql")]
+        self.question = self.add_question()
+        self.answer = self.add_answer()
+
+    def user(self):
+        self.n += 1
+        return User.objects.create(username=f"user{self.n}")
+
+    def add_question(self):
+        question = Question.objects.create(title="How do I avoid N+1?", description="...", user=self.user())
+        question.tags.set(self.tags)
+        return question
+
+    def add_answer(self):
+        return Answer.objects.create(question=self.question, user=self.user(), content="Prefetch.")
+
+    def add_comments(self, **target):
+        for _ in range(3):
+            Comment.objects.create(user=self.user(), content="Thanks", **target)
+
+    def test_question_list(self):
+        self.assertConstantQueries(2, "/api/questions/", lambda: [self.add_question() for _ in range(5)])
+
+    def test_question_list_filtered_by_tag(self):
+        # + 1 query for the tags' question counts, which choose the query plan
+        for ids in ([self.tags[0]], self.tags[:2]):
+            url = f"/api/questions/?tags__id={','.join(str(tag.id) for tag in ids)}"
+            self.assertConstantQueries(3, url, lambda: [self.add_question() for _ in range(5)])
+
+    def test_question_detail(self):
+        self.assertQueryBudget(2, f"/api/questions/{self.question.id}/")
+
+    def test_answer_list(self):
+        url = f"/api/questions/{self.question.id}/answers/"
+        self.assertConstantQueries(1, url, lambda: [self.add_answer() for _ in range(5)])
+
+    def test_answer_detail(self):
+        self.assertQueryBudget(1, f"/api/questions/{self.question.id}/answers/{self.answer.id}/")
+
+    def test_question_comments(self):
+        url = f"/api/questions/{self.question.id}/comments/"
+        self.assertConstantQueries(1, url, lambda: self.add_comments(question=self.question))
+
+    def test_answer_comments(self):
+        url = f"/api/questions/{self.question.id}/answers/{self.answer.id}/comments/"
+        self.assertConstantQueries(2, url, lambda: self.add_comments(answer=self.answer))
+
+    def test_tag_list(self):
+        self.assertConstantQueries(1, "/api/tags/", lambda: Tag.objects.create(name="faiss"))
+
+
+class KeysetPaginationTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create(username="alice")
+        now = timezone.now()
+        self.questions = []
+        for i in range(7):
+            question = Question.objects.create(title=f"Question {i}", description="...", user=self.user)
+            self.questions.append(question)
+        # Pairs of equal timestamps: the id tie-breaker must keep pages disjoint.
+        for i, question in enumerate(self.questions):
+            Question.objects.filter(pk=question.pk).update(created_at=now - timedelta(minutes=i // 2))
+
+    def walk(self, url, link="next"):
+        ids, pages = [], 0
+        while url:
+            body = self.client.get(url).json()
+            ids += [row["id"] for row in body["results"]]
+            url, pages = body[link], pages + 1
+        return ids, pages
+
+    def test_walks_questions_newest_first_without_gaps(self):
+        ids, pages = self.walk("/api/questions/?page_size=2")
+
+        expected = list(Question.objects.order_by("-created_at", "-id").values_list("id", flat=True))
+        self.assertEqual(ids, expected)
+        self.assertEqual(pages, 4)
+
+    def test_previous_links_walk_back(self):
+        url = "/api/questions/?page_size=3"
+        first = self.client.get(url).json()
+        second = self.client.get(first["next"]).json()
+        third = self.client.get(second["next"]).json()
+
+        self.assertIsNone(first["previous"])
+        self.assertIsNone(third["next"])
+        self.assertEqual(self.client.get(third["previous"]).json()["results"], second["results"])
+        back = self.client.get(second["previous"]).json()
+        self.assertEqual(back["results"], first["results"])
+        self.assertIsNone(back["previous"])
+
+    def test_answers_accepted_first(self):
+        question = self.questions[0]
+        answers = [Answer.objects.create(question=question, user=self.user, content=f"A{i}") for i in range(5)]
+        Answer.objects.filter(pk=answers[1].pk).update(is_accepted=True)
+
+        ids, _ = self.walk(f"/api/questions/{question.id}/answers/?page_size=2")
+
+        self.assertEqual(ids, [answers[1].id] + [a.id for a in reversed(answers) if a != answers[1]])
+
+    def test_comments_oldest_first(self):
+        question = self.questions[0]
+        comments = [Comment.objects.create(question=question, user=self.user, content=f"C{i}") for i in range(3)]
+
+        ids, _ = self.walk(f"/api/questions/{question.id}/comments/?page_size=2")
+
+        self.assertEqual(ids, [c.id for c in comments])
+
+    @override_settings(API_MAX_PAGE_SIZE=3)
+    def test_page_size_is_capped(self):
+        body = self.client.get("/api/questions/?page_size=1000").json()
+
+        self.assertEqual(len(body["results"]), 3)
+
+    def test_invalid_cursor(self):
+        response = self.client.get("/api/questions/?cursor=bogus")
+
+        self.assertEqual(response.status_code, 404)
+
+
+class FeedTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.users = [User.objects.create(username=f"voter{i}") for i in range(12)]
+        now = timezone.now()
+        # (age in hours, upvotes): a 6-hour-old question with 10 votes, a fresh
+        # one with 1, and a week-old one with 11.
+        self.old, self.fresh, self.stale = [
+            self.make_question(f"Question {i}", now - timedelta(hours=age), votes)
+            for i, (age, votes) in enumerate([(6, 10), (0, 1), (168, 11)])
+        ]
+
+    def make_question(self, title, created_at, votes):
+        question = Question.objects.create(title=title, description="...", user=self.users[0])
+        Question.objects.filter(pk=question.pk).update(created_at=created_at)
+        call_command("refresh_feeds", stdout=open(os.devnull, "w"))
+        for user in self.users[:votes]:
+            Vote.objects.create(user=user, question=question, vote_type=1)
+        return question
+
+    def feed(self, sort, **params):
+        response = self.client.get("/api/questions/", {"sort": sort, **params})
+        self.assertEqual(response.status_code, 200)
+        return [row["id"] for row in response.json()["results"]]
+
+    def test_hot_balances_votes_and_age(self):
+        self.assertEqual(self.feed("hot"), [self.old.id, self.fresh.id, self.stale.id])
+
+    def test_top_and_newest(self):
+        self.assertEqual(self.feed("top"), [self.stale.id, self.old.id, self.fresh.id])
+        self.assertEqual(self.feed("newest"), [self.fresh.id, self.old.id, self.stale.id])
+
+    def test_votes_and_answers_update_hot_score_incrementally(self):
+        before = Question.objects.get(pk=self.fresh.pk).hot_score
+        for user in self.users[1:10]:
+            Vote.objects.create(user=user, question=self.fresh, vote_type=1)
+        Answer.objects.create(question=self.fresh, user=self.users[0], content="First!")
+
+        self.assertGreater(Question.objects.get(pk=self.fresh.pk).hot_score, before)
+        self.assertEqual(self.feed("hot")[0], self.fresh.id)
+
+    def test_unanswered(self):
+        answer = Answer.objects.create(question=self.old, user=self.users[0], content="Answer")
+        self.assertEqual(self.feed("unanswered"), [self.fresh.id, self.stale.id])
+
+        answer.delete()
+        self.assertEqual(self.feed("unanswered"), [self.fresh.id, self.old.id, self.stale.id])
+
+    def test_hot_feed_pages(self):
+        first = self.client.get("/api/questions/", {"sort": "hot", "page_size": 2}).json()
+        second = self.client.get(first["next"]).json()
+
+        self.assertEqual([r["id"] for r in first["results"] + second["results"]], self.feed("hot"))
+
+    def test_refresh_feeds_repairs_scores(self):
+        Question.objects.update(hot_score=0)
+
+        call_command("refresh_feeds", stdout=open(os.devnull, "w"))
+
+        self.assertEqual(self.feed("hot"), [self.old.id, self.fresh.id, self.stale.id])
+
+    def test_unknown_sort(self):
+        self.assertEqual(self.client.get("/api/questions/", {"sort": "random"}).status_code, 400)
+
+
+class CounterConcurrencyTests(AITestMixin, TransactionTestCase):
+    """vote_score and num_answers stay exact under many concurrent writers."""
+    threads = 4
+
+    def setUp(self):
+        super().setUp()
+        # Committed answers and votes would start the notification and vote
+        # workers, whose writes race these tests' own threads for the test database.
+        self._prev_fanout = notifications.set_fanout(notifications.NotificationFanout(background=False))
+        self.votes = VoteBuffer(background=False)
+        self._prev_votes = set_vote_buffer(self.votes)
+        self.author = User.objects.create(username="author")
+        self.question = Question.objects.create(title="Concurrent votes", description="...", user=self.author)
+        self.answer = Answer.objects.create(question=self.question, user=self.author, content="Answer")
+
+    def tearDown(self):
+        notifications.set_fanout(self._prev_fanout)
+        set_vote_buffer(self._prev_votes)
+        super().tearDown()
+
+    @staticmethod
+    def retry(fn):
+        # SQLite allows one writer at a time. A transaction that hits the lock
+        # is rolled back whole, so running it again is safe.
+        while True:
+            try:
+                return fn()
+            except OperationalError:
+                time.sleep(0.001)
+
+    def run_in_threads(self, work, items):
+        errors = []
+
+        def worker(chunk):
+            try:
+                for item in chunk:
+                    work(item)
+            except Exception as exc:
+                errors.append(exc)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=worker, args=(items[i::self.threads],)) for i in range(self.threads)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+
+    @staticmethod
+    def flip(pk):
+        vote = Vote.objects.get(pk=pk)
+        vote.vote_type = -vote.vote_type
+        vote.save()
+
+    def cast_parallel_votes(self):
+        users = User.objects.bulk_create([User(username=f"voter{i}") for i in range(2000)])
+        rng = random.Random(0)
+        plan = [(user, rng.choice((1, -1)), rng.random()) for user in users]
+
+        def vote(step):
+            user, vote_type, roll = step
+            target = {"question_id": self.question.pk} if roll < 0.5 else {"answer_id": self.answer.pk}
+            pk = self.retry(lambda: Vote.objects.create(user=user, vote_type=vote_type, **target).pk)
+            if roll % 0.5 < 0.1:
+                self.retry(lambda: self.flip(pk))
+            elif roll % 0.5 < 0.2:
+                self.retry(lambda: Vote.objects.get(pk=pk).delete())
+
+        self.run_in_threads(vote, plan)
+        self.assertGreater(Vote.objects.count(), 1000)
+
+    def assertScoresExact(self):
+        for target, field in ((Question.objects.get(pk=self.question.pk), "question"),
+                              (Answer.objects.get(pk=self.answer.pk), "answer")):
+            expected = Vote.objects.filter(**{field: target}).aggregate(s=Sum("vote_type"))["s"] or 0
+            self.assertEqual(target.vote_score, expected)
+
+    def test_parallel_votes(self):
+        self.cast_parallel_votes()
+
+        self.assertScoresExact()
+
+    @override_settings(VOTE_WRITE_BEHIND=True)
+    def test_parallel_votes_write_behind(self):
+        self.cast_parallel_votes()
+        self.votes.flush()
+
+        self.assertScoresExact()
+
+    def test_parallel_answers(self):
+        def deactivate(pk):
+            answer = Answer.objects.get(pk=pk)
+            answer.is_active = False
+            answer.save()
+
+        def answer(i):
+            pk = self.retry(lambda: Answer.objects.create(question_id=self.question.pk, user=self.author, content=f"A{i}").pk)
+            if i % 3 == 0:
+                self.retry(lambda: deactivate(pk))
+            elif i % 3 == 1:
+                self.retry(lambda: Answer.objects.get(pk=pk).delete())
+
+        self.run_in_threads(answer, list(range(600)))
+
+        question = Question.objects.get(pk=self.question.pk)
+        self.assertEqual(question.num_answers, question.answers.filter(is_active=True).count())
+        self.assertEqual(question.num_answers, 201)
+
+    def test_editing_keeps_concurrent_votes(self):
+        stale = Question.objects.get(pk=self.question.pk)
+        Vote.objects.create(user=self.author, question=self.question, vote_type=1)
+
+        stale.title = "Concurrent votes, edited"
+        stale.save()
+
+        self.assertEqual(Question.objects.get(pk=self.question.pk).vote_score, 1)
+
+
+@override_settings(VOTE_WRITE_BEHIND=True)
+class WriteBehindVoteTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create(username="voter")
+        self.question = Question.objects.create(title="Buffered votes", description="...", user=self.user)
+        self.votes = VoteBuffer(background=False)
+        self._prev_votes = set_vote_buffer(self.votes)
+
+    def tearDown(self):
+        set_vote_buffer(self._prev_votes)
+
+    def test_reads_merge_pending_votes(self):
+        self.client.force_authenticate(self.user)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(f"/api/questions/{self.question.id}/vote/", {"vote_type": 1}, format="json")
+        self.assertEqual(response.status_code, 201)
+
+        self.assertEqual(Question.objects.get(pk=self.question.pk).vote_score, 0)
+        self.assertEqual(self.client.get(f"/api/questions/{self.question.id}/").json()["vote_score"], 1)
+
+        self.assertEqual(self.votes.flush(), 1)
+        self.assertEqual(Question.objects.get(pk=self.question.pk).vote_score, 1)
+        self.assertEqual(self.client.get(f"/api/questions/{self.question.id}/").json()["vote_score"], 1)
+
+    def test_votes_are_buffered_on_commit(self):
+        with self.captureOnCommitCallbacks(execute=False) as callbacks:
+            Vote.objects.create(user=self.user, question=self.question, vote_type=1)
+
+        self.assertEqual(self.votes.pending(Question, self.question.pk), 0)
+        for callback in callbacks:
+            callback()
+        self.assertEqual(self.votes.pending(Question, self.question.pk), 1)
+
+    def test_buffer_metrics_in_ai_stats(self):
+        self.votes.add(Question, self.question.pk, 1)
+        self.client.force_authenticate(User.objects.create(username="admin", is_staff=True))
+
+        stats = self.client.get("/api/ai/stats/").json()["vote_buffer"]
+
+        self.assertEqual((stats["added"], stats["pending_targets"]), (1, 1))
+
+    def test_recount_votes(self):
+        Vote.objects.create(user=self.user, question=self.question, vote_type=-1)   # never flushed
+        Question.objects.filter(pk=self.question.pk).update(vote_score=7)
+
+        call_command("recount_votes", stdout=open(os.devnull, "w"))
+
+        self.assertEqual(Question.objects.get(pk=self.question.pk).vote_score, -1)
+
+
+class ResponseCacheTests(TestCase):
+    def setUp(self):
+        response_cache.clear()
+        self.client = APIClient()
+        self.user = User.objects.create(username="reader")
+        self.question = Question.objects.create(title="Cached question", description="...", user=self.user)
+        self.answer = Answer.objects.create(question=self.question, user=self.user, content="Cached answer")
+        self.tag = Tag.objects.create(name="caching")
+        self.answers_url = f"/api/questions/{self.question.id}/answers/"
+
+    def get(self, url, queries=None, **headers):
+        if queries is None:
+            return self.client.get(url, headers=headers)
+        with self.assertNumQueries(queries):
+            return self.client.get(url, headers=headers)
+
+    def assertCached(self, url):
+        first = self.get(url)
+        second = self.get(url, queries=0)
+        self.assertEqual(second.json(), first.json())
+        self.assertEqual(second["ETag"], first["ETag"])
+        return second
+
+    def assertRefreshed(self, url, response):
+        fresh = self.get(url)
+        self.assertNotEqual(fresh["ETag"], response["ETag"])
+        return fresh
+
+    def test_lists_are_served_from_cache(self):
+        for url in ["/api/questions/", "/api/questions/?sort=top", self.answers_url, "/api/tags/"]:
+            self.assertCached(url)
+
+    def test_if_none_match_is_answered_without_database(self):
+        etag = self.assertCached("/api/questions/")["ETag"]
+
+        response = self.get("/api/questions/", queries=0, If_None_Match=etag)
+
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response["ETag"], etag)
+        self.assertEqual(self.get("/api/questions/", If_None_Match='"other"').status_code, 200)
+
+    def test_answers_invalidate_their_question_and_the_question_list(self):
+        questions, answers, tags = (self.assertCached(url) for url in ["/api/questions/", self.answers_url, "/api/tags/"])
+
+        Answer.objects.create(question=self.question, user=self.user, content="Another answer")
+
+        self.assertEqual(self.assertRefreshed("/api/questions/", questions).json()["results"][0]["num_answers"], 2)
+        self.assertEqual(len(self.assertRefreshed(self.answers_url, answers).json()["results"]), 2)
+        self.get("/api/tags/", queries=0)
+
+    def test_votes_and_comments_invalidate_their_question(self):
+        other = Question.objects.create(title="Another question", description="...", user=self.user)
+        other_url = f"/api/questions/{other.id}/answers/"
+        answers, other_answers = self.assertCached(self.answers_url), self.assertCached(other_url)
+
+        Vote.objects.create(user=self.user, answer=self.answer, vote_type=1)
+        answers = self.assertRefreshed(self.answers_url, answers)
+        self.assertEqual(answers.json()["results"][0]["vote_score"], 1)
+        self.get(other_url, queries=0)
+
+        Comment.objects.create(user=self.user, answer=Answer.objects.get(pk=self.answer.pk), content="Nice")
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.get(self.answers_url)["ETag"], answers["ETag"])     # same content
+        self.assertTrue(queries.captured_queries)
+        self.get(other_url, queries=0)
+
+    def test_soft_delete_and_tag_changes(self):
+        questions, tags = self.assertCached("/api/questions/"), self.assertCached("/api/tags/")
+
+        self.question.is_active = False
+        self.question.save()
+        self.assertEqual(self.assertRefreshed("/api/questions/", questions).json()["results"], [])
+
+        self.tag.name = "cache"
+        self.tag.save()
+        self.assertEqual(self.assertRefreshed("/api/tags/", tags).json()[0]["name"], "cache")
+
+    def test_authenticated_requests_bypass_the_cache(self):
+        self.assertCached("/api/questions/")
+        self.client.force_authenticate(self.user)
+
+        response = self.client.get("/api/questions/")
+
+        self.assertNotIn("ETag", response)
+
+
+class QueryPlanAuditTests(TestCase):
+    def test_hot_queries_are_index_backed(self):
+        users = [User.objects.create(username=f"user{i}") for i in range(3)]
+        tags = [Tag.objects.create(name=name) for name in ("python", "django", "sql")]
+        for i in range(30):
+            question = Question.objects.create(title=f"Question {i}", description="the details", user=users[i % 3])
+            question.tags.add(*tags[:i % 3 + 1])
+            answer = Answer.objects.create(question=question, user=users[(i + 1) % 3], content="the answer")
+            Comment.objects.create(question=question, user=users[(i + 2) % 3], content="On the question")
+            Comment.objects.create(answer=answer, user=users[i % 3], content="On the answer")
+            Notification.objects.create(user=users[0], notification_type="answer", content="...", related_question=question)
+
+        out = io.StringIO()
+        call_command("audit_query_plans", "--strict", stdout=out)
+
+        self.assertIn("queries are index-backed", out.getvalue())
+
+
+class BulkSeedTests(TestCase):
+    def seed(self, seed=7):
+        call_command(
+            "seed_data", "--bulk", "--seed", str(seed), "--users", "20", "--questions", "60", "--tags", "8",
+            "--batch-size", "25", stdout=io.StringIO(),
+        )
+
+    def snapshot(self):
+        return (
+            list(Question.objects.order_by("created_at").values_list("title", "num_answers", "vote_score", "hot_score")),
+            list(Tag.objects.order_by("name").values_list("name", "question_count")),
+            Comment.objects.count(),
+        )
+
+    def test_counters_are_exact(self):
+        self.seed()
+
+        self.assertEqual(Question.objects.count(), 60)
+        for question in Question.objects.all():
+            self.assertEqual(question.num_answers, question.answers.filter(is_active=True).count())
+            self.assertEqual(question.vote_score, question.votes.aggregate(total=Sum("vote_type"))["total"] or 0)
+            self.assertAlmostEqual(
+                question.hot_score, feeds.hot_score(question.vote_score, question.num_answers, question.created_at)
+            )
+        for answer in Answer.objects.all():
+            self.assertEqual(answer.vote_score, answer.votes.aggregate(total=Sum("vote_type"))["total"] or 0)
+        for tag in Tag.objects.all():
+            self.assertEqual(tag.question_count, tag.questions.filter(is_active=True).count())
+
+    def test_same_seed_same_data(self):
+        self.seed()
+        first = self.snapshot()
+        Question.objects.all().delete()
+        User.objects.all().delete()
+        Tag.objects.all().delete()
+
+        self.seed()
+
+        self.assertEqual(self.snapshot(), first)
+
+    def test_seed_is_loaded_once(self):
+        self.seed()
+        with self.assertRaises(CommandError):
+            self.seed()
+
+
+class BenchApiTests(TestCase):
+    def setUp(self):
+        user = User.objects.create(username="asker")
+        for i in range(3):
+            question = Question.objects.create(title=f"Question {i}", description="Details", user=user)
+            Answer.objects.create(question=question, user=user, content=f"Answer {i}")
+
+    def test_runs_every_endpoint_and_compares_with_baseline(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = f"{tmp}/baseline.json"
+            call_command("bench_api", "--requests", "3", "--warmup", "1", "--save-baseline", path, stdout=io.StringIO())
+            with open(path) as f:
+                baseline = json.load(f)
+            self.assertEqual(Question.objects.count(), 3)       # everything was rolled back
+            self.assertIn("ai.chat", baseline["endpoints"])
+            self.assertEqual(baseline["endpoints"]["questions.detail"]["queries"], 2)
+
+            baseline["endpoints"]["questions.detail"]["queries"] = 1
+            with open(path, "w") as f:
+                json.dump(baseline, f)
+            with self.assertRaisesMessage(CommandError, "questions.detail"):
+                call_command(
+                    "bench_api", "--requests", "3", "--only", "questions.detail,comments.list",
+                    "--baseline", path, "--strict", stdout=io.StringIO(),
+                )
+
+
+class TagTests(TestCase):
+    def setUp(self):
+        response_cache.clear()
+        self.client = APIClient()
+        self.user = User.objects.create(username="tagger")
+        self.client.force_authenticate(self.user)
+        self.python = Tag.objects.create(name="Python")
+
+    def post_question(self, tag_names):
+        response = self.client.post(
+            "/api/questions/", {"title": "Tagged question", "description": "...", "tag_names": tag_names}, format="json",
+        )
+        self.assertEqual(response.status_code, 201, response.content)
+        return response.json()
+
+    def test_tag_names_resolve_case_insensitively_in_bulk(self):
+        question = self.post_question(["python", " PYTHON ", "Machine  Learning", "machine learning"])
+
+        self.assertEqual([t["name"] for t in question["tags"]], ["Machine  Learning", "Python"])
+        self.assertEqual(Tag.objects.get(name="Machine  Learning").normalized_name, "machine learning")
+        self.assertEqual(Tag.objects.count(), 2)
+
+    def test_question_creation_queries_do_not_grow_with_tags(self):
+        counts = []
+        for names in (["one"], [f"tag{i}" for i in range(8)]):
+            with CaptureQueriesContext(connection) as queries:
+                self.post_question(names)
+            counts.append(len(queries))
+        self.assertEqual(counts[0], counts[1])
+
+    def test_question_counts_follow_links(self):
+        django = Tag.objects.create(name="Django")
+        question = Question.objects.create(title="Counted question", description="...", user=self.user)
+        count = lambda tag: Tag.objects.get(pk=tag.pk).question_count
+
+        question.tags.add(self.python, django)
+        self.assertEqual((count(self.python), count(django)), (1, 1))
+        question.tags.remove(django)
+        self.assertEqual(count(django), 0)
+        django.questions.add(question, Question.objects.create(title="Another one", description="...", user=self.user))
+        self.assertEqual(count(django), 2)
+        django.questions.clear()
+        question.tags.clear()
+        self.assertEqual((count(self.python), count(django)), (0, 0))
+
+    def test_removing_unlinked_tags_keeps_counts(self):
+        django = Tag.objects.create(name="Django")
+        linked = Question.objects.create(title="Linked question", description="...", user=self.user)
+        unlinked = Question.objects.create(title="Unlinked question", description="...", user=self.user)
+        linked.tags.add(self.python)
+        count = lambda tag: Tag.objects.get(pk=tag.pk).question_count
+
+        linked.tags.remove(django)                      # a tag the question doesn't have
+        self.python.questions.remove(unlinked)          # a question the tag isn't on
+        unlinked.tags.remove(self.python, django)
+        self.assertEqual((count(self.python), count(django)), (1, 0))
+
+        linked.tags.remove(self.python, django)
+        self.assertEqual(count(self.python), 0)
+
+    def test_autocomplete(self):
+        for name, uses in [("pytest", 1), ("pandas", 3), ("PyTorch", 2)]:
+            tag = Tag.objects.create(name=name)
+            Tag.objects.filter(pk=tag.pk).update(question_count=uses)
+
+        def names(**params):
+            response = self.client.get("/api/tags/autocomplete/", params)
+            self.assertEqual(response.status_code, 200)
+            return [t["name"] for t in response.json()]
+
+        self.assertEqual(names(q="PY"), ["PyTorch", "pytest", "Python"])
+        self.assertEqual(names(q="pyt", limit=2), ["PyTorch", "pytest"])
+        self.assertEqual(names(), ["pandas", "PyTorch", "pytest", "Python"])
+        self.assertEqual(names(q="rust"), [])
+
+    def test_duplicate_names_are_rejected(self):
+        self.assertEqual(self.client.post("/api/tags/", {"name": "PYTHON"}).status_code, 400)
+
+
+class TagFilterTests(TestCase):
+    def setUp(self):
+        response_cache.clear()
+        self.client = APIClient()
+        self.user = User.objects.create(username="filterer")
+        self.python, self.django, self.sql = (Tag.objects.create(name=name) for name in ("python", "django", "sql"))
+        self.both = self.question("Python and Django", self.python, self.django)
+        self.py = self.question("Only Python", self.python)
+        self.db = self.question("Django and SQL", self.django, self.sql)
+
+    def question(self, title, *tags):
+        question = Question.objects.create(title=title, description="...", user=self.user)
+        question.tags.add(*tags)
+        return question
+
+    def ids(self, tags, match=None):
+        params = {"tags__id": ",".join(str(tag.id) for tag in tags)}
+        if match:
+            params["tags_match"] = match
+        response = self.client.get("/api/questions/", params)
+        self.assertEqual(response.status_code, 200, response.content)
+        return sorted(row["id"] for row in response.json()["results"])
+
+    def counts(self):
+        return [Tag.objects.get(pk=tag.pk).question_count for tag in (self.python, self.django, self.sql)]
+
+    def test_all_and_any(self):
+        self.assertEqual(self.ids([self.python, self.django]), [self.both.id])
+        self.assertEqual(self.ids([self.python, self.sql], "any"), [self.both.id, self.py.id, self.db.id])
+        self.assertEqual(self.ids([self.django]), [self.both.id, self.db.id])
+
+    def test_both_query_plans_agree(self):
+        for cost in (0, 10 ** 9):               # always walk the list / always drive from the rarest tag
+            with mock.patch.object(tag_index, "WALK_ROW_COST", cost):
+                self.assertEqual(self.ids([self.django, self.python]), [self.both.id])
+                self.assertEqual(self.ids([self.django, self.sql], "any"), [self.both.id, self.db.id])
+
+    def test_unknown_and_invalid_tags(self):
+        self.assertEqual(self.ids([self.python, Tag(id=999)]), [])
+        self.assertEqual(self.ids([self.python, Tag(id=999)], "any"), [self.both.id, self.py.id])
+        self.assertEqual(self.client.get("/api/questions/", {"tags__id": "x"}).status_code, 400)
+        self.assertEqual(self.client.get("/api/questions/", {"tags_match": "some"}).status_code, 400)
+
+    def test_counts_only_include_active_questions(self):
+        self.assertEqual(self.counts(), [2, 2, 1])
+
+        self.db.is_active = False
+        self.db.save()
+        self.assertEqual(self.counts(), [2, 1, 0])
+        self.db.tags.add(self.python)
+        self.sql.questions.add(self.py)
+        self.assertEqual(self.counts(), [2, 1, 1])
+
+        self.db.is_active = True
+        self.db.save()
+        self.assertEqual(self.counts(), [3, 2, 2])
+
+        self.both.delete()
+        self.assertEqual(self.counts(), [2, 1, 2])
+
+    def test_recount_tags(self):
+        Tag.objects.update(question_count=50)
+
+        call_command("recount_tags", stdout=open(os.devnull, "w"))
+
+        self.assertEqual(self.counts(), [2, 2, 1])
+
+    def test_related_tags(self):
+        self.question("More Django", self.django, self.python)
+
+        response = self.client.get(f"/api/tags/{self.django.id}/related/")
+
+        self.assertEqual(
+            [(tag["name"], tag["question_count"], tag["shared_questions"]) for tag in response.json()],
+            [("python", 3, 2), ("sql", 1, 1)],
+        )
+
+
+class SearchTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create(username="searcher")
+        self.question = Question.objects.create(
+            title="Migrating a Django project", description="Which <b>database</b> should I pick?", user=self.user,
+        )
+        self.other = Question.objects.create(
+            title="Frontend build errors", description="Vite fails after migrating to Django templates", user=self.user,
+        )
+        self.answer = Answer.objects.create(question=self.question, user=self.user, content="Use PostgreSQL in production.")
+
+    def search(self, q, **params):
+        response = self.client.get("/api/search/", {"q": q, **params})
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_title_matches_rank_first_and_are_highlighted(self):
+        results = self.search("django")["results"]
+
+        self.assertEqual([r["question_id"] for r in results], [self.question.id, self.other.id])
+        self.assertEqual(results[0]["title"], "Migrating a <mark>Django</mark> project")
+        self.assertIn("<mark>Django</mark> templates", results[1]["snippet"])
+
+    def test_snippets_are_html_escaped(self):
+        result = self.search("database")["results"][0]
+
+        self.assertEqual(result["snippet"], "Which &lt;b&gt;<mark>database</mark>&lt;/b&gt; should I pick?")
+
+    def test_stemming_and_prefix(self):
+        self.assertEqual(len(self.search("migrate")["results"]), 2)
+        self.assertEqual(self.search("postgre")["results"][0]["answer_id"], self.answer.id)
+
+    def test_index_follows_writes(self):
+        self.answer.content = "Use SQLite while prototyping."
+        self.answer.save()
+        self.assertEqual(self.search("postgresql")["results"], [])
+        self.assertEqual(self.search("sqlite")["results"][0]["answer_id"], self.answer.id)
+
+        self.answer.is_active = False
+        self.answer.save()
+        self.assertEqual(self.search("sqlite")["results"], [])
+
+        self.other.delete()
+        self.assertEqual(len(self.search("django")["results"]), 1)
+
+    def test_query_syntax_is_not_interpreted(self):
+        self.assertEqual(self.search('django" OR (NEAR')["results"], [])
+        self.assertEqual(self.client.get("/api/search/", {"q": "  "}).status_code, 400)
+
+    def test_pagination(self):
+        first = self.search("django", page_size=1)
+        second = self.client.get(first["next"]).json()
+
+        self.assertEqual(first["results"][0]["question_id"], self.question.id)
+        self.assertEqual(second["results"][0]["question_id"], self.other.id)
+        self.assertIsNone(second["next"])
+        self.assertIsNotNone(second["previous"])
+
+    def test_rebuild_command(self):
+        with connection.cursor() as cursor:
+            cursor.execute("DELETE FROM main_search_fts")
+
+        call_command("rebuild_search_index", stdout=open(os.devnull, "w"))
+
+        self.assertEqual(len(self.search("django")["results"]), 2)
+
+    def test_max_candidates_ranks_newest_matches_only(self):
+        hits = fts.search("django", max_candidates=1)
+
+        self.assertEqual([h["question_id"] for h in hits], [self.other.id])
+
+
+class HybridSearchTests(AITestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        self.user = User.objects.create(username="hybrid")
+        self.question = Question.objects.create(title="Choosing a database", description="SQL or NoSQL?", user=self.user)
+        self.exact = Answer.objects.create(question=self.question, user=self.user, content="Pick PostgreSQL")
+        self.related = Answer.objects.create(question=self.question, user=self.user, content="Relational stores suit most apps")
+        self.index_answer(self.exact)
+
+    def embed_as(self, answer, text):
+        """Index `answer` under the embedding of `text`, i.e. as a close semantic match for it."""
+        vector = embeddings.encode([text])[0]
+        index_manager.get_index_manager().upsert(answer.id, vector, answer.content, self.question.title)
+
+    def search(self, q, **params):
+        response = self.client.get("/api/search/", {"q": q, "mode": "hybrid", **params})
+        self.assertEqual(response.status_code, 200)
+        return response.json()["results"]
+
+    def test_results_found_both_ways_rank_first(self):
+        self.related.content = "PostgreSQL, SQLite and MySQL all work fine for PostgreSQL-style apps"
+        self.related.save()
+        self.embed_as(self.exact, "postgresql")
+
+        results = self.search("postgresql")
+
+        self.assertEqual([r["answer_id"] for r in results], [self.exact.id, self.related.id])
+        self.assertEqual([r["matched"] for r in results], [["keyword", "semantic"], ["keyword"]])
+        self.assertGreater(results[0]["score"], results[1]["score"])
+
+    def test_semantic_only_matches(self):
+        self.embed_as(self.related, "what should store my rows")
+
+        results = self.search("what should store my rows")
+
+        self.assertEqual([(r["answer_id"], r["matched"]) for r in results], [(self.related.id, ["semantic"])])
+        self.assertEqual(results[0]["title"], "Choosing a database")
+        self.assertEqual(results[0]["snippet"], "Relational stores suit most apps")
+
+    def test_inactive_answers_are_skipped(self):
+        self.embed_as(self.related, "what should store my rows")
+        self.related.is_active = False
+        self.related.save()
+
+        self.assertEqual(self.search("what should store my rows"), [])
+
+    def test_keyword_mode_is_default(self):
+        results = self.client.get("/api/search/", {"q": "Pick PostgreSQL"}).json()["results"]
+
+        self.assertNotIn("matched", results[0])
+        self.assertEqual(self.client.get("/api/search/", {"q": "x", "mode": "llm"}).status_code, 400)
+
+
+class NotificationTests(AITestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        response_cache.clear()
+        self.fanout = notifications.NotificationFanout(background=False)
+        self._prev_fanout = notifications.set_fanout(self.fanout)
+        self.client = APIClient()
+        self.asker = User.objects.create(username="asker")
+        self.author = User.objects.create(username="author")
+        self.bob = User.objects.create(username="bob")
+        self.question = Question.objects.create(title="Fan-out", description="...", user=self.asker)
+
+    def tearDown(self):
+        notifications.set_fanout(self._prev_fanout)
+        super().tearDown()
+
+    def post_answer(self, user, content="An answer"):
+        self.client.force_authenticate(user)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(f"/api/questions/{self.question.id}/answers/", {"content": content}, format="json")
+        self.assertEqual(response.status_code, 201)
+        get_embedding_pipeline().flush()
+        return response.json()["id"]
+
+    def inbox(self, user):
+        return list(Notification.objects.filter(user=user).values_list("notification_type", "content"))
+
+    def test_answer_post_does_not_wait_for_watchers(self):
+        quiet = Question.objects.create(title="Quiet", description="...", user=self.asker)
+        watchers = User.objects.bulk_create([User(username=f"watcher{i}") for i in range(300)])
+        Comment.objects.bulk_create([Comment(question=self.question, user=user, content="+1") for user in watchers])
+
+        self.client.force_authenticate(self.author)
+        timings = []
+        for question in (quiet, self.question):
+            with CaptureQueriesContext(connection) as queries, self.captureOnCommitCallbacks(execute=True):
+                self.client.post(f"/api/questions/{question.id}/answers/", {"content": "Hi"}, format="json")
+            timings.append(len(queries.captured_queries))
+        self.assertEqual(timings[0], timings[1])
+        self.assertFalse(Notification.objects.exists())
+
+        with override_settings(NOTIFICATION_BULK_SIZE=500), CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.fanout.flush(), 302)      # the asker twice, 300 watchers once
+        self.assertLess(len(queries.captured_queries), 15)
+        self.assertEqual(self.inbox(watchers[0]), [("answer", 'author answered "Fan-out"')])
+        self.assertEqual(self.inbox(self.author), [])
+
+    def test_mentions_and_comment_recipients(self):
+        answer_id = self.post_answer(self.author)
+        self.fanout.flush()
+        Notification.objects.all().delete()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Comment.objects.create(answer_id=answer_id, user=self.asker, content="<p>Thanks, cc @bob.</p>")
+        self.fanout.flush()
+
+        self.assertEqual(self.inbox(self.author), [("comment", 'asker commented on "Fan-out"')])
+        self.assertEqual(self.inbox(self.bob), [("mention", 'asker mentioned you in "Fan-out"')])
+        self.assertEqual(self.inbox(self.asker), [])
+        self.assertEqual(notifications.mentioned_usernames("a@b.com @x_y, @z."), {"x_y", "z"})
+
+    def test_comment_via_api_notifies(self):
+        answer_id = self.post_answer(self.author)
+        self.fanout.flush()
+        Notification.objects.all().delete()
+
+        self.client.force_authenticate(self.asker)
+        url = f"/api/questions/{self.question.id}/answers/{answer_id}/comments/"
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(url, {"content": "Thanks, cc @bob."}, format="json")
+        self.assertEqual(response.status_code, 201)
+        self.fanout.flush()
+
+        comment = Comment.objects.get(pk=response.json()["id"])
+        self.assertEqual((comment.answer_id, comment.question_id, comment.user), (answer_id, None, self.asker))
+        self.assertEqual(self.inbox(self.author), [("comment", 'asker commented on "Fan-out"')])
+        self.assertEqual(self.inbox(self.bob), [("mention", 'asker mentioned you in "Fan-out"')])
+
+    def test_bursts_are_deduplicated_until_read(self):
+        self.post_answer(self.author)
+        self.post_answer(self.bob)
+        self.fanout.flush()
+        self.assertEqual(len(self.inbox(self.asker)), 1)
+        self.assertEqual(self.fanout.metrics()["deduplicated"], 1)
+
+        notifications.mark_read(self.asker.id)
+        self.post_answer(self.author, "One more")
+        self.fanout.flush()
+        self.assertEqual(len(self.inbox(self.asker)), 2)
+
+    def test_unread_count_is_cached_and_mark_read(self):
+        self.post_answer(self.author)
+        self.post_answer(self.bob)
+        self.fanout.flush()
+        self.client.force_authenticate(self.author)
+
+        self.assertEqual(self.client.get("/api/notifications/unread_count/").json(), {"unread": 1})
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get("/api/notifications/unread_count/").json(), {"unread": 1})
+
+        listed = self.client.get("/api/notifications/?unread=1").json()["results"]
+        response = self.client.post("/api/notifications/mark_read/", {"ids": [listed[0]["id"]]}, format="json")
+        self.assertEqual(response.json(), {"updated": 1, "unread": 0})
+        self.assertEqual(self.client.get("/api/notifications/?unread=1").json()["results"], [])
+        self.client.force_authenticate(User.objects.create(username="carol"))
+        self.assertEqual(self.client.get("/api/notifications/").json()["results"], [])
+
+    def auth(self, user):
+        return {"Authorization": f"Bearer {RefreshToken.for_user(user).access_token}"}
+
+    async def test_long_poll(self):
+        client, auth = AsyncClient(), self.auth(self.asker)
+        response = await client.get("/api/notifications/poll/", {"timeout": 0}, headers=auth)
+        self.assertEqual(response.json(), {"results": [], "last_id": 0, "unread": 0})
+        self.assertEqual((await client.get("/api/notifications/poll/")).status_code, 401)
+        self.assertEqual((await client.get("/api/notifications/poll/", {"after": "x"}, headers=auth)).status_code, 400)
+
+        await sync_to_async(self.post_answer)(self.author)
+        await sync_to_async(self.fanout.flush)()
+        response = (await client.get("/api/notifications/poll/", {"after": 0, "timeout": 0}, headers=auth)).json()
+        self.assertEqual([n["notification_type"] for n in response["results"]], ["answer"])
+        self.assertEqual(response["unread"], 1)
+
+    async def test_doorbell_wakes_waiters(self):
+        bell = notifications.Doorbell()
+        with bell.listening(self.asker.id) as rung:
+            threading.Timer(0.05, bell.ring, [[self.bob.id, self.asker.id]]).start()
+            started = time.monotonic()
+            self.assertTrue(await bell.wait(rung, timeout=10))
+            self.assertLess(time.monotonic() - started, 5)
+            rung.clear()
+            self.assertFalse(await bell.wait(rung, timeout=0.01))
+
+    async def test_stream(self):
+        await sync_to_async(self.post_answer)(self.author)
+        await sync_to_async(self.fanout.flush)()
+        response = await AsyncClient().get(
+            "/api/notifications/stream/", headers={**self.auth(self.asker), "Last-Event-ID": "0"},
+        )
+        first = (await anext(aiter(response.streaming_content))).decode()
+        response.close()
+
+        notification = await Notification.objects.aget(user=self.asker)
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+        self.assertTrue(first.startswith(f"id: {notification.id}\nevent: notification\n"))
+
+    @override_settings(NOTIFICATION_STREAM_SECONDS=30, NOTIFICATION_KEEPALIVE=30, NOTIFICATION_POLL_INTERVAL=30)
+    async def test_stream_pushes_events_while_open(self):
+        response = await AsyncClient().get("/api/notifications/stream/", headers=self.auth(self.asker))
+        events = aiter(response.streaming_content)
+        started = time.monotonic()
+        waiting = asyncio.ensure_future(anext(events))
+        await asyncio.sleep(0.2)
+        self.assertFalse(waiting.done())
+
+        # Only the doorbell can wake the stream before its 30s timers.
+        await sync_to_async(self.post_answer)(self.author)
+        await sync_to_async(self.fanout.flush)()
+        event = (await asyncio.wait_for(waiting, timeout=10)).decode()
+        unread = (await asyncio.wait_for(anext(events), timeout=10)).decode()
+        response.close()
+
+        self.assertLess(time.monotonic() - started, 10)
+        self.assertIn("event: notification\n", event)
+        self.assertEqual(unread, 'event: unread\ndata: {"unread": 1}\n\n')
+
+
+class InstrumentationTests(AITestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        user = User.objects.create(username="timed")
+        question = Question.objects.create(title="Timing requests", description="Where does the time go?", user=user)
+        self.index_answer(Answer.objects.create(question=question, user=user, content="Measure it"))
+
+    def timing(self, response):
+        return dict(entry.split(";", 1) for entry in response["Server-Timing"].split(", "))
+
+    def test_server_timing_counts_queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get("/api/questions/")
+
+        timing = self.timing(response)
+        self.assertEqual(set(timing), {"sql", "total"})
+        self.assertIn(f'desc="{len(queries)} queries"', timing["sql"])
+
+    def test_ai_phases_are_timed(self):
+        response = self.client.post("/api/ai/chat/", {"question": "Where does the time go?"}, format="json")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertLessEqual({"sql", "embedding", "vector", "llm", "total"}, set(self.timing(response)))
+
+    def test_metrics_endpoint(self):
+        self.client.get("/api/questions/")
+        self.client.post("/api/ai/chat/", {"question": "Where does the time go?"}, format="json")
+
+        with override_settings(METRICS_TOKEN="secret"):
+            body = self.client.get("/metrics", HTTP_AUTHORIZATION="Bearer secret").content.decode()
+            self.assertEqual(self.client.get("/metrics").status_code, 403)
+            self.assertEqual(self.client.get("/metrics", HTTP_AUTHORIZATION="Bearer wrong").status_code, 403)
+
+        self.assertIn('stackit_http_requests_total{view="question-list",method="GET",status="200"}', body)
+        self.assertIn('stackit_http_request_duration_seconds_bucket{view="question-list",method="GET",le="+Inf"}', body)
+        self.assertIn('stackit_http_request_phase_seconds_count{view="ai.views.rag_chatbot",phase="llm"}', body)
+
+    def test_metrics_disabled_without_token(self):
+        with override_settings(METRICS_TOKEN=None):
+            self.assertEqual(self.client.get("/metrics").status_code, 403)
+            self.assertEqual(self.client.get("/metrics", HTTP_AUTHORIZATION="Bearer ").status_code, 403)
+
+    @override_settings(METRICS_SLOW_REQUEST_SECONDS=0)
+    def test_slow_requests_are_logged(self):
+        with self.assertLogs("stackit.slow_requests", "WARNING") as logs:
+            self.client.get("/api/questions/")
+
+        self.assertIn("Slow request: GET /api/questions/ -> 200", logs.output[0])
+        self.assertIn("SELECT", logs.output[0])
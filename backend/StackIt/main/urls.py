@@ -1,14 +1,19 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import QuestionViewSet, TagViewSet, AnswerViewSet, CommentViewSet
+from .views import QuestionViewSet, TagViewSet, AnswerViewSet, CommentViewSet, NotificationViewSet, search
+from .async_views import poll as notification_poll, stream as notification_stream
 
 router = DefaultRouter()
 router.register(r'questions', QuestionViewSet, basename='question')
 router.register(r'tags', TagViewSet, basename='tag')
+router.register(r'notifications', NotificationViewSet, basename='notification')
 router.register(r'questions/(?P<question_id>\d+)/answers', AnswerViewSet, basename='answer')
 router.register(r'questions/(?P<question_id>\d+)/comments', CommentViewSet, basename='question-comment')
 router.register(r'questions/(?P<question_id>\d+)/answers/(?P<answer_id>\d+)/comments', CommentViewSet, basename='answer-comment')
 
 urlpatterns = [
+    path('search/', search, name='search'),
+    path('notifications/poll/', notification_poll, name='notification-poll'),
+    path('notifications/stream/', notification_stream, name='notification-stream'),
     path('', include(router.urls)),
 ]
\ No newline at end of file
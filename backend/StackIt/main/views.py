@@ -1,11 +1,23 @@
+from django.conf import settings
 from rest_framework import viewsets, permissions
-from rest_framework.decorators import action
+from rest_framework.decorators import action, api_view, permission_classes
 from rest_framework.response import Response
 from django_filters.rest_framework import DjangoFilterBackend
 from .models import Question, Tag, Answer, Comment, Vote, Notification
-from .serializers import QuestionSerializer, TagSerializer, AnswerSerializer, VoteSerializer, CommentSerializer
+from .serializers import (
+    QuestionSerializer, TagSerializer, TagUsageSerializer, AnswerSerializer, VoteSerializer, CommentSerializer,
+    NotificationSerializer, MarkReadSerializer,
+)
+from .filters import QuestionFilter
+from .pagination import (
+    QuestionPagination, HotQuestionPagination, TopQuestionPagination, AnswerPagination, CommentPagination,
+    NotificationPagination,
+)
+from . import notifications as inbox, search as fts, tags as tag_index
+from .response_cache import CachedListMixin
 from django.db.models import Q
-from rest_framework.exceptions import NotFound
+from rest_framework.exceptions import NotFound, PermissionDenied, ValidationError
+from rest_framework.utils.urls import replace_query_param
 
 class IsAdminOrReadOnly(permissions.BasePermission):
     def has_permission(self, request, view):
@@ -19,20 +31,76 @@ class IsOwnerOrAdminOrReadOnly(permissions.BasePermission):
             return True
         return request.user.is_authenticated and (request.user == obj.user or request.user.is_staff)
 
-class TagViewSet(viewsets.ModelViewSet):
+class TagViewSet(CachedListMixin, viewsets.ModelViewSet):
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
 
+    def cache_scopes(self):
+        return ["tags"]
+
+    @action(detail=False, permission_classes=[permissions.AllowAny])
+    def autocomplete(self, request):
+        """Most used tags starting with ?q= (case-insensitive), at most ?limit= of them."""
+        try:
+            limit = int(request.query_params.get('limit', tag_index.AUTOCOMPLETE_LIMIT))
+        except ValueError:
+            return Response({'error': 'limit must be an integer'}, status=400)
+        limit = min(max(1, limit), tag_index.AUTOCOMPLETE_MAX_LIMIT)
+        tags = tag_index.autocomplete(request.query_params.get('q', ''), limit)
+        return Response(TagUsageSerializer(tags, many=True).data)
+
+    @action(detail=True, permission_classes=[permissions.AllowAny])
+    def related(self, request, pk=None):
+        """Tags most often used together with this one, with the number of questions they share."""
+        tag = self.get_object()
+        return Response([
+            {**TagUsageSerializer(other).data, 'shared_questions': shared}
+            for other, shared in tag_index.related(tag)
+        ])
+
     def perform_create(self, serializer):
         serializer.save()
 
-class QuestionViewSet(viewsets.ModelViewSet):
-    queryset = Question.objects.filter(is_active=True)
+class QuestionViewSet(CachedListMixin, viewsets.ModelViewSet):
+    # Author and tags are loaded with the page (one JOIN + one prefetch query)
+    # rather than once per serialized question.
+    queryset = Question.objects.filter(is_active=True).select_related('user').prefetch_related('tags')
     serializer_class = QuestionSerializer
     permission_classes = [IsOwnerOrAdminOrReadOnly]
+    pagination_class = QuestionPagination
     filter_backends = [DjangoFilterBackend]
-    filterset_fields = ['tags__id']
+    filterset_class = QuestionFilter
+
+    # ?sort= feeds, each paginated along a precomputed, indexed ordering
+    # (see main/feeds.py).
+    feed_paginations = {
+        'newest': QuestionPagination,
+        'hot': HotQuestionPagination,
+        'top': TopQuestionPagination,
+        'unanswered': QuestionPagination,
+    }
+
+    def cache_scopes(self):
+        return ["questions"]
+
+    def get_feed(self):
+        sort = self.request.query_params.get('sort', 'newest')
+        if sort not in self.feed_paginations:
+            raise ValidationError({'sort': f"Must be one of: {', '.join(self.feed_paginations)}."})
+        return sort
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action == 'list' and self.get_feed() == 'unanswered':
+            queryset = queryset.filter(num_answers=0)
+        return queryset
+
+    @property
+    def paginator(self):
+        if not hasattr(self, '_paginator'):
+            self._paginator = self.feed_paginations[self.get_feed()]()
+        return self._paginator
 
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
@@ -75,13 +143,17 @@ class QuestionViewSet(viewsets.ModelViewSet):
             except Vote.DoesNotExist:
                 raise PermissionDenied("You have not voted on this question.")
 
-class AnswerViewSet(viewsets.ModelViewSet):
+class AnswerViewSet(CachedListMixin, viewsets.ModelViewSet):
     serializer_class = AnswerSerializer
     permission_classes = [IsOwnerOrAdminOrReadOnly]
+    pagination_class = AnswerPagination
+
+    def cache_scopes(self):
+        return [f"question:{self.kwargs['question_id']}"]
 
     def get_queryset(self):
         question_id = self.kwargs['question_id']
-        return Answer.objects.filter(question_id=question_id, is_active=True)
+        return Answer.objects.filter(question_id=question_id, is_active=True).select_related('user')
 
     def perform_create(self, serializer):
         try:
@@ -98,11 +170,9 @@ class AnswerViewSet(viewsets.ModelViewSet):
         serializer.save(question=question)
     
     def perform_destroy(self, obj):
+        # Answer.save() takes the answer off the question's num_answers
         obj.is_active = False
         obj.save()
-        # Recalculate the number of answers for the question
-        obj.question.num_answers = obj.question.answers.filter(is_active=True).count()
-        obj.question.save()
 
     @action(detail=True, methods=['post', 'delete'], permission_classes=[permissions.IsAuthenticated])
     def vote(self, request, pk=None, question_id=None):
@@ -139,6 +209,7 @@ class AnswerViewSet(viewsets.ModelViewSet):
 class CommentViewSet(viewsets.ModelViewSet):
     serializer_class = CommentSerializer
     permission_classes = [IsOwnerOrAdminOrReadOnly]
+    pagination_class = CommentPagination
 
     def get_queryset(self):
         question_id = self.kwargs.get('question_id')
@@ -148,11 +219,18 @@ class CommentViewSet(viewsets.ModelViewSet):
                 answer = Answer.objects.get(id=answer_id, question_id=question_id, is_active=True)
             except Answer.DoesNotExist:
                 raise NotFound("Answer does not exist or is not active for this question.")
-            return Comment.objects.filter(answer_id=answer_id, is_active=True)
+            return Comment.objects.filter(answer_id=answer_id, is_active=True).select_related('user')
         elif question_id:
-            return Comment.objects.filter(question_id=question_id, is_active=True)
+            return Comment.objects.filter(question_id=question_id, is_active=True).select_related('user')
         raise NotFound("Must specify either question_id or both question_id and answer_id.")
 
+    def get_serializer_context(self):
+        # CommentSerializer validates and creates against these.
+        context = super().get_serializer_context()
+        context['question_id'] = self.kwargs.get('question_id')
+        context['answer_id'] = self.kwargs.get('answer_id')
+        return context
+
     def perform_create(self, serializer):
         question_id = self.kwargs.get('question_id')
         answer_id = self.kwargs.get('answer_id')
@@ -163,11 +241,75 @@ class CommentViewSet(viewsets.ModelViewSet):
                 raise NotFound("Answer does not exist or is not active for this question.")
         elif not question_id:
             raise NotFound("Must specify either question_id or both question_id and answer_id.")
-        serializer.save(user=self.request.user, question_id=question_id, answer_id=answer_id)
+        serializer.save()
 
     def perform_update(self, serializer):
         serializer.save()
 
     def perform_destroy(self, obj):
         obj.is_active = False
-        obj.save()
\ No newline at end of file
+        obj.save()
+
+
+class NotificationViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    The current user's notifications, newest first (?unread=1 for unread
+    only), plus unread count and bulk mark-read. Long-poll and SSE delivery
+    are async views in main/async_views.py. Notifications are written by the
+    fan-out in main/notifications.py.
+    """
+    serializer_class = NotificationSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    pagination_class = NotificationPagination
+
+    def get_queryset(self):
+        notifications = Notification.objects.filter(user=self.request.user)
+        if self.request.query_params.get('unread') in ('1', 'true'):
+            notifications = notifications.filter(is_read=False)
+        return notifications
+
+    @action(detail=False)
+    def unread_count(self, request):
+        return Response({'unread': inbox.unread_count(request.user.id)})
+
+    @action(detail=False, methods=['post'])
+    def mark_read(self, request):
+        serializer = MarkReadSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        updated = inbox.mark_read(request.user.id, serializer.validated_data.get('ids'))
+        return Response({'updated': updated, 'unread': inbox.unread_count(request.user.id)})
+
+
+
+@api_view(['GET'])
+@permission_classes([permissions.AllowAny])
+def search(request):
+    """Keyword or hybrid search over questions and answers (?q=, ?mode=, ?page=, ?page_size=)."""
+    query = request.query_params.get('q', '').strip()
+    if not query:
+        return Response({'error': 'No search query provided'}, status=400)
+    mode = request.query_params.get('mode', 'keyword')
+    if mode not in ('keyword', 'hybrid'):
+        return Response({'error': "mode must be 'keyword' or 'hybrid'"}, status=400)
+    try:
+        page = max(1, int(request.query_params.get('page', 1)))
+        page_size = int(request.query_params.get('page_size', settings.API_PAGE_SIZE))
+    except ValueError:
+        return Response({'error': 'page and page_size must be integers'}, status=400)
+    page_size = min(max(1, page_size), settings.API_MAX_PAGE_SIZE)
+
+    try:
+        # One extra row tells whether there is a next page without a COUNT.
+        run = fts.hybrid_search if mode == 'hybrid' else fts.search
+        hits = run(query, limit=page_size + 1, offset=(page - 1) * page_size)
+    except fts.SearchUnavailable:
+        return Response({'error': 'Search is not available on this database'}, status=501)
+
+    def link(n):
+        return request.build_absolute_uri(replace_query_param(request.get_full_path(), 'page', n))
+
+    return Response({
+        'next': link(page + 1) if len(hits) > page_size else None,
+        'previous': link(page - 1) if page > 1 else None,
+        'results': hits[:page_size],
+    })
@@ -0,0 +1,162 @@
+# main/vote_buffer.py
+"""
+Write-behind aggregation of vote scores (settings.VOTE_WRITE_BEHIND).
+
+Normally every vote also rewrites its question's or answer's vote_score in
+the same transaction, so a burst of votes on one popular question queues up
+on that row (and, on SQLite, on the database write lock). In write-behind
+mode a vote only inserts its Vote row; the score change is added to an
+in-process buffer once the vote commits, and a worker thread applies the
+summed deltas every VOTE_FLUSH_INTERVAL seconds, one UPDATE per target.
+
+Serializers add `pending(model, pk)` to the stored score, so responses from
+this process stay exact. Other processes see the change after the next
+flush. Deltas still buffered when the process is killed are lost; they are
+flushed on normal exit, and `manage.py recount_votes` rebuilds the scores
+from the Vote rows.
+
+With `background=False` there is no worker thread and nothing is written
+until `flush()` is called (tests).
+"""
+import atexit
+import threading
+import time
+
+from django.conf import settings
+from django.db import OperationalError, close_old_connections, transaction
+
+
+class VoteBuffer:
+    def __init__(self, background=True, interval=None):
+        self.background = background
+        self.interval = interval if interval is not None else getattr(settings, "VOTE_FLUSH_INTERVAL", 0.5)
+
+        self._pending = {}                  # (model, pk) -> summed delta
+        self._flushing = {}                 # deltas being written by the current flush
+        self._cond = threading.Condition()
+        self._flush_lock = threading.Lock()
+        self._thread = None
+        self._stopping = False
+
+        self.added = 0
+        self.flushes = 0
+        self.rows_updated = 0
+        self.errors = 0
+        self.last_flush_seconds = 0.0
+
+    # ------------------------------------------------------------------ #
+    # Producer side
+    # ------------------------------------------------------------------ #
+    def add(self, model, pk, delta):
+        with self._cond:
+            self.added += 1
+            key = (model, pk)
+            self._pending[key] = self._pending.get(key, 0) + delta
+            if self.background and (self._thread is None or not self._thread.is_alive()):
+                self._stopping = False
+                self._thread = threading.Thread(target=self._run, name="vote-buffer", daemon=True)
+                self._thread.start()
+
+    def pending(self, model, pk):
+        """Score change for `pk` recorded in this process but not flushed yet."""
+        key = (model, pk)
+        with self._cond:
+            return self._pending.get(key, 0) + self._flushing.get(key, 0)
+
+    # ------------------------------------------------------------------ #
+    # Worker side
+    # ------------------------------------------------------------------ #
+    def _run(self):
+        while True:
+            with self._cond:
+                if self._stopping:
+                    return
+                self._cond.wait(self.interval)
+            try:
+                self.flush()
+            finally:
+                close_old_connections()
+
+    def flush(self):
+        """Apply every buffered delta in one transaction; returns the number of rows updated."""
+        with self._flush_lock:
+            with self._cond:
+                batch = {key: delta for key, delta in self._pending.items() if delta}
+                self._pending = {}
+                self._flushing = batch
+            if not batch:
+                return 0
+
+            started = time.monotonic()
+            try:
+                with transaction.atomic():
+                    for (model, pk), delta in batch.items():
+                        model.bump(pk, vote_score=delta)
+            except OperationalError as e:
+                # e.g. SQLite busy: put the deltas back and retry on the next tick.
+                with self._cond:
+                    for key, delta in batch.items():
+                        self._pending[key] = self._pending.get(key, 0) + delta
+                    self._flushing = {}
+                    self.errors += 1
+                print("⚠️  Vote flush failed:", e)
+                return 0
+
+            with self._cond:
+                self._flushing = {}
+                self.flushes += 1
+                self.rows_updated += len(batch)
+                self.last_flush_seconds = time.monotonic() - started
+            return len(batch)
+
+    def stop(self):
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join()
+        self.flush()
+
+    # ------------------------------------------------------------------ #
+    # Metrics
+    # ------------------------------------------------------------------ #
+    def metrics(self):
+        with self._cond:
+            return {
+                "pending_targets": len(self._pending),
+                "added": self.added,
+                "flushes": self.flushes,
+                "rows_updated": self.rows_updated,
+                "errors": self.errors,
+                "last_flush_seconds": round(self.last_flush_seconds, 3),
+            }
+
+
+_buffer = None
+_buffer_lock = threading.Lock()
+
+
+def get_vote_buffer():
+    """Process-wide VoteBuffer, created on first use."""
+    global _buffer
+    if _buffer is None:
+        with _buffer_lock:
+            if _buffer is None:
+                _buffer = VoteBuffer()
+                atexit.register(_buffer.stop)
+    return _buffer
+
+
+def set_vote_buffer(buffer):
+    """Replace the process-wide buffer (tests); returns the previous one."""
+    global _buffer
+    with _buffer_lock:
+        previous, _buffer = _buffer, buffer
+    return previous
+
+
+def pending_score(model, pk):
+    """Unflushed vote delta for `pk`; 0 when write-behind is off."""
+    if _buffer is None:
+        return 0
+    return _buffer.pending(model, pk)
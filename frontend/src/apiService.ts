@@ -35,6 +35,12 @@ export interface Answer {
   vote_score: number;
 }
 
+export interface Page<T> {
+  next: string | null;
+  previous: string | null;
+  results: T[];
+}
+
 export interface CreateQuestionRequest {
   title: string;
   description: string;
@@ -113,16 +119,17 @@ class ApiService {
   }
 
   // Questions
-  async getQuestions(tagIds?: number[]): Promise<Question[]> {
-    let url = `${API_BASE_URL}/questions/`;
-    if (tagIds && tagIds.length > 0) {
+  // Pass the previous page's `next` link as `pageUrl` to load the following page.
+  async getQuestions(tagIds?: number[], pageUrl?: string): Promise<Page<Question>> {
+    let url = pageUrl ?? `${API_BASE_URL}/questions/`;
+    if (!pageUrl && tagIds && tagIds.length > 0) {
       url += `?tags__id=${tagIds.join(',')}`;
     }
     
     const response = await fetch(url, {
       headers: this.getAuthHeaders(),
     });
-    return this.handleResponse<Question[]>(response);
+    return this.handleResponse<Page<Question>>(response);
   }
 
   async getQuestion(id: number): Promise<Question> {
@@ -162,11 +169,11 @@ class ApiService {
   }
 
   // Answers
-  async getAnswers(questionId: number): Promise<Answer[]> {
-    const response = await fetch(`${API_BASE_URL}/questions/${questionId}/answers/`, {
+  async getAnswers(questionId: number, pageUrl?: string): Promise<Page<Answer>> {
+    const response = await fetch(pageUrl ?? `${API_BASE_URL}/questions/${questionId}/answers/`, {
       headers: this.getAuthHeaders(),
     });
-    return this.handleResponse<Answer[]>(response);
+    return this.handleResponse<Page<Answer>>(response);
   }
 
   async createAnswer(questionId: number, answerData: CreateAnswerRequest): Promise<Answer> {
@@ -42,6 +42,9 @@ export default function QuestionDetailPage() {
   const [error, setError] = useState('');
   const [answerText, setAnswerText] = useState('');
   const [submittingAnswer, setSubmittingAnswer] = useState(false);
+  // Link to the next page of answers, null once all of them are loaded
+  const [answersNext, setAnswersNext] = useState<string | null>(null);
+  const [loadingMoreAnswers, setLoadingMoreAnswers] = useState(false);
 
   useEffect(() => {
     const fetchQuestionAndAnswers = async () => {
@@ -61,7 +64,8 @@ export default function QuestionDetailPage() {
         const answersResponse = await fetch(`${BASE_URL}api/questions/${id}/answers/`);
         if (answersResponse.ok) {
           const answersData = await answersResponse.json();
-          setAnswers(answersData);
+          setAnswers(answersData.results);
+          setAnswersNext(answersData.next);
         }
       } catch (error) {
         console.error('Error fetching question:', error);
@@ -74,6 +78,31 @@ export default function QuestionDetailPage() {
     fetchQuestionAndAnswers();
   }, [id]);
 
+  const loadMoreAnswers = async () => {
+    if (!answersNext) return;
+
+    setLoadingMoreAnswers(true);
+    try {
+      const response = await fetch(answersNext);
+      if (response.ok) {
+        const data = await response.json();
+        // Answers posted from this page may already be at the end of the list
+        setAnswers((loaded) => [
+          ...loaded,
+          ...data.results.filter((answer: Answer) => !loaded.some((a) => a.id === answer.id)),
+        ]);
+        setAnswersNext(data.next);
+      } else {
+        setError('Failed to load more answers');
+      }
+    } catch (error) {
+      console.error('Error loading answers:', error);
+      setError('Network error while loading answers');
+    } finally {
+      setLoadingMoreAnswers(false);
+    }
+  };
+
   const handleSubmitAnswer = async () => {
     if (!answerText.trim() || !id) return;
 
@@ -229,6 +258,18 @@ export default function QuestionDetailPage() {
               </div>
             </div>
           </div>
+
+          {answersNext && (
+            <div className="text-center">
+              <button
+                onClick={loadMoreAnswers}
+                disabled={loadingMoreAnswers}
+                className="text-blue-400 hover:text-blue-300 font-medium disabled:opacity-50"
+              >
+                {loadingMoreAnswers ? 'Loading...' : 'Load more answers'}
+              </button>
+            </div>
+          )}
         </div>
 
         {/* Submit Answer Section */}
@@ -33,24 +33,26 @@ const QAHomepage = () => {
   const [questions, setQuestions] = useState<Question[]>([]);
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState('');
+  // Link to the next page of the feed, null once it is exhausted
+  const [nextPage, setNextPage] = useState<string | null>(null);
+  const [loadingMore, setLoadingMore] = useState(false);
+  // Each option is a ?sort= feed of the question list API
   const filterOptions = [
     "Newest",
-    "Unanswered", 
-    "Active",
-    "Bountied",
     "Hot",
-    "Week",
-    "Month",
+    "Top",
+    "Unanswered",
   ];
 
   // Fetch questions from API
   useEffect(() => {
     const fetchQuestions = async () => {
       try {
-        const response = await fetch(`${BASE_URL}api/questions/`);
+        const response = await fetch(`${BASE_URL}api/questions/?sort=${selectedFilter.toLowerCase()}`);
         if (response.ok) {
           const data = await response.json();
-          setQuestions(data);
+          setQuestions(data.results);
+          setNextPage(data.next);
         } else {
           setError('Failed to fetch questions');
         }
@@ -63,7 +65,28 @@ const QAHomepage = () => {
     };
 
     fetchQuestions();
-  }, []);
+  }, [selectedFilter]);
+
+  const loadMoreQuestions = async () => {
+    if (!nextPage) return;
+
+    setLoadingMore(true);
+    try {
+      const response = await fetch(nextPage);
+      if (response.ok) {
+        const data = await response.json();
+        setQuestions((loaded) => [...loaded, ...data.results]);
+        setNextPage(data.next);
+      } else {
+        setError('Failed to fetch questions');
+      }
+    } catch (error) {
+      console.error('Error fetching questions:', error);
+      setError('Network error while fetching questions');
+    } finally {
+      setLoadingMore(false);
+    }
+  };
 
   const handleQuestionClick = (questionId: number) => {
     navigate(`/question/${questionId}`);
@@ -270,6 +293,18 @@ const QAHomepage = () => {
                 </div>
               ))}
             </div>
+
+            {nextPage && (
+              <div className="mt-6 text-center">
+                <button
+                  onClick={loadMoreQuestions}
+                  disabled={loadingMore}
+                  className="text-blue-600 hover:text-blue-700 font-medium disabled:opacity-50"
+                >
+                  {loadingMore ? 'Loading...' : 'Load more questions'}
+                </button>
+              </div>
+            )}
           </div>
         </div>
       </div>
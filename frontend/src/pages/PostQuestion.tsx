@@ -27,11 +27,11 @@ const AskQuestionPage = () => {
     'performance', 'debugging', 'algorithms', 'data-structures'
   ];
 
-  // Fetch available tags from API
+  // Suggest the most used tags starting with what has been typed so far
   useEffect(() => {
     const fetchTags = async () => {
       try {
-        const response = await fetch(`${BASE_URL}api/tags/`);
+        const response = await fetch(`${BASE_URL}api/tags/autocomplete/?q=${encodeURIComponent(tagInput.trim())}`);
         if (response.ok) {
           const tagsData = await response.json();
           setAvailableTags(tagsData);
@@ -40,8 +40,9 @@ const AskQuestionPage = () => {
         console.error('Failed to fetch tags:', error);
       }
     };
-    fetchTags();
-  }, []);
+    const timer = setTimeout(fetchTags, 150);
+    return () => clearTimeout(timer);
+  }, [tagInput]);
 
   const handleAddTag = (tag: string) => {
     if (tag && !tags.includes(tag) && tags.length < 5) {
@@ -42,6 +42,9 @@ export default function QuestionDetailPage() {
   const [error, setError] = useState('');
   const [answerText, setAnswerText] = useState('');
   const [submittingAnswer, setSubmittingAnswer] = useState(false);
+  // Link to the next page of answers, null once all of them are loaded
+  const [answersNext, setAnswersNext] = useState<string | null>(null);
+  const [loadingMoreAnswers, setLoadingMoreAnswers] = useState(false);
 
   useEffect(() => {
     const fetchQuestionAndAnswers = async () => {
@@ -61,7 +64,8 @@ export default function QuestionDetailPage() {
         const answersResponse = await fetch(`${BASE_URL}api/questions/${id}/answers/`);
         if (answersResponse.ok) {
           const answersData = await answersResponse.json();
-          setAnswers(answersData);
+          setAnswers(answersData.results);
+          setAnswersNext(answersData.next);
         }
       } catch (error) {
         console.error('Error fetching question:', error);
@@ -74,6 +78,31 @@ export default function QuestionDetailPage() {
     fetchQuestionAndAnswers();
   }, [id]);
 
+  const loadMoreAnswers = async () => {
+    if (!answersNext) return;
+
+    setLoadingMoreAnswers(true);
+    try {
+      const response = await fetch(answersNext);
+      if (response.ok) {
+        const data = await response.json();
+        // Answers posted from this page may already be at the end of the list
+        setAnswers((loaded) => [
+          ...loaded,
+          ...data.results.filter((answer: Answer) => !loaded.some((a) => a.id === answer.id)),
+        ]);
+        setAnswersNext(data.next);
+      } else {
+        setError('Failed to load more answers');
+      }
+    } catch (error) {
+      console.error('Error loading answers:', error);
+      setError('Network error while loading answers');
+    } finally {
+      setLoadingMoreAnswers(false);
+    }
+  };
+
   const handleSubmitAnswer = async () => {
     if (!answerText.trim() || !id) return;
 
@@ -99,6 +128,7 @@ export default function QuestionDetailPage() {
       if (response.ok) {
         const newAnswer = await response.json();
         setAnswers([...answers, newAnswer]);
+        setQuestion((q) => q && { ...q, num_answers: q.num_answers + 1 });
         setAnswerText('');
       } else {
         setError('Failed to submit answer');
@@ -183,7 +213,7 @@ export default function QuestionDetailPage() {
               <div className="flex items-center space-x-4 text-sm text-gray-500 mb-4">
                 <span>Asked by <strong>{question.user.username}</strong></span>
                 <span>{timeAgo(question.created_at)}</span>
-                <span>{answers.length} answers</span>
+                <span>{question.num_answers} answers</span>
               </div>
             </div>
             <div className="flex items-center space-x-2">
@@ -221,7 +251,7 @@ export default function QuestionDetailPage() {
         {/* Answers Section */}
         <div className="bg-white rounded-lg shadow-lg p-6 mb-8">
           <h2 className="text-xl font-bold text-gray-900 mb-6">
-            {answers.length} Answer{answers.length !== 1 ? 's' : ''}
+            {question.num_answers} Answer{question.num_answers !== 1 ? 's' : ''}
           </h2>
           
           {answers.length === 0 ? (
@@ -262,6 +292,18 @@ export default function QuestionDetailPage() {
               ))}
             </div>
           )}
+
+          {answersNext && (
+            <div className="mt-6 text-center">
+              <button
+                onClick={loadMoreAnswers}
+                disabled={loadingMoreAnswers}
+                className="text-blue-600 hover:text-blue-700 font-medium disabled:opacity-50"
+              >
+                {loadingMoreAnswers ? 'Loading...' : 'Load more answers'}
+              </button>
+            </div>
+          )}
         </div>
 
         {/* Answer Form */}